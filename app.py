@@ -1,51 +1,17 @@
-from flask import Flask
-
-app = Flask(__name__)
+"""
+Standalone web server entry point
 
-@app.route('/')
-def hello_world():
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<body>
-    <div class="container" style="bg-dark text-red text-center py-3 mt-5">
-        <a href="https://github.com/Harrytt345" class="card">
-            <p>
-            <center>
-                <br
-              /><br
-              />▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄<br 
-              />██░▄▄▄░█░▄▄▀█▄░▄██░▀██░█▄░▄██<br 
-              />██▄▄▄▀▀█░▀▀░██░███░█░█░██░███<br 
-              />██░▀▀▀░█░██░█▀░▀██░██▄░█▀░▀██<br 
-              />▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀<br 
-              /><br
-              /><br>
-                <b>Powered By zerocanbot</b>
-                </center>
-            </p>
-        </a>
-    </div>
-        <br></br>
-        <center>
-        <footer class="bg-dark text-white text-center py-3 mt-5">
-                <div class="footer__copyright">
-            <p class="footer__copyright-info">
-                © 2025 zerocanbot. All rights reserved.
-            </p>
-        </div>
-    </footer>
-    </center>
-</body>
-</html>
+The bot serves these endpoints from its own loop (see modules/web_server.py);
+this runs the same app on its own, e.g. for checking the landing page.
 """
 
-@app.route('/health')
-def health_check():
-    return {"status": "ok", "message": "Bot is running"}
+import os
+from aiohttp import web
+from modules.web_server import create_app
+
+app = create_app()
 
 
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    web.run_app(app, host='0.0.0.0', port=port, access_log=None)
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the bot's hot paths.
+
+Run from the project root, e.g. `python -m benchmarks.bench_hot_paths`.
+"""
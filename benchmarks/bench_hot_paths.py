@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Hot Path Micro-Benchmarks
+Times the bot's pure-Python hot paths on synthetic batches from 10 to 100k
+links and records wall-clock timings plus tracemalloc memory peaks. Results
+are emitted as JSON so runs can be diffed over time.
+
+Usage:
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --sizes 10,1000 --repeat 3 --only parse_links
+    python -m benchmarks.bench_hot_paths --output bench-results/2025-01-01.json
+
+Nothing here touches the network or Telegram. Benchmarks whose modules
+cannot be imported in the current environment are reported as skipped.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+import logging
+import contextlib
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+
+URL_KINDS = (
+    "https://d1abcd.cloudfront.net/videos/{n}/master.m3u8",
+    "https://cdn.example-edu.com/lectures/{n}/video.mp4",
+    "https://files.example-edu.com/notes/{n}.pdf",
+    "https://images.example-edu.com/slides/{n}.jpg",
+    "https://www.youtube.com/embed/vid{n:07d}",
+    "https://www.youtube.com/watch?v=vid{n:07d}",
+    "https://youtu.be/vid{n:07d}",
+    "https://media.example-drm.com/{n}/manifest.mpd",
+    "https://api.example.com/v2/stream/{n}",
+    "https://archive.example-edu.com/{n}/bundle.zip",
+)
+
+
+# ==========================================================================
+# Synthetic data
+# ==========================================================================
+
+def synthetic_links(size, seed=1234):
+    """Deterministic (title, url) pairs with a realistic mix of link kinds"""
+    rng = random.Random(seed)
+    return [
+        (f"Lecture {n} - Topic {rng.randint(1, 99)}", rng.choice(URL_KINDS).format(n=n))
+        for n in range(size)
+    ]
+
+
+def synthetic_batch_text(size, seed=1234):
+    """A .txt batch mixing 'title:url', alternating title/URL and bare URL lines"""
+    rng = random.Random(seed)
+    lines = []
+    for title, url in synthetic_links(size, seed):
+        style = rng.random()
+        if style < 0.7:
+            lines.append(f"{title}:{url}")
+        elif style < 0.9:
+            lines.extend((title, url))
+        else:
+            lines.append(url)
+        if rng.random() < 0.05:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def synthetic_tree(root, size, seed=1234):
+    """Populate root with a mix of temp-looking and keep-worthy files"""
+    rng = random.Random(seed)
+    names = ("clip{n}.mp4", "notes{n}.pdf", "frag{n}.part", "seg{n}.ts", "data{n}.json",
+             "cache{n}.bin", "thumb.{n}.jpg", "keep{n}.py", "README{n}.md", "tmp{n}.dat")
+    os.makedirs(os.path.join(root, "downloads", "user"), exist_ok=True)
+    for n in range(size):
+        name = rng.choice(names).format(n=n)
+        folder = root if rng.random() < 0.8 else os.path.join(root, "downloads", "user")
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(b"x" * 64)
+
+
+class _FakeReply:
+    """Stand-in for a pyrogram Message whose edit() is a no-op"""
+
+    async def edit(self, text):
+        return text
+
+
+# ==========================================================================
+# Benchmarks: setup(size) -> args, run(*args)
+# ==========================================================================
+
+class Benchmark:
+    """
+    A named hot path: setup(size) builds the arguments, run(*args) is timed.
+    Sizes above max_size are skipped (file-system heavy cases), and
+    setup_each_run rebuilds the input when run consumes it.
+    """
+
+    def __init__(self, name, setup, run, max_size=None, setup_each_run=False, teardown=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+        self.setup_each_run = setup_each_run
+        self.teardown = teardown
+
+
+def _bench_parse_links():
+    from modules.drm_handler import parse_links
+    return Benchmark(
+        "drm_handler.parse_links",
+        lambda size: (synthetic_batch_text(size).split("\n"),),
+        parse_links,
+    )
+
+
+def _bench_extract_names_and_urls():
+    from modules.html_handler import extract_names_and_urls
+    return Benchmark(
+        "html_handler.extract_names_and_urls",
+        lambda size: (synthetic_batch_text(size),),
+        extract_names_and_urls,
+    )
+
+
+def _bench_categorize_urls():
+    from modules.html_handler import categorize_urls
+    return Benchmark(
+        "html_handler.categorize_urls",
+        lambda size: (synthetic_links(size),),
+        categorize_urls,
+    )
+
+
+def _bench_generate_html():
+    from modules.html_handler import generate_html, categorize_urls
+    return Benchmark(
+        "html_handler.generate_html",
+        lambda size: ("batch",) + categorize_urls(synthetic_links(size)),
+        generate_html,
+    )
+
+
+def _bench_extract_youtube_urls():
+    from modules.youtube_handler import extract_youtube_urls
+    return Benchmark(
+        "youtube_handler.extract_youtube_urls",
+        lambda size: (synthetic_batch_text(size),),
+        extract_youtube_urls,
+    )
+
+
+def _bench_dedupe_links():
+    from modules.url_canon import dedupe_links
+    return Benchmark(
+        "url_canon.dedupe_links",
+        lambda size: (synthetic_links(size),),
+        dedupe_links,
+    )
+
+
+def _bench_route_links():
+    from modules.link_router import route_links, count_kinds
+    return Benchmark(
+        "link_router.route_links",
+        lambda size: (synthetic_links(size),),
+        lambda links: count_kinds(route_links(links)),
+    )
+
+
+def _bench_cleanup_temp_files():
+    from modules.utils import cleanup_temp_files
+    state = {}
+
+    def setup(size):
+        state["cwd"] = os.getcwd()
+        state["root"] = tempfile.mkdtemp(prefix="bench-cleanup-")
+        synthetic_tree(state["root"], size)
+        os.chdir(state["root"])
+        return ()
+
+    def teardown():
+        os.chdir(state["cwd"])
+        import shutil
+        shutil.rmtree(state["root"], ignore_errors=True)
+
+    return Benchmark(
+        "utils.cleanup_temp_files",
+        setup,
+        lambda: cleanup_temp_files(cleanup_type="final"),
+        max_size=10000,
+        setup_each_run=True,
+        teardown=teardown,
+    )
+
+
+def _bench_progress_bar():
+    from modules import utils
+
+    def run(calls):
+        # Every call formats and "edits"; the real Timer would throttle them
+        throttle, utils.timer.time_between = utils.timer.time_between, -1
+        reply = _FakeReply()
+        start = time.time() - 10
+        total = 1024 * 1024 * 1024
+
+        async def drive():
+            for n in range(1, calls + 1):
+                await utils.progress_bar(n * total // calls, total, reply, start)
+
+        try:
+            asyncio.run(drive())
+        finally:
+            utils.timer.time_between = throttle
+
+    return Benchmark("utils.progress_bar", lambda size: (size,), run)
+
+
+def _bench_build_ydl_opts():
+    from modules.utils import build_ydl_opts
+
+    def run(urls):
+        for n, url in enumerate(urls):
+            build_ydl_opts(url, f"/downloads/{n}.%(ext)s", is_live=(n % 4 == 0))
+
+    return Benchmark(
+        "utils.build_ydl_opts",
+        lambda size: ([url for _, url in synthetic_links(size)],),
+        run,
+    )
+
+
+BENCHMARKS = {
+    "parse_links": _bench_parse_links,
+    "extract_names_and_urls": _bench_extract_names_and_urls,
+    "categorize_urls": _bench_categorize_urls,
+    "generate_html": _bench_generate_html,
+    "extract_youtube_urls": _bench_extract_youtube_urls,
+    "dedupe_links": _bench_dedupe_links,
+    "route_links": _bench_route_links,
+    "cleanup_temp_files": _bench_cleanup_temp_files,
+    "progress_bar": _bench_progress_bar,
+    "build_ydl_opts": _bench_build_ydl_opts,
+}
+
+
+# ==========================================================================
+# Runner
+# ==========================================================================
+
+def _timed(bench, args):
+    start = time.perf_counter()
+    bench.run(*args)
+    return time.perf_counter() - start
+
+
+def measure(bench, size, repeat):
+    """Time bench at size `repeat` times, then once more under tracemalloc"""
+    timings = []
+    args = bench.setup(size)
+    try:
+        for _ in range(repeat):
+            if bench.setup_each_run and timings:
+                bench.teardown()
+                args = bench.setup(size)
+            timings.append(_timed(bench, args))
+
+        if bench.setup_each_run:
+            bench.teardown()
+            args = bench.setup(size)
+        tracemalloc.start()
+        try:
+            bench.run(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        if bench.teardown:
+            bench.teardown()
+
+    median = statistics.median(timings)
+    return {
+        "bench": bench.name,
+        "size": size,
+        "repeat": repeat,
+        "min_s": round(min(timings), 6),
+        "median_s": round(median, 6),
+        "mean_s": round(statistics.mean(timings), 6),
+        "stdev_s": round(statistics.stdev(timings), 6) if len(timings) > 1 else 0.0,
+        "per_item_us": round(median / size * 1e6, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+@contextlib.contextmanager
+def _quiet(stdout):
+    """Send prints to `stdout` and drop log records (the queue logger writes to stderr and logs/bot.jsonl)"""
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(stdout):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def run_suite(names, sizes, repeat, log=sys.stderr):
+    results, skipped = [], {}
+    for name in names:
+        try:
+            # Module imports print banners (vars.py, optimizers); keep them off stdout
+            with _quiet(log):
+                bench = BENCHMARKS[name]()
+        except Exception as e:
+            skipped[name] = f"{type(e).__name__}: {e}"
+            print(f"⏭️  {name}: skipped ({skipped[name]})", file=log)
+            continue
+        for size in sizes:
+            if bench.max_size and size > bench.max_size:
+                continue
+            with open(os.devnull, "w") as devnull, _quiet(devnull):
+                row = measure(bench, size, repeat)
+            results.append(row)
+            print(f"⏱️  {row['bench']:<40} n={size:<7} median={row['median_s'] * 1000:10.3f}ms "
+                  f"per-item={row['per_item_us']:9.3f}us peak={row['peak_kb']:10.1f}KB", file=log)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot's pure-Python hot paths")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated batch sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions per size")
+    parser.add_argument("--only", default="", help=f"comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = run_suite(names, sizes, max(1, args.repeat))
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
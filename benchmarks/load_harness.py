@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+End-to-End Load Harness
+Drives the real drm/ytm/html handlers against a fake Telegram client and a
+local media origin, so the whole pipeline (parse -> download -> post-process
+-> upload) can be load-tested without Telegram or third-party sites.
+
+- FakeClient stands in for the Pyrogram Client: uploads are paced by a
+  simulated upload bandwidth (with progress callbacks), message edits take a
+  configurable latency, and FloodWait can be injected at a given rate.
+  Media groups count one delivery per item, and mirror copies
+  (--mirrors) are counted separately.
+- The origin is an aiohttp server on its own thread serving synthetic MP4,
+  HLS playlists/segments, PDFs and images with configurable latency and
+  per-response bandwidth. Real media is generated with ffmpeg/Pillow when
+  they are available, otherwise the payloads are opaque bytes.
+- The report has items/minute, p50/p95 inter-arrival time of deliveries
+  (the gap between consecutive posts, not per-item latency), peak RSS of the bot
+  and its children, and the disk high-water mark of the work directory.
+
+Usage:
+    python -m benchmarks.load_harness --scenario drm --items 50
+    python -m benchmarks.load_harness --scenario html --items 20000
+    python -m benchmarks.load_harness --scenario ytm --items 10 --floodwait-rate 0.05
+    python -m benchmarks.load_harness --scenario drm --mix img,pdf --mirrors 2
+
+The handlers run inside a scratch working directory because their cleanup
+sweeps the current directory. For the ytm scenario, YouTube URLs and the
+oEmbed lookup are routed to the local origin.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import contextlib
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from aiohttp import web
+
+CHAT_ID = 1000001
+USER_ID = 1000001
+
+
+def parse_rate(value):
+    """'5M' -> 5242880, '512K' -> 524288, '0' -> unlimited"""
+    value = str(value).strip().upper()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(float(value or 0))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ==========================================================================
+# Local media origin
+# ==========================================================================
+
+class MediaOrigin:
+    """Synthetic media server with per-response latency and bandwidth"""
+
+    def __init__(self, media_bytes, latency=0.0, bandwidth=0, segments=6, seed=1234):
+        self.media_bytes = media_bytes
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.segments = segments
+        self.rng = random.Random(seed)
+        self.cache_dir = tempfile.mkdtemp(prefix="harness-origin-")
+        self.requests = 0
+        self.bytes_sent = 0
+        self.port = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._payloads = {}
+
+    # ---- payloads ----------------------------------------------------------
+
+    def _ffmpeg(self, *args):
+        if not shutil.which("ffmpeg"):
+            return False
+        result = subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+
+    def _opaque(self, size):
+        return bytes(self.rng.getrandbits(8) for _ in range(min(size, 4096))) * (size // 4096 + 1)
+
+    def _build_payloads(self):
+        # Enough seconds of 500 kbit/s test video to roughly match media_bytes
+        seconds = max(2, int(self.media_bytes * 8 / 500_000))
+        mp4 = os.path.join(self.cache_dir, "sample.mp4")
+        if self._ffmpeg("-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={seconds}",
+                        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                        "-c:v", "libx264", "-preset", "ultrafast", "-b:v", "450k",
+                        "-c:a", "aac", "-b:a", "48k", "-shortest", "-movflags", "+faststart", mp4):
+            with open(mp4, "rb") as f:
+                self._payloads["mp4"] = f.read()
+        else:
+            self._payloads["mp4"] = self._opaque(self.media_bytes)[:self.media_bytes]
+
+        segment = os.path.join(self.cache_dir, "segment.ts")
+        if self._ffmpeg("-i", mp4, "-t", "2", "-c", "copy", "-f", "mpegts", segment) if os.path.exists(mp4) else False:
+            with open(segment, "rb") as f:
+                self._payloads["ts"] = f.read()
+        else:
+            self._payloads["ts"] = self._opaque(self.media_bytes // self.segments)[:self.media_bytes // self.segments]
+
+        pdf_body = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n" \
+                   b"2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\ntrailer<</Root 1 0 R>>\n"
+        self._payloads["pdf"] = pdf_body + b"%" + b"0" * max(0, self.media_bytes // 8) + b"\n%%EOF\n"
+
+        try:
+            from PIL import Image
+            buffer = io.BytesIO()
+            Image.new("RGB", (1280, 720), (30, 90, 160)).save(buffer, "JPEG", quality=85)
+            self._payloads["jpg"] = buffer.getvalue()
+        except Exception:
+            self._payloads["jpg"] = b"\xff\xd8\xff\xe0" + self._opaque(64 * 1024)[:64 * 1024] + b"\xff\xd9"
+
+    # ---- handlers ----------------------------------------------------------
+
+    async def _send(self, request, body, content_type):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = web.StreamResponse(headers={"Content-Type": content_type,
+                                               "Content-Length": str(len(body)),
+                                               "Accept-Ranges": "none"})
+        await response.prepare(request)
+        chunk = 64 * 1024
+        for start in range(0, len(body), chunk):
+            piece = body[start:start + chunk]
+            await response.write(piece)
+            self.bytes_sent += len(piece)
+            if self.bandwidth:
+                await asyncio.sleep(len(piece) / self.bandwidth)
+        await response.write_eof()
+        return response
+
+    async def _media(self, request):
+        return await self._send(request, self._payloads["mp4"], "video/mp4")
+
+    async def _playlist(self, request):
+        item = request.match_info["item"]
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for n in range(self.segments):
+            lines += ["#EXTINF:2.0,", f"/hls/{item}/seg{n}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return await self._send(request, ("\n".join(lines) + "\n").encode(), "application/vnd.apple.mpegurl")
+
+    async def _segment(self, request):
+        return await self._send(request, self._payloads["ts"], "video/mp2t")
+
+    async def _pdf(self, request):
+        return await self._send(request, self._payloads["pdf"], "application/pdf")
+
+    async def _image(self, request):
+        return await self._send(request, self._payloads["jpg"], "image/jpeg")
+
+    async def _oembed(self, request):
+        url = request.query.get("url", "")
+        title = f"Synthetic track {url.rsplit('=', 1)[-1].rsplit('/', 1)[-1]}"
+        return await self._send(request, json.dumps({"title": title}).encode(), "application/json")
+
+    # ---- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        self._build_payloads()
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_get("/media/{item}.mp4", self._media)
+            app.router.add_get("/hls/{item}/index.m3u8", self._playlist)
+            app.router.add_get("/hls/{item}/seg{n}.ts", self._segment)
+            app.router.add_get("/docs/{item}.pdf", self._pdf)
+            app.router.add_get("/img/{item}.jpg", self._image)
+            app.router.add_get("/oembed", self._oembed)
+            self._runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            self._loop.run_until_complete(site.start())
+            self.port = site._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="media-origin", daemon=True)
+        self._thread.start()
+        ready.wait(30)
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+# ==========================================================================
+# Fake Telegram client
+# ==========================================================================
+
+class _Text(str):
+    """str with the .html/.markdown accessors of pyrogram's Str"""
+
+    @property
+    def html(self):
+        return str(self)
+
+    markdown = html
+
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeMessage:
+    _ids = iter(range(1, 10 ** 9))
+
+    def __init__(self, client, chat_id, text=None, document_path=None, caption=None, media_group_id=None):
+        self._client = client
+        self.id = next(FakeMessage._ids)
+        self.media_group_id = media_group_id
+        self.chat = _Obj(id=chat_id, type="private")
+        self.from_user = _Obj(id=USER_ID, first_name="Load", last_name="Harness", username="harness",
+                              mention="Load Harness")
+        self.text = _Text(text) if text is not None else None
+        self.caption = _Text(caption) if caption is not None else None
+        self._document_path = document_path
+        self.document = _Obj(file_name=os.path.basename(document_path)) if document_path else None
+        self.command = text.split() if text and text.startswith("/") else None
+
+    async def download(self, file_name=None, **kwargs):
+        target = file_name or os.path.join("downloads", os.path.basename(self._document_path))
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        shutil.copyfile(self._document_path, target)
+        return os.path.abspath(target)
+
+    async def reply_text(self, text, *args, **kwargs):
+        return await self._client.send_message(self.chat.id, text)
+
+    async def reply_document(self, document, *args, **kwargs):
+        return await self._client.send_document(self.chat.id, document, **kwargs)
+
+    async def reply_video(self, video, *args, **kwargs):
+        return await self._client.send_video(self.chat.id, video, **kwargs)
+
+    async def reply_photo(self, photo, *args, **kwargs):
+        return await self._client.send_photo(self.chat.id, photo, **kwargs)
+
+    async def edit_text(self, text, *args, **kwargs):
+        await self._client._edit(self, text)
+        return self
+
+    edit = edit_text
+
+    async def edit_media(self, *args, **kwargs):
+        await self._client._edit(self, self.text)
+        return self
+
+    async def delete(self, *args, **kwargs):
+        self._client.calls["delete"] += 1
+        return True
+
+
+class FakeClient:
+    """
+    Pyrogram Client stand-in with simulated upload bandwidth, edit latency
+    and FloodWait injection. Unknown methods are accepted as no-ops so new
+    handler code keeps running under the harness.
+    """
+
+    def __init__(self, upload_bps=0, edit_latency=0.0, floodwait_rate=0.0, floodwait_seconds=3, answers=(), seed=1234):
+        self.upload_bps = upload_bps
+        self.edit_latency = edit_latency
+        self.floodwait_rate = floodwait_rate
+        self.floodwait_seconds = floodwait_seconds
+        self.answers = list(answers)
+        self.rng = random.Random(seed)
+        self.calls = {"send_message": 0, "edit": 0, "upload": 0, "copy": 0, "delete": 0, "floodwait": 0, "other": 0}
+        self.uploaded_bytes = 0
+        self.deliveries = []  # (timestamp, kind, ok)
+        self.copies = 0  # messages mirrored with copy_message/copy_media_group
+        self._album_sizes = {}  # message id -> size of the album it was sent in
+
+    def _maybe_floodwait(self):
+        if self.floodwait_rate and self.rng.random() < self.floodwait_rate:
+            from pyrogram.errors import FloodWait
+            self.calls["floodwait"] += 1
+            raise FloodWait(value=self.floodwait_seconds)
+
+    async def _edit(self, message, text):
+        self.calls["edit"] += 1
+        if self.edit_latency:
+            await asyncio.sleep(self.edit_latency)
+        self._maybe_floodwait()
+        message.text = _Text(text)
+
+    async def listen(self, chat_id, *args, **kwargs):
+        answer = self.answers.pop(0) if self.answers else "/d"
+        if isinstance(answer, FakeMessage):
+            return answer
+        return FakeMessage(self, chat_id, text=answer)
+
+    async def send_message(self, chat_id, text="", *args, **kwargs):
+        self.calls["send_message"] += 1
+        if self.edit_latency:
+            await asyncio.sleep(self.edit_latency)
+        self._maybe_floodwait()
+        # Handlers sometimes reply with the exception object itself
+        text = str(text)
+        # Per-item failure notices; the batch summary lists "Total Failed URLs"
+        if "Failed" in text and "Completed" not in text:
+            self.deliveries.append((time.monotonic(), "failed", False))
+        return FakeMessage(self, chat_id, text=text)
+
+    @staticmethod
+    def _size(media):
+        if isinstance(media, (io.BytesIO, io.BufferedReader)):
+            return len(media.getvalue()) if isinstance(media, io.BytesIO) else os.fstat(media.fileno()).st_size
+        if isinstance(media, str) and os.path.exists(media):
+            return os.path.getsize(media)
+        return 0
+
+    async def _transfer(self, size, progress=None, progress_args=()):
+        """Pace `size` bytes at the simulated upload bandwidth"""
+        sent, chunk = 0, 512 * 1024
+        while sent < size:
+            step = min(chunk, size - sent)
+            if self.upload_bps:
+                await asyncio.sleep(step / self.upload_bps)
+            sent += step
+            if progress:
+                await progress(sent, size, *progress_args)
+        self.uploaded_bytes += size
+
+    async def _upload(self, kind, chat_id, media, caption=None, progress=None, progress_args=(), **kwargs):
+        self._maybe_floodwait()
+        self.calls["upload"] += 1
+        await self._transfer(self._size(media), progress, progress_args)
+        self.deliveries.append((time.monotonic(), kind, True))
+        return FakeMessage(self, chat_id, caption=caption)
+
+    async def send_media_group(self, chat_id, media, *args, **kwargs):
+        """One call for the whole album; every item in it counts as a delivery"""
+        self._maybe_floodwait()
+        self.calls["upload"] += 1
+        group_id = f"group{next(FakeMessage._ids)}"
+        messages = []
+        for item in media:
+            await self._transfer(self._size(item.media))
+            messages.append(FakeMessage(self, chat_id, caption=item.caption, media_group_id=group_id))
+        for message in messages:
+            self._album_sizes[message.id] = len(messages)
+        now = time.monotonic()
+        self.deliveries.extend((now, "album", True) for _ in media)
+        return messages
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, *args, **kwargs):
+        self._maybe_floodwait()
+        self.calls["copy"] += 1
+        self.copies += 1
+        return FakeMessage(self, chat_id)
+
+    async def copy_media_group(self, chat_id, from_chat_id, message_id, *args, **kwargs):
+        self._maybe_floodwait()
+        self.calls["copy"] += 1
+        group_id = f"copy{next(FakeMessage._ids)}"
+        size = self._album_sizes.get(message_id, 1)
+        self.copies += size
+        return [FakeMessage(self, chat_id, media_group_id=group_id) for _ in range(size)]
+
+    async def send_document(self, chat_id, document, *args, **kwargs):
+        return await self._upload("document", chat_id, document, **kwargs)
+
+    async def send_video(self, chat_id, video, *args, **kwargs):
+        return await self._upload("video", chat_id, video, **kwargs)
+
+    async def send_photo(self, chat_id, photo, *args, **kwargs):
+        return await self._upload("photo", chat_id, photo, **kwargs)
+
+    async def send_audio(self, chat_id, audio, *args, **kwargs):
+        return await self._upload("audio", chat_id, audio, **kwargs)
+
+    def __getattr__(self, name):
+        async def _noop(*args, **kwargs):
+            self.calls["other"] += 1
+            return FakeMessage(self, CHAT_ID, text="")
+        return _noop
+
+
+# ==========================================================================
+# Resource sampling
+# ==========================================================================
+
+class ResourceSampler:
+    """Background sampler for peak RSS (self + children) and disk high-water mark"""
+
+    def __init__(self, workdir, interval=0.25):
+        self.workdir = workdir
+        self.interval = interval
+        self.peak_rss = 0
+        self.disk_hwm = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+
+    def _disk_usage(self):
+        total = 0
+        for root, _, files in os.walk(self.workdir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total
+
+    def _rss(self):
+        try:
+            import psutil
+            proc = psutil.Process()
+            rss = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return rss
+        except Exception:
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self._rss())
+            self.disk_hwm = max(self.disk_hwm, self._disk_usage())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(5)
+
+
+# ==========================================================================
+# Scenarios
+# ==========================================================================
+
+def build_batch(origin, items, mix, seed=1234):
+    """Generate a 'title:url' .txt batch of origin URLs"""
+    rng = random.Random(seed)
+    templates = {
+        "mp4": "{base}/media/{n}.mp4",
+        "hls": "{base}/hls/{n}/index.m3u8",
+        "pdf": "{base}/docs/{n}.pdf",
+        "img": "{base}/img/{n}.jpg",
+    }
+    lines = []
+    for n in range(1, items + 1):
+        kind = rng.choice(mix)
+        lines.append(f"Item {n:05d} {kind}:{templates[kind].format(base=origin.base_url, n=n)}")
+    return "\n".join(lines) + "\n"
+
+
+def build_youtube_batch(items):
+    # Video ids must be 11 characters or the handlers do not recognise the links
+    return "\n".join(f"Track {n}:https://www.youtube.com/watch?v=harness{n:04d}" for n in range(1, items + 1)) + "\n"
+
+
+@contextlib.contextmanager
+def route_youtube_to_origin(origin):
+    """Point the /ytm audio pipeline's yt-dlp jobs and oEmbed lookups at the local origin"""
+    from modules import audio_pipeline
+
+    original_run, original_fetch_title = audio_pipeline.run_ytdlp, audio_pipeline.fetch_title
+
+    def rewrite(arg):
+        if isinstance(arg, str) and ("youtube.com/" in arg or "youtu.be/" in arg) and "://" in arg:
+            video_id = arg.rsplit("=", 1)[-1].rsplit("/", 1)[-1]
+            return f"{origin.base_url}/media/{video_id}.mp4"
+        return arg
+
+    async def run_ytdlp(argv, on_event=None):
+        return await original_run([rewrite(a) for a in argv], on_event=on_event)
+
+    async def fetch_title(session, url):
+        async with session.get(f"{origin.base_url}/oembed", params={"url": url, "format": "json"}) as resp:
+            return (await resp.json(content_type=None)).get("title") or "YouTube Video"
+
+    audio_pipeline.run_ytdlp, audio_pipeline.fetch_title = run_ytdlp, fetch_title
+    try:
+        yield
+    finally:
+        audio_pipeline.run_ytdlp, audio_pipeline.fetch_title = original_run, original_fetch_title
+
+
+async def run_scenario(args, origin, workdir):
+    batch_path = os.path.join(workdir, "harness_batch.txt")
+    # Outside the work dir: handlers' cleanup sweeps *.txt there
+    source_dir = tempfile.mkdtemp(prefix="harness-src-")
+    source_path = os.path.join(source_dir, "harness_batch.txt")
+    mix = [m.strip() for m in args.mix.split(",") if m.strip()]
+
+    with open(source_path, "w", encoding="utf-8") as f:
+        f.write(build_youtube_batch(args.items) if args.scenario == "ytm" else build_batch(origin, args.items, mix))
+
+    client = FakeClient(parse_rate(args.upload_bps), args.edit_latency, args.floodwait_rate, args.floodwait_seconds)
+    document = FakeMessage(client, CHAT_ID, document_path=source_path)
+
+    with contextlib.ExitStack() as stack:
+        # The handlers only answer authorised chats; vars.AUTH_USERS is the
+        # list they imported, so it is extended in place
+        from vars import AUTH_USERS
+        if CHAT_ID not in AUTH_USERS:
+            AUTH_USERS.append(CHAT_ID)
+            stack.callback(AUTH_USERS.remove, CHAT_ID)
+        if args.scenario == "drm":
+            import main
+            from modules.drm_handler import drm_handler
+            # update_download_progress/ultra_fast_upload talk to main.bot
+            stack.callback(setattr, main, "bot", main.bot)
+            main.bot = client
+            # Mirror channels (if any) make the batch fan out with copy_message
+            channels = " ".join([str(CHAT_ID)] + [str(-1000000000000 - n) for n in range(1, args.mirrors + 1)]) if args.mirrors else "/d"
+            client.answers = ["1", "/d", args.quality, channels]
+            handler, message = drm_handler, document
+        elif args.scenario == "ytm":
+            from modules.youtube_handler import ytm_handler
+            stack.enter_context(route_youtube_to_origin(origin))
+            client.answers = [document, "1"]
+            handler, message = ytm_handler, FakeMessage(client, CHAT_ID, text="/ytm")
+        else:
+            from modules.html_handler import html_handler
+            client.answers = [document]
+            handler, message = html_handler, FakeMessage(client, CHAT_ID, text="/t2h")
+
+        started = time.monotonic()
+        with ResourceSampler(workdir, args.sample_interval) as sampler:
+            await handler(client, message)
+        elapsed = time.monotonic() - started
+
+    shutil.rmtree(source_dir, ignore_errors=True)
+    if os.path.exists(batch_path):
+        os.remove(batch_path)
+
+    # Inter-arrival = gap between consecutive deliveries (uploads or failure
+    # notices); the items of one album arrive together and count as one arrival
+    stamps = [started] + sorted({t for t, _, _ in client.deliveries})
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    delivered = sum(1 for _, _, ok in client.deliveries if ok)
+    failed = sum(1 for _, _, ok in client.deliveries if not ok)
+    return {
+        "scenario": args.scenario,
+        "items": args.items,
+        "delivered": delivered,
+        "failed": failed,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_min": round(len(client.deliveries) / elapsed * 60, 2) if elapsed else None,
+        "interarrival_p50_s": round(percentile(gaps, 50), 3) if gaps else None,
+        "interarrival_p95_s": round(percentile(gaps, 95), 3) if gaps else None,
+        "interarrival_mean_s": round(statistics.mean(gaps), 3) if gaps else None,
+        "peak_rss_mb": round(sampler.peak_rss / (1024 * 1024), 1),
+        "disk_hwm_mb": round(sampler.disk_hwm / (1024 * 1024), 1),
+        "uploaded_mb": round(client.uploaded_bytes / (1024 * 1024), 1),
+        "origin_requests": origin.requests,
+        "origin_mb": round(origin.bytes_sent / (1024 * 1024), 1),
+        "mirror_copies": client.copies,
+        "telegram_calls": client.calls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the bot handlers offline")
+    parser.add_argument("--scenario", choices=("drm", "ytm", "html"), default="drm")
+    parser.add_argument("--items", type=int, default=20, help="links in the generated batch")
+    parser.add_argument("--mix", default="mp4,hls,pdf,img", help="link kinds for drm/html batches")
+    parser.add_argument("--quality", default="720", help="answer to the resolution prompt")
+    parser.add_argument("--mirrors", type=int, default=0, help="mirror channels for the drm scenario's fan-out")
+    parser.add_argument("--media-bytes", default="2M", help="approximate size of each media file")
+    parser.add_argument("--origin-latency", type=float, default=0.05, help="seconds before each origin response")
+    parser.add_argument("--origin-bps", default="20M", help="origin bandwidth per response (0 = unlimited)")
+    parser.add_argument("--upload-bps", default="5M", help="simulated Telegram upload bandwidth")
+    parser.add_argument("--edit-latency", type=float, default=0.15, help="seconds per message send/edit")
+    parser.add_argument("--floodwait-rate", type=float, default=0.0, help="probability a call raises FloodWait")
+    parser.add_argument("--floodwait-seconds", type=int, default=3)
+    parser.add_argument("--sample-interval", type=float, default=0.25)
+    parser.add_argument("--keep-workdir", action="store_true", help="leave the scratch directory behind")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    origin = MediaOrigin(parse_rate(args.media_bytes), args.origin_latency, parse_rate(args.origin_bps)).start()
+    print(f"🌐 Media origin on {origin.base_url}", file=sys.stderr)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="harness-work-")
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run_scenario(args, origin, workdir))
+            with contextlib.suppress(Exception):
+                from modules.ytdlp_pool import ytdlp_pool
+                report["ytdlp_pool"] = dict(ytdlp_pool.stats)
+    finally:
+        os.chdir(cwd)
+        origin.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "keep_workdir")}
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
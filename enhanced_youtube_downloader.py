@@ -12,11 +12,33 @@ import os
 import subprocess
 import time
 from urllib.parse import urlparse, parse_qs, unquote
-from bs4 import BeautifulSoup
+import lxml.html
 import logging
 
+from modules.url_canon import youtube_id
+
 logger = logging.getLogger(__name__)
 
+# Concurrent page fetches per crawl and concurrent metadata lookups
+CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", "8"))
+INFO_CONCURRENCY = int(os.environ.get("INFO_CONCURRENCY", "8"))
+PAGE_TIMEOUT = int(os.environ.get("CRAWL_PAGE_TIMEOUT", "30"))
+
+# One pass over a page's script text finds every embed pattern:
+#   1. videoId / video_id assignments
+#   2. YouTube URLs, including JSON-escaped slashes (Elementor "youtube_url" and friends)
+EMBED_SCAN = re.compile(
+    r'["\']?(?:videoId|video_id)["\']?\s*[:=]\s*["\']([a-zA-Z0-9_-]{11})["\']'
+    r'|(https?:(?:\\?/){2}(?:[\w-]+\.)?(?:youtube(?:-nocookie)?\.com|youtu\.be)\\?/[^"\'<>\s]+)'
+)
+
+# DOM nodes that can carry an embed, visited in document order
+EMBED_NODES = (
+    "//iframe[@src] | //meta[starts-with(@property, 'og:video')]"
+    " | //script[@type='application/ld+json']"
+)
+
+
 class EnhancedYouTubeDownloader:
     """
     ENHANCED YOUTUBE DOWNLOADER WITH EMBEDDED LINK SUPPORT
@@ -78,97 +100,109 @@ class EnhancedYouTubeDownloader:
         EXTRACT EMBEDDED YOUTUBE URLS FROM ANY WEBPAGE
         ==============================================
         
-        Uses multiple methods to find embedded YouTube videos:
-        1. Direct iframe src extraction
-        2. JavaScript embedded player detection
-        3. JSON-LD structured data parsing
-        4. Open Graph meta tag parsing
-        5. Custom script tag analysis
+        Blocking variant for synchronous callers; async code should use
+        crawl_embedded_youtube_urls(). See parse_embedded_youtube_urls()
+        for the detection methods.
         """
         
-        youtube_urls = []
-        
         try:
             logger.info(f"🔍 Analyzing webpage for embedded YouTube videos: {webpage_url}")
-            
-            # Get webpage content
-            response = self.session.get(webpage_url, timeout=30)
+            response = self.session.get(webpage_url, timeout=PAGE_TIMEOUT)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Method 1: Direct iframe src extraction
-            iframes = soup.find_all('iframe')
-            for iframe in iframes:
-                src = iframe.get('src', '')
-                if self._is_youtube_url(src):
-                    youtube_id = self._extract_video_id(src)
-                    if youtube_id:
-                        youtube_urls.append(f"https://www.youtube.com/watch?v={youtube_id}")
-            
-            # Method 2: JavaScript embedded player detection
-            script_tags = soup.find_all('script')
-            for script in script_tags:
-                if script.string:
-                    # Look for YouTube video IDs in JavaScript
-                    video_ids = re.findall(r'["\']?(?:videoId|video_id)["\']?\s*[:=]\s*["\']([a-zA-Z0-9_-]{11})["\']', script.string)
-                    for video_id in video_ids:
-                        youtube_urls.append(f"https://www.youtube.com/watch?v={video_id}")
-                    
-                    # Look for embedded YouTube URLs in JavaScript
-                    embedded_urls = re.findall(r'["\']?(https?://(?:www\.)?(?:youtube\.com|youtu\.be)/[^"\'>\s]+)["\']?', script.string)
-                    for url in embedded_urls:
-                        if self._is_youtube_url(url):
-                            youtube_id = self._extract_video_id(url)
-                            if youtube_id:
-                                youtube_urls.append(f"https://www.youtube.com/watch?v={youtube_id}")
-            
-            # Method 3: JSON-LD structured data parsing
-            json_ld_scripts = soup.find_all('script', type='application/ld+json')
-            for script in json_ld_scripts:
-                try:
-                    data = json.loads(script.string)
-                    if isinstance(data, dict):
-                        # Look for VideoObject with YouTube embedUrl
-                        if data.get('@type') == 'VideoObject':
-                            embed_url = data.get('embedUrl', '')
-                            if self._is_youtube_url(embed_url):
-                                youtube_id = self._extract_video_id(embed_url)
-                                if youtube_id:
-                                    youtube_urls.append(f"https://www.youtube.com/watch?v={youtube_id}")
-                except json.JSONDecodeError:
-                    continue
-            
-            # Method 4: Open Graph meta tag parsing
-            og_video_tags = soup.find_all('meta', property=re.compile(r'og:video'))
-            for tag in og_video_tags:
-                content = tag.get('content', '')
-                if self._is_youtube_url(content):
-                    youtube_id = self._extract_video_id(content)
-                    if youtube_id:
-                        youtube_urls.append(f"https://www.youtube.com/watch?v={youtube_id}")
-            
-            # Method 5: Custom script tag analysis for specific embed patterns
-            all_text = soup.get_text()
-            
-            # Pattern for Elementor and other page builders
-            elementor_patterns = re.findall(r'"youtube_url":"(https?://[^"]+youtube[^"]+)"', all_text)
-            for url in elementor_patterns:
-                url = url.replace('\\/', '/')  # Fix escaped slashes
-                if self._is_youtube_url(url):
-                    youtube_id = self._extract_video_id(url)
-                    if youtube_id:
-                        youtube_urls.append(f"https://www.youtube.com/watch?v={youtube_id}")
-            
-            # Remove duplicates and return
-            unique_urls = list(set(youtube_urls))
+            unique_urls = self.parse_embedded_youtube_urls(response.content)
             logger.info(f"✅ Found {len(unique_urls)} embedded YouTube videos")
-            
             return unique_urls
             
         except Exception as e:
             logger.error(f"❌ Error extracting embedded YouTube URLs: {e}")
             return []
     
+    def parse_embedded_youtube_urls(self, content):
+        """
+        Find YouTube videos embedded in a page (lxml parse + one regex scan)
+        
+        Methods:
+        1. iframe src
+        2. Open Graph og:video meta tags
+        3. JSON-LD VideoObject embedUrl
+        4. videoId assignments and YouTube URLs inside scripts
+           (covers JavaScript players and page builders like Elementor)
+        
+        Returns:
+            list: watch URLs in first-seen order, without duplicates
+        """
+        
+        if not content:
+            return []
+        document = lxml.html.fromstring(content)
+        video_ids = []
+        
+        def add(url):
+            if self._is_youtube_url(url):
+                video_id = self._extract_video_id(url)
+                if video_id:
+                    video_ids.append(video_id)
+        
+        for node in document.xpath(EMBED_NODES):
+            if node.tag == "iframe":
+                add(node.get("src", ""))
+            elif node.tag == "meta":
+                add(node.get("content", ""))
+            else:
+                try:
+                    data = json.loads(node.text_content())
+                except ValueError:
+                    continue
+                if isinstance(data, dict) and data.get('@type') == 'VideoObject':
+                    add(data.get('embedUrl', ''))
+        
+        scripts = "\n".join(document.xpath("//script[not(@type='application/ld+json')]/text()"))
+        for video_id, url in EMBED_SCAN.findall(scripts):
+            if video_id:
+                video_ids.append(video_id)
+            else:
+                add(url.replace('\\/', '/'))
+        
+        return [f"https://www.youtube.com/watch?v={video_id}" for video_id in dict.fromkeys(video_ids)]
+    
+    async def crawl_embedded_youtube_urls(self, webpage_urls, concurrency=CRAWL_CONCURRENCY):
+        """
+        Fetch pages concurrently and find their embedded YouTube videos
+        
+        Parsing runs in the default executor so large pages never block the
+        event loop.
+        
+        Returns:
+            dict: page URL -> list of watch URLs (empty on fetch errors)
+        """
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        loop = asyncio.get_running_loop()
+        headers = dict(self.session.headers)
+        timeout = aiohttp.ClientTimeout(total=PAGE_TIMEOUT)
+        
+        async def crawl(session, page_url):
+            try:
+                async with semaphore:
+                    async with session.get(page_url) as response:
+                        response.raise_for_status()
+                        content = await response.read()
+                return await loop.run_in_executor(None, self.parse_embedded_youtube_urls, content)
+            except Exception as e:
+                logger.error(f"❌ Error extracting embedded YouTube URLs from {page_url}: {e}")
+                return []
+        
+        async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
+            results = await asyncio.gather(*(crawl(session, url) for url in webpage_urls))
+        found = dict(zip(webpage_urls, results))
+        logger.info(f"✅ Found {sum(map(len, results))} embedded YouTube videos on {len(found)} page(s)")
+        return found
+    
+    async def async_extract_embedded_youtube_urls(self, webpage_url):
+        """Async single-page form of extract_embedded_youtube_urls()"""
+        found = await self.crawl_embedded_youtube_urls([webpage_url])
+        return found[webpage_url]
+    
     def _is_youtube_url(self, url):
         """Check if URL is a YouTube URL"""
         if not url:
@@ -201,21 +235,14 @@ class EnhancedYouTubeDownloader:
         if not url:
             return None
         
-        # Clean the URL
-        url = unquote(url)
-        
-        # Pattern for various YouTube URL formats
-        patterns = [
-            r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/v/|youtube\.com/shorts/)([a-zA-Z0-9_-]{11})',
-            r'["\']?(?:videoId|video_id)["\']?\s*[:=]\s*["\']([a-zA-Z0-9_-]{11})["\']',
-            r'/(?:embed|v|watch)/([a-zA-Z0-9_-]{11})',
-            r'[?&]v=([a-zA-Z0-9_-]{11})',
-        ]
+        video_id = youtube_id(url)
+        if video_id:
+            return video_id
         
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        # Bare videoId assignments from page scripts
+        match = re.search(r'["\']?(?:videoId|video_id)["\']?\s*[:=]\s*["\']([a-zA-Z0-9_-]{11})["\']', unquote(url))
+        if match:
+            return match.group(1)
         
         return None
     
@@ -237,7 +264,7 @@ class EnhancedYouTubeDownloader:
         # First, determine if this is an embedded link or direct YouTube URL
         if not self._is_youtube_url(url):
             logger.info(f"🔍 Not a direct YouTube URL, extracting embedded videos...")
-            embedded_urls = self.extract_embedded_youtube_urls(url)
+            embedded_urls = await self.async_extract_embedded_youtube_urls(url)
             
             if not embedded_urls:
                 raise Exception("No YouTube videos found on the webpage")
@@ -340,13 +367,14 @@ class EnhancedYouTubeDownloader:
         GET VIDEO INFORMATION WITHOUT DOWNLOADING
         ========================================
         
-        Extracts video metadata for preview purposes
+        Extracts video metadata for preview purposes. yt-dlp runs in the
+        default executor, so many lookups can be in flight at once.
         """
         
         try:
             # Handle embedded URLs
             if not self._is_youtube_url(url):
-                embedded_urls = self.extract_embedded_youtube_urls(url)
+                embedded_urls = await self.async_extract_embedded_youtube_urls(url)
                 if embedded_urls:
                     url = embedded_urls[0]
                 else:
@@ -357,45 +385,64 @@ class EnhancedYouTubeDownloader:
                 return {'success': False, 'error': 'Could not extract video ID'}
             
             clean_url = f"https://www.youtube.com/watch?v={video_id}"
+            loop = asyncio.get_running_loop()
+            info = await loop.run_in_executor(None, self._extract_info_only, clean_url)
             
-            opts = self.ytdl_opts.copy()
-            opts.update({
-                'skip_download': True,
-                'quiet': True,
-            })
+            if not info:
+                return {'success': False, 'error': 'Could not extract video information'}
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(clean_url, download=False)
-                
-                if not info:
-                    return {'success': False, 'error': 'Could not extract video information'}
-                
-                # Format available formats
-                formats = info.get('formats', [])
-                available_formats = []
-                for fmt in formats:
-                    if fmt.get('height'):
-                        available_formats.append(f"{fmt.get('height')}p")
-                
-                # Remove duplicates and sort
-                available_formats = sorted(list(set(available_formats)), key=lambda x: int(x[:-1]), reverse=True)
-                
-                return {
-                    'success': True,
-                    'title': info.get('title', 'Unknown'),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'view_count': info.get('view_count', 0),
-                    'description': info.get('description', '')[:500] + '...' if len(info.get('description', '')) > 500 else info.get('description', ''),
-                    'video_id': video_id,
-                    'url': clean_url,
-                    'available_formats': ', '.join(available_formats) if available_formats else 'Unknown'
-                }
+            # Format available formats
+            formats = info.get('formats') or []
+            available_formats = []
+            for fmt in formats:
+                if fmt.get('height'):
+                    available_formats.append(f"{fmt.get('height')}p")
+            
+            # Remove duplicates and sort
+            available_formats = sorted(list(set(available_formats)), key=lambda x: int(x[:-1]), reverse=True)
+            description = info.get('description') or ''
+            
+            return {
+                'success': True,
+                'title': info.get('title', 'Unknown'),
+                'uploader': info.get('uploader', 'Unknown'),
+                'duration': info.get('duration') or 0,
+                'view_count': info.get('view_count') or 0,
+                'description': description[:500] + '...' if len(description) > 500 else description,
+                'video_id': video_id,
+                'url': clean_url,
+                'available_formats': ', '.join(available_formats) if available_formats else 'Unknown'
+            }
                 
         except Exception as e:
             logger.error(f"Error getting video info: {e}")
             return {'success': False, 'error': str(e)}
     
+    def _extract_info_only(self, clean_url):
+        opts = self.ytdl_opts.copy()
+        opts.update({
+            'skip_download': True,
+            'quiet': True,
+        })
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.extract_info(clean_url, download=False)
+    
+    async def get_videos_info(self, urls, concurrency=INFO_CONCURRENCY):
+        """
+        Metadata for many videos at once through a bounded pool
+        
+        Returns:
+            list: get_video_info_only() results in the order of urls
+        """
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def lookup(url):
+            async with semaphore:
+                return await self.get_video_info_only(url)
+        
+        return await asyncio.gather(*(lookup(url) for url in urls))
+    
     async def batch_extract_from_webpage(self, webpage_url):
         """
         EXTRACT ALL YOUTUBE VIDEOS FROM A WEBPAGE
@@ -405,27 +452,24 @@ class EnhancedYouTubeDownloader:
         """
         
         try:
-            youtube_urls = self.extract_embedded_youtube_urls(webpage_url)
+            youtube_urls = await self.async_extract_embedded_youtube_urls(webpage_url)
             
             if not youtube_urls:
                 return {'success': False, 'error': 'No YouTube videos found on webpage'}
             
             videos_info = []
             
-            for i, url in enumerate(youtube_urls, 1):
-                try:
-                    info = await self.get_video_info_only(url)
-                    if info['success']:
-                        videos_info.append({
-                            'index': i,
-                            'title': info['title'],
-                            'duration': info['duration'],
-                            'url': info['url'],
-                            'video_id': info['video_id']
-                        })
-                except Exception as e:
-                    logger.warning(f"Could not get info for video {i}: {e}")
-                    continue
+            for i, info in enumerate(await self.get_videos_info(youtube_urls), 1):
+                if info['success']:
+                    videos_info.append({
+                        'index': i,
+                        'title': info['title'],
+                        'duration': info['duration'],
+                        'url': info['url'],
+                        'video_id': info['video_id']
+                    })
+                else:
+                    logger.warning(f"Could not get info for video {i}: {info.get('error')}")
             
             return {
                 'success': True,
@@ -519,7 +563,7 @@ class TelegramBotIntegration:
         
         try:
             # Extract embedded videos
-            youtube_urls = self.downloader.extract_embedded_youtube_urls(webpage_url)
+            youtube_urls = await self.downloader.async_extract_embedded_youtube_urls(webpage_url)
             
             if not youtube_urls:
                 return "❌ No YouTube videos found on this webpage. Please check the URL and try again."
@@ -549,13 +593,12 @@ class TelegramBotIntegration:
                 # Multiple embedded videos - show selection
                 videos_info = []
                 
-                for i, url in enumerate(youtube_urls[:10], 1):  # Limit to 10 videos
-                    try:
-                        info = await self.downloader.get_video_info_only(url)
-                        if info['success']:
-                            duration_formatted = f"{info['duration']//60}:{info['duration']%60:02d}"
-                            videos_info.append(f"{i}. {info['title']} ({duration_formatted})")
-                    except:
+                # Limit to 10 videos, looked up concurrently
+                for i, info in enumerate(await self.downloader.get_videos_info(youtube_urls[:10]), 1):
+                    if info['success']:
+                        duration_formatted = f"{info['duration']//60}:{info['duration']%60:02d}"
+                        videos_info.append(f"{i}. {info['title']} ({duration_formatted})")
+                    else:
                         videos_info.append(f"{i}. Video {i} (info unavailable)")
                 
                 videos_list = "\n".join(videos_info)
@@ -1,40 +1,34 @@
 from vars import REPO_URL
+import io
 import os
 import re
 import sys
-import m3u8
 import json
 import time
-import pytz
 import asyncio
 import requests
-import subprocess
 import urllib
 import urllib.parse
-import yt_dlp
-import tgcrypto
-import cloudscraper
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from base64 import b64encode, b64decode
 import logging
-from bs4 import BeautifulSoup
-from modules import saini as helper
+from datetime import datetime, timedelta, timezone
+from modules import lazy_imports
+from modules.logs import export_logs
 from modules.html_handler import html_handler
 from modules.drm_handler import drm_handler
 from modules import globals
+from modules import metrics
+from modules.loop_watchdog import loop_watchdog
+from modules import coordinator
+from modules.job_queue import job_queue
 from modules.authorisation import add_auth_user, list_auth_users, remove_auth_user
 from modules.broadcast import broadcast_handler, broadusers_handler
 from modules.text_handler import text_to_txt
 from modules.youtube_handler import ytm_handler, y2t_handler, getcookies_handler, cookies_handler
 from modules.ott_downloader import ott_super_command, ott_callback_handler
 from modules.utils import progress_bar
+from modules.ultra_fast_downloader import activate_uvloop
 from vars import api_url, api_token, token_cp, adda_token, photologo, photoyt, photocp, photozip
 from vars import API_ID, API_HASH, BOT_TOKEN, OWNER, CREDIT, AUTH_USERS, TOTAL_USERS, cookies_file_path
-from aiohttp import ClientSession
-from subprocess import getstatusoutput
-from pytube import YouTube
-from aiohttp import web
 import random
 from pyromod import listen
 from pyrogram import Client
@@ -44,9 +38,14 @@ from pyrogram.errors import FloodWait, PeerIdInvalid, UserIsBlocked, InputUserDe
 from pyrogram.types.messages_and_media import message
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 import aiohttp
-import zipfile
 import shutil
-import ffmpeg
+
+lazy_imports.mark("main imports done")
+
+logger = logging.getLogger(__name__)
+
+# Must run before Client() below, which grabs the current event loop
+activate_uvloop()
 
 # Initialize the bot with ULTRA FAST upload optimization
 bot = Client(
@@ -97,25 +96,27 @@ async def ultra_fast_upload(file_path: str, chat_id: int, caption: str = None, u
         # Step 2: Ultra-fast upload WITHOUT progress callbacks (eliminates RPC bottleneck)
         start_time = time.time()
         
-        if upload_type == "video":
-            result = await bot.send_video(
-                chat_id=chat_id,
-                video=temp_file,
-                caption=caption,
-                # NO progress callback = maximum speed
-            )
-        else:
-            result = await bot.send_document(
-                chat_id=chat_id,
-                document=temp_file,
-                caption=caption,
-                # NO progress callback = maximum speed  
-            )
+        with metrics.track_job("upload"), metrics.stage_timer("upload"):
+            if upload_type == "video":
+                result = await bot.send_video(
+                    chat_id=chat_id,
+                    video=temp_file,
+                    caption=caption,
+                    # NO progress callback = maximum speed
+                )
+            else:
+                result = await bot.send_document(
+                    chat_id=chat_id,
+                    document=temp_file,
+                    caption=caption,
+                    # NO progress callback = maximum speed  
+                )
         
         # Calculate actual upload speed
         file_size = os.path.getsize(temp_file) / (1024 * 1024)  # MB
         upload_time = time.time() - start_time
         speed = file_size / upload_time if upload_time > 0 else 0
+        metrics.record_upload(os.path.getsize(temp_file), upload_time)
         
         print(f"⚡ ULTRA FAST UPLOAD: {file_size:.1f}MB in {upload_time:.1f}s = {speed:.2f} MB/s")
         
@@ -198,6 +199,7 @@ async def start(bot, m: Message):
         photo="https://envs.sh/GVI.jpg",
         caption=caption
     )
+    lazy_imports.mark("first /start reply")
 
     async def safe_edit_text(message, text):
         """Safely edit message text to prevent MESSAGE_NOT_MODIFIED errors"""
@@ -371,6 +373,9 @@ async def help_button(client, callback_query):
         f"➥ /broadcast – For Broadcasting\n"  
         f"➥ /broadusers – All Broadcasting Users\n"  
         f"➥ /reset – Reset Bot\n"
+        f"➥ /blockers – Event Loop Blockers\n"
+        f"➥ /importprofile – Startup Import Profile\n"
+        f"➥ /queue – Worker Job Queue\n"
         f"▰▰▰▰▰▰▰▰▰▰▰▰▰▰▰▰\n"  
         f"╭────────⊰◆⊱────────╮\n"   
         f" ➠ 𝐌𝐚𝐝𝐞 𝐁𝐲 : {CREDIT} 💻\n"
@@ -915,7 +920,7 @@ async def restart_button(client, callback_query):
 @bot.on_callback_query(filters.regex("logs_command"))
 async def pin_button(client, callback_query):
   keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Feature", callback_data="feat_command")]])
-  caption = f"**🖨️ Bot Working Logs:**\n\n◆/logs - Bot Send Working Logs in .txt File."
+  caption = f"**🖨️ Bot Working Logs:**\n\n◆/logs - Bot Send Working Logs as a compressed JSON export.\n◆/logs 6 warning - Last 6 hours, warnings and errors only.\n◆/logs <job id> - One batch only."
   await callback_query.message.edit_media(
     InputMediaPhoto(
       media="https://tinypic.host/images/2025/07/14/file_000000002d44622f856a002a219cf27aconversation_id68747543-56d8-800e-ae47-bb6438a09851message_id8e8cbfb5-ea6c-4f59-974a-43bdf87130c0.png",
@@ -1039,14 +1044,85 @@ async def info(bot: Client, update: Message):
 # .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
 @bot.on_message(filters.command(["logs"]))
 async def send_logs(client: Client, m: Message):  # Correct parameter name
+    # /logs [hours | since [until]] [level] [job id]
+    #   /logs 6 warning   /logs 2025-07-14T10:00 2025-07-14T12:00   /logs 1 drm-12345-3
     try:
-        with open("logs.txt", "rb") as file:
-            sent = await m.reply_text("**📤 Sending you ....**")
-            await m.reply_document(document=file)
-            await sent.delete()
+        now = datetime.now(timezone.utc)
+        since, until, level, job = now - timedelta(hours=24), None, None, None
+        bounds = []
+        for arg in m.command[1:]:
+            if arg.replace(".", "", 1).isdigit():
+                since = now - timedelta(hours=float(arg))
+            elif arg.upper() in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+                level = arg.upper()
+            elif arg[:4].isdigit() and "-" in arg:
+                stamp = datetime.fromisoformat(arg)
+                bounds.append(stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc))
+            else:
+                job = arg
+        if bounds:
+            since = bounds[0]
+            until = bounds[1] if len(bounds) > 1 else None
+        sent = await m.reply_text("**📤 Sending you ....**")
+        data, count = await asyncio.get_running_loop().run_in_executor(None, export_logs, since, until, level, job)
+        data.name = f"logs-{now:%Y%m%d-%H%M%S}.jsonl.gz"
+        caption = f"🖨️ {count} records since {since:%d-%b %H:%M} UTC"
+        if level:
+            caption += f" • {level}+"
+        if job:
+            caption += f" • job {job}"
+        await m.reply_document(document=data, caption=caption)
+        await sent.delete()
     except Exception as e:
         await m.reply_text(f"**Error sending logs:**\n<blockquote>{e}</blockquote>")
 
+# .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
+@bot.on_message(filters.command(["blockers"]) & filters.private)
+async def blockers_handler(client: Client, m: Message):
+    if m.chat.id != OWNER:
+        return
+    args = m.command[1:]
+    if args and args[0] == "reset":
+        loop_watchdog.reset()
+        await m.reply_text("<b>✅ Blocker stats cleared</b>")
+        return
+    await m.reply_text(loop_watchdog.format_report())
+    if args and args[0] == "full":
+        stacks = io.BytesIO("\n\n".join(
+            f"{row['site']} ({row['count']}x, {row['total']:.1f}s)\n{row['stack']}"
+            for row in loop_watchdog.report(limit=50)
+        ).encode())
+        stacks.name = "blockers.txt"
+        await m.reply_document(document=stacks)
+
+# .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
+@bot.on_message(filters.command(["queue"]) & filters.private)
+async def queue_handler(client: Client, m: Message):
+    if m.chat.id != OWNER:
+        return
+    try:
+        stats = await job_queue.stats()
+    except Exception as e:
+        await m.reply_text(f"<b>⚠️ Job queue unavailable:</b>\n<blockquote>{e}</blockquote>")
+        return
+    await m.reply_text(coordinator.format_stats(stats))
+
+# .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
+@bot.on_message(filters.command(["importprofile"]) & filters.private)
+async def importprofile_handler(client: Client, m: Message):
+    if m.chat.id != OWNER:
+        return
+    profile = None
+    if m.command[1:] and m.command[1] == "full":
+        status = await m.reply_text("<b>⏳ Profiling a fresh import of main...</b>")
+        try:
+            profile = await lazy_imports.importtime_profile()
+        except Exception as e:
+            await status.edit_text(f"<b>⚠️ Import profile failed:</b>\n<blockquote>{e}</blockquote>")
+            return
+        await status.delete()
+    await m.reply_text(lazy_imports.format_report(profile))
+
 # .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
 @bot.on_message(filters.command(["reset"]))
 async def restart_handler(_, m):
@@ -1075,6 +1151,9 @@ async def cancel_handler(client: Client, m: Message):
             cancel_message = await m.reply_text("**🚦 Process cancel request received. Stopping after current process...**")
             await asyncio.sleep(30)  # 30 second wait
             await cancel_message.delete()
+        elif coordinator.COORDINATOR and await job_queue.open_jobs(m.chat.id):
+            dropped = await coordinator.stop_jobs(m.chat.id)
+            await m.reply_text(f"**🚦 Queued jobs cancelled: {dropped} items dropped. Items already with a worker will finish.**")
         else:
             await m.reply_text("**⚡ No active process to cancel.**")
             
@@ -1204,12 +1283,35 @@ def reset_and_set_commands():
             {"command": "addauth", "description": "▶️ Add Authorisation"},
             {"command": "rmauth", "description": "⏸️ Remove Authorisation "},
             {"command": "users", "description": "👨‍👨‍👧‍👦 All Premium Users"},
-            {"command": "reset", "description": "✅ Reset the Bot"}
+            {"command": "reset", "description": "✅ Reset the Bot"},
+            {"command": "blockers", "description": "🧱 Event Loop Blockers"},
+            {"command": "importprofile", "description": "⏱️ Startup Import Profile"},
+            {"command": "queue", "description": "📮 Worker Job Queue"}
         ]
         requests.post(url, json={"commands": commands}, timeout=10)
         print("✅ Commands set successfully")
     except Exception as e:
         print(f"⚠️ Failed to set commands: {e}")
+
+
+def start_background_services(web_port=None):
+    """
+    Schedule long-running helper tasks on the bot's event loop (started by bot.run())
+
+    web_port: also serve /health, /metrics and /status from this loop
+    """
+    bot.loop.create_task(metrics.heartbeat_loop())
+    loop_watchdog.start(bot.loop)
+    bot.loop.call_soon(lazy_imports.mark, "event loop running")
+    from modules.housekeeping import housekeeper
+    bot.loop.create_task(housekeeper.loop())
+    if coordinator.COORDINATOR:
+        # Batches go to worker.py processes; summaries are posted from here
+        bot.loop.create_task(coordinator.report_loop(bot))
+    if web_port:
+        from modules.web_server import start_web_server
+        bot.loop.create_task(start_web_server(web_port, bot))
+    logger.info("✅ Background services scheduled")
     
 
 
@@ -1229,6 +1331,7 @@ if __name__ == "__main__":
     
     reset_and_set_commands()
     notify_owner() 
+    start_background_services()
     
     print("🤖 Bot starting...")
     bot.run()
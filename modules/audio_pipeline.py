@@ -0,0 +1,182 @@
+"""
+Audio Pipeline
+Backs /ytm. Tracks download audio-only formats through the warm yt-dlp pool,
+several at a time, and are handed back strictly in playlist order so uploads
+keep that order while later tracks are still downloading. Only YTM_CONCURRENCY
+tracks are in hand beyond the one being delivered, so slow uploads never let
+finished files pile up on disk.
+
+By default the native stream (m4a, else opus/webm) goes to Telegram as-is,
+with no re-encode. YTM_MP3=true converts to MP3 instead; conversions run
+as ffmpeg processes bounded to the number of cores, so they use every core
+without oversubscribing the host or blocking the event loop.
+"""
+
+import os
+import glob
+import asyncio
+import logging
+from collections import deque
+
+import aiohttp
+
+from . import metrics
+from .ytdlp_pool import run_ytdlp, POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Downloads run in the yt-dlp pool, so more than YTDLP_POOL_SIZE never run at once
+CONCURRENCY = int(os.environ.get("YTM_CONCURRENCY", str(POOL_SIZE)))
+MP3 = os.environ.get("YTM_MP3", "false").lower() == "true"
+TIMEOUT = int(os.environ.get("YTM_TIMEOUT", "300"))
+TRANSCODE_SLOTS = max(1, os.cpu_count() or 1)
+
+# m4a plays inline in every Telegram client; opus/webm is the fallback
+AUDIO_FORMAT = "ba[ext=m4a]/ba[acodec^=opus]/ba/b"
+# Extensions Telegram shows as a playable audio track
+AUDIO_EXTS = {".m4a", ".mp3"}
+
+_transcode_slots = None
+
+
+class AudioTrack:
+    """One link of the /ytm batch"""
+
+    __slots__ = ("index", "url", "title", "name", "path", "error")
+
+    def __init__(self, index, url):
+        self.index = index
+        self.url = url
+        self.title = "YouTube Video"
+        self.name = None
+        self.path = None
+        self.error = None
+
+    @property
+    def is_audio(self):
+        return bool(self.path) and os.path.splitext(self.path)[1].lower() in AUDIO_EXTS
+
+
+async def fetch_title(session, url):
+    try:
+        async with session.get("https://www.youtube.com/oembed", params={"url": url, "format": "json"}) as resp:
+            if resp.status == 200:
+                return (await resp.json(content_type=None)).get("title") or "YouTube Video"
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        pass
+    return "YouTube Video"
+
+
+def _output(name):
+    """The finished file yt-dlp wrote for `name` (any extension)"""
+    for path in glob.glob(glob.escape(name) + ".*"):
+        if not path.endswith((".part", ".ytdl", ".tmp")) and ".part-Frag" not in path:
+            return path
+    return None
+
+
+async def transcode_mp3(path):
+    """Re-encode to MP3 in a bounded ffmpeg slot; returns the new path or None"""
+    global _transcode_slots
+    if _transcode_slots is None:
+        _transcode_slots = asyncio.Semaphore(TRANSCODE_SLOTS)
+    out = os.path.splitext(path)[0] + ".mp3"
+    async with _transcode_slots:
+        with metrics.stage_timer("encode"):
+            proc = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", path,
+                "-vn", "-c:a", "libmp3lame", "-q:a", "2", out,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+            _, err = await proc.communicate()
+    if proc.returncode != 0 or not os.path.exists(out):
+        logger.warning("MP3 conversion failed for %s: %s", path, err.decode(errors="replace").strip()[:200])
+        return None
+    os.remove(path)
+    return out
+
+
+class AudioPipeline:
+    """Concurrent downloads, ordered delivery"""
+
+    def __init__(self, cookies, sanitize, suffix="", concurrency=CONCURRENCY, mp3=MP3):
+        self.cookies = cookies
+        self.sanitize = sanitize
+        self.suffix = suffix
+        self.mp3 = mp3
+        self.concurrency = max(1, concurrency)
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.tasks = deque()
+
+    async def _download(self, cmd):
+        """run_ytdlp with TIMEOUT counted from the job's start, not its wait for a pool slot"""
+        started = asyncio.get_running_loop().create_future()
+
+        def on_event(event):
+            if event.get("event") == "start" and not started.done():
+                started.set_result(None)
+
+        job = asyncio.ensure_future(run_ytdlp(cmd, on_event=on_event))
+        try:
+            await asyncio.wait({job, started}, return_when=asyncio.FIRST_COMPLETED)
+            done, _ = await asyncio.wait({job}, timeout=TIMEOUT)
+            if not done:
+                raise asyncio.TimeoutError
+            return job.result()
+        finally:
+            if not job.done():
+                # Cancelling kills the worker; wait so no partial file is left being written
+                job.cancel()
+                await asyncio.wait({job})
+
+    async def _prepare(self, session, track):
+        async with self.slots:
+            track.title = (await fetch_title(session, track.url)).replace("_", " ")
+            track.name = f"{track.index:03d}_{self.sanitize(track.title)[:60]}_{self.suffix}"
+            cmd = ["yt-dlp", "-f", AUDIO_FORMAT, "--cookies", self.cookies, track.url, "-o", f"{track.name}.%(ext)s"]
+            try:
+                result = await self._download(cmd)
+                if result["returncode"] != 0:
+                    track.error = result.get("error") or f"yt-dlp exited with {result['returncode']}"
+            except asyncio.TimeoutError:
+                track.error = f"timed out after {TIMEOUT}s"
+            except Exception as e:
+                track.error = str(e)
+            track.path = _output(track.name)
+        if track.path is None:
+            track.error = track.error or "no file after download"
+        elif self.mp3 and not track.path.endswith(".mp3"):
+            converted = await transcode_mp3(track.path)
+            if converted:
+                track.path = converted
+            else:
+                track.error = "MP3 conversion failed"
+        return track
+
+    async def tracks(self, urls, start=1):
+        """Yield AudioTracks in the order of `urls` as each becomes ready"""
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            upcoming = enumerate(urls)
+
+            def fill():
+                for n, url in upcoming:
+                    self.tasks.append(asyncio.ensure_future(self._prepare(session, AudioTrack(start + n, url))))
+                    if len(self.tasks) >= self.concurrency:
+                        return
+
+            try:
+                fill()
+                while self.tasks:
+                    track = await self.tasks[0]
+                    self.tasks.popleft()
+                    # The next track starts while this one is being delivered
+                    fill()
+                    yield track
+            finally:
+                self.cancel()
+
+    def cancel(self):
+        """Stop downloads that have not been delivered yet"""
+        for task in self.tasks:
+            if not task.done():
+                task.cancel()
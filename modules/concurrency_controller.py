@@ -0,0 +1,185 @@
+"""
+Adaptive Concurrency Controller
+Single source of truth for yt-dlp fragment concurrency (each concurrent
+fragment is one HTTP connection). Settings are tuned per host with an AIMD
+rule from measured throughput, error rate and memory headroom under the
+container limit (from the memory governor), and the best setting seen for
+each host is remembered across runs.
+"""
+
+import os
+import json
+import atexit
+import threading
+import logging
+from urllib.parse import urlparse
+
+from vars import STATE_DIR
+from .memory_governor import memory_governor
+
+logger = logging.getLogger(__name__)
+
+MIN_FRAGMENTS = int(os.environ.get("CONCURRENCY_MIN_FRAGMENTS", "1"))
+MAX_FRAGMENTS = int(os.environ.get("CONCURRENCY_MAX_FRAGMENTS", "16"))
+DEFAULT_FRAGMENTS = int(os.environ.get("CONCURRENCY_DEFAULT_FRAGMENTS", "4"))
+# Below this much available memory concurrency is cut instead of raised
+MIN_HEADROOM_MB = int(os.environ.get("CONCURRENCY_MIN_HEADROOM_MB", "150"))
+# Retries per fragment above which a transfer counts as congested
+MAX_ERROR_RATE = float(os.environ.get("CONCURRENCY_MAX_ERROR_RATE", "0.05"))
+# Transfers smaller than this are too short to judge throughput
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024
+# Changes are written at most this often (seconds), off the event loop
+SAVE_DELAY = float(os.environ.get("CONCURRENCY_SAVE_DELAY", "30"))
+
+STATE_FILE = os.path.join(STATE_DIR, "concurrency.json")
+
+
+def host_key(url):
+    """Host used to group tuning data ('www.' stripped, lowercase)"""
+    host = (urlparse(url).hostname or "").lower() if url else ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def memory_headroom_mb():
+    """Memory left under the container limit in MB (see memory_governor)"""
+    return memory_governor.headroom_mb()
+
+
+class ConcurrencyController:
+    """Per-host AIMD tuning of fragment concurrency"""
+
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        self.hosts = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._save_timer = None
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                self.hosts = json.load(f)
+        except FileNotFoundError:
+            self.hosts = {}
+        except Exception as e:
+            logger.warning("Ignoring unreadable concurrency state: %s", e)
+            self.hosts = {}
+        # Start every host from the best setting seen in previous runs
+        for state in self.hosts.values():
+            state["fragments"] = state.get("best_fragments", DEFAULT_FRAGMENTS)
+
+    def _schedule_save(self):
+        # Caller holds self._lock; one timer covers every change until it fires
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes now (timer thread, shutdown)"""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            data = json.dumps(self.hosts, indent=1, sort_keys=True)
+        with self._write_lock:
+            try:
+                os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+                staged = self.state_file + ".new"
+                with open(staged, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(staged, self.state_file)
+            except Exception as e:
+                logger.warning("Could not save concurrency state: %s", e)
+
+    def _state(self, host):
+        return self.hosts.setdefault(host, {
+            "fragments": DEFAULT_FRAGMENTS,
+            "best_fragments": DEFAULT_FRAGMENTS,
+            "best_speed": 0,
+            "speeds": {},
+        })
+
+    def fragments_for(self, url):
+        """Fragment concurrency to use for the next transfer from url's host"""
+        with self._lock:
+            fragments = self._state(host_key(url))["fragments"]
+        fragments = memory_governor.fragment_cap(fragments)
+        headroom = memory_headroom_mb()
+        if headroom is not None and headroom < MIN_HEADROOM_MB:
+            fragments = max(MIN_FRAGMENTS, fragments // 2)
+        return max(MIN_FRAGMENTS, fragments)
+
+    def record(self, url, avg_speed, downloaded_bytes, retries=0, fragment_count=None, ok=True):
+        """
+        Feed the outcome of a transfer back into the controller
+
+        Additive increase (+1) while throughput holds up; multiplicative
+        decrease (halve) on failures, high retry rates or low memory, and a
+        step back to the best known level when more fragments got slower.
+        """
+        host = host_key(url)
+        headroom = memory_headroom_mb()
+        with self._lock:
+            state = self._state(host)
+            current = state["fragments"]
+            error_rate = retries / max(1, fragment_count or 1)
+
+            if not ok or error_rate > MAX_ERROR_RATE or (headroom is not None and headroom < MIN_HEADROOM_MB):
+                state["fragments"] = max(MIN_FRAGMENTS, current // 2)
+            elif downloaded_bytes >= MIN_SAMPLE_BYTES and avg_speed:
+                # Exponentially weighted speed per concurrency level
+                key = str(current)
+                previous = state["speeds"].get(key)
+                speed = avg_speed if previous is None else 0.7 * previous + 0.3 * avg_speed
+                state["speeds"][key] = round(speed)
+
+                if speed >= state["best_speed"] or current == state["best_fragments"]:
+                    if speed >= state["best_speed"]:
+                        state["best_speed"] = round(speed)
+                        state["best_fragments"] = current
+                    state["fragments"] = min(MAX_FRAGMENTS, current + 1)
+                elif speed < 0.9 * state["best_speed"]:
+                    state["fragments"] = state["best_fragments"]
+            else:
+                return state["fragments"]
+
+            if state["fragments"] != current:
+                logger.info("Concurrency for %s: %d -> %d fragments", host or "?", current, state["fragments"])
+            self._schedule_save()
+            return state["fragments"]
+
+    def record_telemetry(self, telemetry, ok):
+        """Convenience wrapper taking a DownloadTelemetry"""
+        return self.record(telemetry.url, telemetry.average_speed, telemetry.downloaded_bytes,
+                           telemetry.retries, telemetry.fragment_count, ok)
+
+    def apply_to_args(self, cmd_args, url):
+        """Return yt-dlp argv with exactly one --concurrent-fragments setting"""
+        args = []
+        skip = False
+        for arg in cmd_args:
+            if skip:
+                skip = False
+                continue
+            if arg in ("--concurrent-fragments", "-N"):
+                skip = True
+                continue
+            if arg.startswith("--concurrent-fragments="):
+                continue
+            args.append(arg)
+        insert_at = 1 if args and args[0] == "yt-dlp" else 0
+        args[insert_at:insert_at] = ["--concurrent-fragments", str(self.fragments_for(url))]
+        return args
+
+    def apply_to_opts(self, ydl_opts, url):
+        """Set concurrent_fragments in a YoutubeDL options dict"""
+        ydl_opts["concurrent_fragments"] = self.fragments_for(url)
+        return ydl_opts
+
+
+# Global controller instance
+concurrency_controller = ConcurrencyController()
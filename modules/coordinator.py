@@ -0,0 +1,140 @@
+"""
+Coordinator
+With BOT_MODE=coordinator the bot process only takes commands: drm_handler
+resolves each link of a batch (title, signed URL, keys, yt-dlp command,
+caption) and queues it in modules.job_queue instead of downloading it.
+worker.py processes, on this host or on others sharing the queue, lease
+the items and do the downloading, encoding and uploading, so throughput
+grows with the number of workers.
+
+The report loop here posts failures the workers could not (items whose
+worker died on every attempt) and the batch summary once a job is settled.
+"""
+
+import os
+import asyncio
+import logging
+
+from pyrogram.errors import FloodWait
+
+from . import metrics
+from .fanout import FanOut
+from .job_queue import job_queue, QUEUED, LEASED, DONE, FAILED, CANCELLED, LOST_WORKER
+from .job_runner import failure_text, units
+
+logger = logging.getLogger(__name__)
+
+BOT_MODE = os.environ.get("BOT_MODE", "standalone").lower()
+COORDINATOR = BOT_MODE == "coordinator"
+REPORT_INTERVAL = int(os.environ.get("JOB_REPORT_INTERVAL", "10"))
+# Failed report passes before a job is given up on and marked reported
+REPORT_ATTEMPTS = int(os.environ.get("JOB_REPORT_ATTEMPTS", "5"))
+
+# Failure notices already posted per job, so a retried report does not repeat them
+_posted = {}
+_report_failures = {}
+
+
+def batch_summary(b_name, total, failed, video_count, pdf_count, img_count):
+    return (f"<b>-┈━═.•°✅ Completed ✅°•.═━┈-</b>\n<blockquote><b>🎯Batch Name : {b_name}</b></blockquote>\n"
+            f"<blockquote>🔗 Total URLs: {total} \n┃   ┠🔴 Total Failed URLs: {failed}\n"
+            f"┃   ┠🟢 Total Successful URLs: {total - failed}\n┃   ┃   ┠🎥 Total Video URLs: {video_count}\n"
+            f"┃   ┃   ┠📄 Total PDF URLs: {pdf_count}\n┃   ┃   ┠📸 Total IMAGE URLs: {img_count}</blockquote>\n")
+
+
+def tally(job):
+    """
+    Failed links of a settled job
+
+    Returns:
+        tuple: (failed count, [(payload, error)] for failures nobody has posted yet)
+    """
+    failed = job.meta.get("coordinator_failed", 0)
+    unposted = []
+    for status, payload, result, error in job.items:
+        if result:
+            failed += result.get("failed", 0)
+            if status == FAILED and not result.get("notified"):
+                unposted.append((payload, error))
+        elif status in (FAILED, CANCELLED):
+            failed += units(payload)
+            if status == FAILED:
+                unposted.append((payload, error))
+    return failed, unposted
+
+
+async def report(bot, job):
+    """Post a settled job's outstanding failures and summary; returns the failed count"""
+    meta = job.meta
+    channel_id = meta["channel_id"]
+    failed, unposted = tally(job)
+    for n, (payload, error) in enumerate(unposted):
+        if n < _posted.get(job.id, 0):
+            continue
+        await bot.send_message(channel_id, failure_text(payload.get("label"), payload.get("url"), error or LOST_WORKER), disable_web_page_preview=True)
+        _posted[job.id] = n + 1
+    if meta.get("cancelled"):
+        await bot.send_message(meta["chat_id"], f"🚦**STOPPED**🚦\n<blockquote>Job `{job.id}`: {meta['total'] - failed} done, {failed} failed or dropped</blockquote>")
+        return failed
+    if meta.get("document"):
+        fanout = FanOut(bot, meta.get("destinations") or [channel_id])
+        summary = await bot.send_message(channel_id, batch_summary(meta["b_name"], meta["total"], failed, meta["video_count"], meta["pdf_count"], meta["img_count"]))
+        fanout.replicate(summary)
+        await fanout.drain()
+        if meta.get("notify_user"):
+            await bot.send_message(meta["chat_id"], "<blockquote><b>✅ Your Task is completed, please check your Set Channel📱</b></blockquote>")
+    logger.info("📮 Job %s settled: %d of %d links failed", job.id, failed, meta["total"])
+    return failed
+
+
+async def stop_jobs(chat_id):
+    """Cancel the user's queued jobs; items already with a worker finish. Returns items dropped"""
+    dropped = 0
+    for job_id in await job_queue.open_jobs(chat_id):
+        await job_queue.close(job_id, cancelled=True)
+        dropped += await job_queue.cancel(job_id)
+    return dropped
+
+
+async def report_loop(bot, interval=REPORT_INTERVAL):
+    """Report settled jobs and export the queue depth (coordinator mode only)"""
+    while True:
+        try:
+            for job in await job_queue.finished_jobs():
+                # Jobs are marked only once reported; a failed report is retried on a later pass
+                try:
+                    failed = await report(bot, job)
+                except FloodWait as e:
+                    metrics.record_floodwait(e.value)
+                    await asyncio.sleep(e.value)
+                    break
+                except Exception as e:
+                    attempts = _report_failures[job.id] = _report_failures.get(job.id, 0) + 1
+                    if attempts < REPORT_ATTEMPTS:
+                        logger.error("Report for job %s failed (%d/%d), retrying next pass: %s", job.id, attempts, REPORT_ATTEMPTS, e)
+                        continue
+                    logger.error("Report for job %s failed %d times, giving up: %s", job.id, attempts, e)
+                else:
+                    metrics.items_total.inc(job.meta["total"] - failed, result="ok")
+                    metrics.items_total.inc(failed, result="failed")
+                _posted.pop(job.id, None)
+                _report_failures.pop(job.id, None)
+                await job_queue.mark_reported(job.id)
+            stats = await job_queue.stats()
+            metrics.queue_depth.set(stats["items"].get(QUEUED, 0), queue="jobs")
+        except Exception as e:
+            logger.error("Job report loop error: %s", e)
+        await asyncio.sleep(interval)
+
+
+def format_stats(stats):
+    items = stats["items"]
+    workers = "\n".join(f"• `{worker}`" for worker in stats["workers"]) or "• none active"
+    return (f"<b>📮 Job Queue</b> ({BOT_MODE} mode)\n"
+            f"<blockquote>Open jobs : {stats['open_jobs']}\n"
+            f"Queued : {items.get(QUEUED, 0)}\n"
+            f"In progress : {items.get(LEASED, 0)}\n"
+            f"Done : {items.get(DONE, 0)}\n"
+            f"Failed : {items.get(FAILED, 0)}\n"
+            f"Cancelled : {items.get(CANCELLED, 0)}</blockquote>\n"
+            f"<b>Workers holding leases:</b>\n{workers}")
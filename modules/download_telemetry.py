@@ -0,0 +1,236 @@
+"""
+Download Telemetry & Stall Detection
+Turns yt-dlp progress/log events into per-item throughput stats, detects
+transfers that stopped making progress and keeps a JSONL history of every
+item's throughput for later analysis.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+
+from vars import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Seconds without any new bytes before a transfer is considered stalled
+STALL_SECONDS = int(os.environ.get("DOWNLOAD_STALL_SECONDS", "120"))
+# How many times a stalled transfer is restarted before giving up
+STALL_RETRIES = int(os.environ.get("DOWNLOAD_STALL_RETRIES", "2"))
+# Minimum seconds between live progress message edits (Telegram rate limits)
+PROGRESS_EDIT_INTERVAL = int(os.environ.get("PROGRESS_EDIT_INTERVAL", "10"))
+
+HISTORY_FILE = os.path.join(STATE_DIR, "throughput_history.jsonl")
+
+
+def _human_bytes(size):
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+class DownloadTelemetry:
+    """Live throughput stats for a single download item"""
+
+    def __init__(self, name, url=""):
+        self.name = name
+        self.url = url
+        self.started = time.time()
+        self.last_progress = self.started
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.fragment_index = None
+        self.fragment_count = None
+        self.retries = 0
+        self.restarts = 0
+        self.status = "running"
+        self.waiting = True  # queued for memory headroom or a pool slot
+        self.postprocessor = None  # merge/fixup running, which reports no bytes
+        self.samples = []  # (elapsed seconds, bytes/s), one per second at most
+        self._bytes_before = 0  # bytes from finished files (video + audio)
+
+    def feed(self, event):
+        """Consume a yt-dlp pool event (see ytdlp_pool)"""
+        kind = event.get("event")
+        if kind == "start":
+            # The job left the queue: throughput and the stall clock count from here
+            now = time.time()
+            if self.waiting and not self.restarts:
+                self.started = now
+            self.waiting = False
+            self.last_progress = now
+        elif kind == "progress":
+            data = event.get("data") or {}
+            downloaded = (data.get("downloaded_bytes") or 0) + self._bytes_before
+            if downloaded > self.downloaded_bytes:
+                self.downloaded_bytes = downloaded
+                self.last_progress = time.time()
+            if data.get("status") == "finished":
+                self._bytes_before = self.downloaded_bytes
+            self.total_bytes = data.get("total_bytes") or data.get("total_bytes_estimate") or self.total_bytes
+            self.speed = data.get("speed")
+            self.fragment_index = data.get("fragment_index")
+            self.fragment_count = data.get("fragment_count")
+            if self.speed:
+                elapsed = round(time.time() - self.started)
+                if not self.samples or self.samples[-1][0] != elapsed:
+                    self.samples.append((elapsed, round(self.speed)))
+        elif kind == "postprocess":
+            data = event.get("data") or {}
+            self.postprocessor = data.get("postprocessor") if data.get("status") == "started" else None
+            self.last_progress = time.time()
+        elif kind == "log":
+            if "Retrying" in (event.get("msg") or ""):
+                self.retries += 1
+
+    def restart(self):
+        """Reset the stall clock when a transfer is restarted"""
+        self.restarts += 1
+        self.waiting = True
+        self.postprocessor = None
+        self.last_progress = time.time()
+        self._bytes_before = 0
+        self.downloaded_bytes = 0
+
+    @property
+    def idle_seconds(self):
+        return time.time() - self.last_progress
+
+    def is_stalled(self, stall_seconds=STALL_SECONDS):
+        # Waiting for memory headroom or a pool slot, or an ffmpeg merge of a
+        # large file, is not a stall
+        if self.waiting or self.postprocessor:
+            return False
+        return self.idle_seconds >= stall_seconds
+
+    @property
+    def average_speed(self):
+        elapsed = time.time() - self.started
+        return self.downloaded_bytes / elapsed if elapsed > 0 else 0
+
+    def progress_text(self):
+        """Short human readable progress line for Telegram"""
+        if self.waiting:
+            return "⏳ Waiting for a download slot"
+        if self.postprocessor:
+            return f"⚙️ {self.postprocessor} | {_human_bytes(self.downloaded_bytes)}"
+        parts = [_human_bytes(self.downloaded_bytes)]
+        if self.total_bytes:
+            percent = min(100.0, self.downloaded_bytes * 100 / self.total_bytes)
+            parts[0] += f" / {_human_bytes(self.total_bytes)} ({percent:.1f}%)"
+        if self.speed:
+            parts.append(f"{_human_bytes(self.speed)}/s")
+        if self.fragment_count:
+            parts.append(f"frag {self.fragment_index or 0}/{self.fragment_count}")
+        if self.retries:
+            parts.append(f"{self.retries} retries")
+        return " | ".join(parts)
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "status": self.status,
+            "started": round(self.started, 3),
+            "duration": round(time.time() - self.started, 3),
+            "bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "avg_speed": round(self.average_speed),
+            "fragments": self.fragment_count,
+            "retries": self.retries,
+            "restarts": self.restarts,
+            "samples": self.samples,
+        }
+
+
+def record_history(telemetry):
+    """Append an item's throughput summary to the JSONL history file"""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(telemetry.summary()) + "\n")
+    except Exception as e:
+        logger.warning("Could not record throughput history: %s", e)
+
+
+def load_history(limit=100):
+    """Return the most recent throughput history records"""
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+class ProgressReporter:
+    """Throttled live progress edits of a Telegram message"""
+
+    def __init__(self, message, header, interval=PROGRESS_EDIT_INTERVAL):
+        self.message = message
+        self.header = header
+        self.interval = interval
+        self._last_edit = 0
+        self._last_text = None
+
+    async def update(self, telemetry, note=None):
+        if self.message is None or time.time() - self._last_edit < self.interval:
+            return
+        text = f"{self.header}\n<blockquote>{telemetry.progress_text()}</blockquote>"
+        if note:
+            text += f"\n{note}"
+        if text == self._last_text:
+            return
+        self._last_edit = time.time()
+        self._last_text = text
+        try:
+            await self.message.edit_text(text, disable_web_page_preview=True)
+        except Exception as e:
+            # FloodWait / MessageNotModified must never break the download
+            logger.debug("Progress edit skipped: %s", e)
+
+
+async def watch_download(job, telemetry, reporter=None, stall_seconds=STALL_SECONDS, poll=5):
+    """
+    Await a download coroutine while watching it for stalls
+
+    Args:
+        job: Coroutine running the transfer (fed events via telemetry.feed)
+        telemetry: DownloadTelemetry receiving the job's events
+        reporter: Optional ProgressReporter for live message edits
+        stall_seconds: No-progress window before the job is cancelled
+
+    Returns:
+        tuple: (result or None, stalled bool)
+    """
+    task = asyncio.ensure_future(job)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result(), False
+            if telemetry.is_stalled(stall_seconds):
+                logger.warning("⚠️ Download stalled (%ds without progress): %s", int(telemetry.idle_seconds), telemetry.name)
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return None, True
+            logger.info("%s", telemetry.progress_text(), extra={"sample": "download_progress"})
+            if reporter:
+                await reporter.update(telemetry)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -1,24 +1,19 @@
 import os
 import re
 import sys
-import m3u8
 import json
 import time
-import pytz
 import asyncio
+import bisect
 import requests
 import subprocess
 import urllib
 import urllib.parse
-import yt_dlp
-import tgcrypto
-import cloudscraper
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from base64 import b64encode, b64decode
-from .logs import logging
-from bs4 import BeautifulSoup
+from .logs import logging, job_scope, set_item, job_id
+from .lazy_imports import lazy_import
 from . import saini as helper
+from .ytdlp_pool import run_ytdlp
+from . import metrics
 from . import html_handler
 from . import globals
 from .authorisation import add_auth_user, list_auth_users, remove_auth_user
@@ -26,12 +21,19 @@ from .broadcast import broadcast_handler, broadusers_handler
 from .text_handler import text_to_txt
 from .youtube_handler import ytm_handler, y2t_handler, getcookies_handler, cookies_handler
 from .utils import progress_bar, cleanup_temp_files, final_cleanup
+from .url_canon import canonical_url, dedupe_links
+from . import link_router
+from .link_router import route_links, count_kinds, COUNT_ORDER
+from .album_batcher import AlbumBatcher
+from .fanout import FanOut, parse_destinations
+from .format_planner import format_planner, fallback_selector
+from .job_queue import job_queue
+from .job_runner import ALBUM
+from .coordinator import COORDINATOR, batch_summary
 from vars import API_ID, API_HASH, BOT_TOKEN, OWNER, CREDIT, AUTH_USERS, TOTAL_USERS, cookies_file_path
 from vars import api_url, api_token, token_cp, adda_token, photologo, photoyt, photocp, photozip
 from aiohttp import ClientSession
 from subprocess import getstatusoutput
-from pytube import YouTube
-from aiohttp import web
 import random
 from pyromod import listen
 from pyrogram import Client
@@ -41,18 +43,83 @@ from pyrogram.errors import FloodWait, PeerIdInvalid, UserIsBlocked, InputUserDe
 from pyrogram.types.messages_and_media import message
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 import aiohttp
-import zipfile
 import shutil
-import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules load on first use by the handler that needs them
+cloudscraper = lazy_import("cloudscraper")
 
 # .....,.....,.......,...,.......,....., .....,.....,.......,...,.......,.....,
 
 
+def parse_links(lines):
+    """
+    Parse batch lines into (title, url) pairs
+
+    Supports 'title:url' lines, a title line followed by a URL line, and
+    bare URL lines (titled "URL"). A single URL input is returned as-is.
+    """
+    links = []
+
+    # Clean up lines and remove empty ones
+    clean_lines = [line.strip() for line in lines if line.strip()]
+
+    # Handle different input formats
+    if len(clean_lines) == 1 and "://" in clean_lines[0]:
+        # Single URL input - extract title using yt-dlp
+        url = clean_lines[0]
+        links.append(("URL", url))
+    else:
+        # Process alternating title/URL format or other patterns
+        i = 0
+        while i < len(clean_lines):
+            current_line = clean_lines[i]
+
+            # Check if current line contains both title and URL (title: url format)
+            if ":" in current_line and ("http://" in current_line or "https://" in current_line):
+                parts = current_line.split(":", 1)
+                if len(parts) == 2:
+                    title = parts[0].strip()
+                    url = parts[1].strip()
+                    links.append((title, url))
+                i += 1
+
+            # Check alternating format: title line followed by URL line
+            elif (i + 1 < len(clean_lines) 
+                  and not ("http://" in current_line or "https://" in current_line)
+                  and ("http://" in clean_lines[i + 1] or "https://" in clean_lines[i + 1])):
+                title = current_line.strip()
+                url = clean_lines[i + 1].strip()
+                links.append((title, url))
+                i += 2  # Skip both title and URL lines
+
+            # URL only line (fallback)
+            elif "://" in current_line:
+                url = current_line.strip()
+                links.append(("URL", url))
+                i += 1
+            else:
+                i += 1
+
+    return links
+
+
+async def flush_album(bot, album, channel_id, fanout):
+    """Send the pending album, mirror it and report its failures; returns the failure count"""
+    sent, failed = await album.flush()
+    fanout.replicate(sent)
+    for item, reason in failed:
+        await bot.send_message(channel_id, f'⚠️**Downloading Failed**⚠️\n**Name** =>> `{item.label}`\n**Url** =>> {item.url}\n\n<blockquote expandable><i><b>Failed Reason: {reason}</b></i></blockquote>', disable_web_page_preview=True)
+    return len(failed)
+
+
+@job_scope("drm")
 async def drm_handler(bot: Client, m: Message):
     # Clean up all temporary files before starting new download
     cleaned_count = cleanup_temp_files()
     if cleaned_count > 0:
-        print(f"🧹 Cleaned {cleaned_count} temporary files before starting download")
+        logger.info(f"🧹 Cleaned {cleaned_count} temporary files before starting download")
     
     globals.processing_request = True
     globals.cancel_requested = False
@@ -138,89 +205,31 @@ async def drm_handler(bot: Client, m: Message):
 
     if m.document:
         if m.chat.id not in AUTH_USERS:
-            print(f"User ID not in AUTH_USERS", m.chat.id)
+            logger.warning("User ID not in AUTH_USERS: %s", m.chat.id)
             await bot.send_message(m.chat.id, f"<blockquote>__**Oopss! You are not a Premium member\nPLEASE /upgrade YOUR PLAN\nSend me your user id for authorization\nYour User id**__ - `{m.chat.id}`</blockquote>\n")
             return
 
-    pdf_count = 0
-    img_count = 0
-    v2_count = 0
-    mpd_count = 0
-    m3u8_count = 0
-    yt_count = 0
-    drm_count = 0
-    zip_count = 0
-    other_count = 0
-    
-    links = []
-    
-    # Clean up lines and remove empty ones
-    clean_lines = [line.strip() for line in lines if line.strip()]
-    
-    # Handle different input formats
-    if len(clean_lines) == 1 and "://" in clean_lines[0]:
-        # Single URL input - extract title using yt-dlp
-        url = clean_lines[0]
-        links.append(("URL", url))
-    else:
-        # Process alternating title/URL format or other patterns
-        i = 0
-        while i < len(clean_lines):
-            current_line = clean_lines[i]
-            
-            # Check if current line contains both title and URL (title: url format)
-            if ":" in current_line and ("http://" in current_line or "https://" in current_line):
-                parts = current_line.split(":", 1)
-                if len(parts) == 2:
-                    title = parts[0].strip()
-                    url = parts[1].strip()
-                    links.append((title, url))
-                i += 1
-            
-            # Check alternating format: title line followed by URL line
-            elif (i + 1 < len(clean_lines) 
-                  and not ("http://" in current_line or "https://" in current_line)
-                  and ("http://" in clean_lines[i + 1] or "https://" in clean_lines[i + 1])):
-                title = current_line.strip()
-                url = clean_lines[i + 1].strip()
-                links.append((title, url))
-                i += 2  # Skip both title and URL lines
-            
-            # URL only line (fallback)
-            elif "://" in current_line:
-                url = current_line.strip()
-                links.append(("URL", url))
-                i += 1
-            else:
-                i += 1
-    
-    # Count different types of URLs
-    for title, url in links:
-        if ".pdf" in url:
-            pdf_count += 1
-        elif url.endswith((".png", ".jpeg", ".jpg")):
-            img_count += 1
-        elif "v2" in url:
-            v2_count += 1
-        elif "mpd" in url:
-            mpd_count += 1
-        elif "m3u8" in url:
-            m3u8_count += 1
-        elif "drm" in url:
-            drm_count += 1
-        elif "youtu" in url:
-            yt_count += 1
-        elif "zip" in url:
-            zip_count += 1
-        else:
-            other_count += 1
+    links = parse_links(lines)
+    # Repeated links (same video in another URL form) are dropped before any download
+    links, duplicates = dedupe_links(links)
+    # Line of the original file behind each kept link, for the start index
+    positions = [i for i in range(len(links) + len(duplicates)) if i not in duplicates]
+    if duplicates:
+        logger.info(f"🔁 Dropped {len(duplicates)} duplicate links from the batch")
+
+    # Each link is classified once; counts and dispatch both read these routes
+    routes = route_links(links)
+    counts = count_kinds(routes)
+    pdf_count, img_count, v2_count, mpd_count, m3u8_count, drm_count, yt_count, zip_count, other_count = (
+        counts[key] for key in COUNT_ORDER)
                     
     if not links:
         await m.reply_text("<b>🔹Invalid Input.</b>")
         return
 
     if m.document:
-        editable = await m.reply_text(f"**Total 🔗 links found are {len(links)}\n<blockquote>•PDF : {pdf_count}      •V2 : {v2_count}\n•Img : {img_count}      •YT : {yt_count}\n•zip : {zip_count}       •m3u8 : {m3u8_count}\n•drm : {drm_count}      •Other : {other_count}\n•mpd : {mpd_count}</blockquote>\nSend From where you want to download**")
+        dup_note = f"🔁 Duplicates skipped : {len(duplicates)}\n" if duplicates else ""
+        editable = await m.reply_text(f"**Total 🔗 links found are {len(links)}\n<blockquote>•PDF : {pdf_count}      •V2 : {v2_count}\n•Img : {img_count}      •YT : {yt_count}\n•zip : {zip_count}       •m3u8 : {m3u8_count}\n•drm : {drm_count}      •Other : {other_count}\n•mpd : {mpd_count}</blockquote>\n{dup_note}Send From where you want to download**")
         try:
             input0: Message = await bot.listen(editable.chat.id, timeout=20)
             raw_text = input0.text if input0.text else '1'
@@ -287,7 +296,7 @@ async def drm_handler(bot: Client, m: Message):
         globals.quality = quality 
         globals.res = res
 
-        await editable.edit("__**⚠️Provide the Channel ID or send /d__\n\n<blockquote><i>🔹 Make me an admin to upload.\n🔸Send /id in your channel to get the Channel ID.\n\nExample: Channel ID = -100XXXXXXXXXXX</i></blockquote>\n**")
+        await editable.edit("__**⚠️Provide the Channel ID or send /d__\n\n<blockquote><i>🔹 Make me an admin to upload.\n🔸Send /id in your channel to get the Channel ID.\n\nExample: Channel ID = -100XXXXXXXXXXX\n🔹 Send several IDs separated by spaces to mirror the batch; files upload once and are copied to the rest.</i></blockquote>\n**")
         try:
             # Increased timeout for Render deployment stability
             input7: Message = await bot.listen(editable.chat.id, timeout=60)
@@ -296,14 +305,12 @@ async def drm_handler(bot: Client, m: Message):
         except asyncio.TimeoutError:
             raw_text7 = '/d'
 
-        if "/d" in raw_text7:
-            channel_id = m.chat.id
-        else:
-            channel_id = raw_text7    
+        # Several ids mirror the batch: upload to the first, copy to the rest
+        channel_id = parse_destinations(raw_text7, m.chat.id)[0]
         await editable.delete()
 
     elif m.text:
-        if any(ext in links[i][1] for ext in [".pdf", ".jpeg", ".jpg", ".png"] for i in range(len(links))):
+        if any(route.kind in (link_router.PDF, link_router.IMAGE) for route in routes):
             raw_text = '1'
             raw_text7 = '/d'
             channel_id = m.chat.id
@@ -346,15 +353,19 @@ async def drm_handler(bot: Client, m: Message):
             b_name = '**Link Input**'
             await editable.delete()
         
+    # Workers fetch the thumbnail themselves, so they get the original link
+    thumb_src = thumb
     if thumb.startswith("http://") or thumb.startswith("https://"):
         getstatusoutput(f"wget '{thumb}' -O 'thumb.jpg'")
         thumb = "thumb.jpg"
     else:
         thumb = thumb
 
+    fanout = FanOut(bot, parse_destinations(raw_text7, channel_id))
     try:
         if m.document and raw_text == "1":
             batch_message = await bot.send_message(chat_id=channel_id, text=f"<blockquote><b>🎯Target Batch : {b_name}</b></blockquote>")
+            fanout.replicate(batch_message, pin="/d" not in raw_text7)
             if "/d" not in raw_text7:
                 await bot.send_message(chat_id=m.chat.id, text=f"<blockquote><b><i>🎯Target Batch : {b_name}</i></b></blockquote>\n\n🔄 Your Task is under processing, please check your Set Channel📱. Once your task is complete, I will inform you 📩")
                 await bot.pin_chat_message(channel_id, batch_message.id)
@@ -369,25 +380,43 @@ async def drm_handler(bot: Client, m: Message):
 
         
     failed_count = 0
-    count =int(raw_text)    
-    arg = int(raw_text)
+    # The start index counts links of the original file, duplicates included
+    start = bisect.bisect_left(positions, int(raw_text) - 1)
+    count = start + 1
+    album = AlbumBatcher(bot, channel_id)
+    video_count = v2_count + mpd_count + m3u8_count + yt_count + drm_count + zip_count + other_count
+    job = None
+    if COORDINATOR:
+        # Links are resolved here and queued for worker.py processes to download
+        job = await job_queue.create_job(m.chat.id, {
+            "log_job": job_id.get(), "chat_id": m.chat.id, "channel_id": channel_id,
+            "destinations": [fanout.primary] + fanout.mirrors, "b_name": b_name,
+            "document": bool(m.document), "notify_user": "/d" not in raw_text7,
+            "vidwatermark": vidwatermark, "thumb": thumb_src, "total": len(links),
+            "video_count": video_count, "pdf_count": pdf_count, "img_count": img_count})
     try:
-        for i in range(arg-1, len(links)):
+        for i in range(start, len(links)):
             if globals.cancel_requested:
+                if job:
+                    await job_queue.close(job, cancelled=True, coordinator_failed=failed_count)
+                    await job_queue.cancel(job)
+                else:
+                    failed_count += await flush_album(bot, album, channel_id, fanout)
+                await fanout.drain()
                 await m.reply_text("🚦**STOPPED**🚦")
                 globals.processing_request = False
                 globals.cancel_requested = False
                 return
+            metrics.queue_depth.set(len(links) - i, queue="batch")
+            set_item(i + 1)
   
             # Extract title and URL from the new format
             original_title = links[i][0] 
             original_url = links[i][1]
+            route = routes[i]
             
-            # Clean URL format
-            Vxy = original_url.replace("https://", "").replace("http://", "")
-            Vxy = Vxy.replace("www.youtube-nocookie.com/embed", "youtu.be").replace("?modestbranding=1", "").replace("/view?usp=sharing","")
-            url = "https://" + Vxy
-            link0 = "https://" + Vxy
+            url = canonical_url(original_url)
+            link0 = url
 
             # Smart title extraction
             if original_title and original_title != "URL":
@@ -396,7 +425,7 @@ async def drm_handler(bot: Client, m: Message):
                 name1 = extracted_title
                 name = f'{extracted_title[:60]}'
                 namef = f'{extracted_title[:60]}'
-            elif "youtu" in url:
+            elif route.kind == link_router.YOUTUBE:
                 # Fallback to YouTube API for YouTube videos without titles
                 try:
                     oembed_url = f"https://www.youtube.com/oembed?url={url}&format=json"
@@ -413,13 +442,12 @@ async def drm_handler(bot: Client, m: Message):
             else:
                 # Fallback to yt-dlp title extraction for other URLs
                 try:
-                    ydl_opts = {'quiet': True, 'no_warnings': True}
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(url, download=False)
-                        extracted_title = info.get('title', 'Video')
-                        name = f'{extracted_title[:60]}'
-                        namef = f'{extracted_title[:60]}'
-                        name1 = f'{extracted_title}'
+                    # In a worker thread: a slow extractor must not stall the bot loop
+                    info = await format_planner.extract(url)
+                    extracted_title = info.get('title', 'Video')
+                    name = f'{extracted_title[:60]}'
+                    namef = f'{extracted_title[:60]}'
+                    name1 = f'{extracted_title}'
                 except:
                     name = "Video"
                     namef = "Video" 
@@ -484,19 +512,26 @@ async def drm_handler(bot: Client, m: Message):
                 appxkey = url.split('*')[1]
                 url = url.split('*')[0]
 
-            if "youtu" in url:
-                ytf = f"bv*[height<={raw_text2}][ext=mp4]+ba[ext=m4a]/b[height<=?{raw_text2}]"
-            elif "embed" in url:
-                ytf = f"bestvideo[height<={raw_text2}]+bestaudio/best[height<={raw_text2}]"
-            else:
-                ytf = f"b[height<={raw_text2}]/bv[height<={raw_text2}]+ba/b/bv+ba"
+            ytf = fallback_selector(raw_text2, youtube=route.kind == link_router.YOUTUBE, embed="embed" in url)
+            # Plain video links: pick the format from the extractor's list
+            # (cached when the title lookup above already extracted it).
+            # Queued items are planned by the worker that downloads them.
+            fplan = None
+            plannable = route.strategy == link_router.VIDEO_DL and route.kind != link_router.YOUTUBE and "jw-prod" not in url and "webvideos.classplusapp." not in url
+            if plannable and not job:
+                fplan = await format_planner.plan(url, raw_text2)
+                if fplan:
+                    ytf = fplan.selector
            
             if "jw-prod" in url:
                 cmd = f'yt-dlp -o "{name}.mp4" "{url}"'
             elif "webvideos.classplusapp." in url:
                cmd = f'yt-dlp --add-header "referer:https://web.classplusapp.com/" --add-header "x-cdn-tag:empty" -f "{ytf}" "{url}" -o "{name}.mp4"'
-            elif "youtube.com" in url or "youtu.be" in url:
+            elif route.kind == link_router.YOUTUBE:
                 cmd = f'yt-dlp --cookies youtube_cookies.txt -f "{ytf}" "{url}" -o "{name}".mp4'
+            elif fplan and fplan.info_path:
+                # Reuse the planner's extraction instead of extracting again
+                cmd = f'yt-dlp --load-info-json "{fplan.info_path}" -f "{ytf}" -o "{name}.mp4"'
             else:
                 cmd = f'yt-dlp -f "{ytf}" "{url}" -o "{name}.mp4"'
 
@@ -589,20 +624,55 @@ async def drm_handler(bot: Client, m: Message):
                             ccm = f'<b>{str(count).zfill(3)}.</b> {name1} .mp3'
                             cchtml = f'<b>{str(count).zfill(3)}.</b> {name1} .html'
                     
-                if "drive" in url:
+                strategy = route.strategy
+                if album.handles(route, url):
+                    # Images (and PDFs with ALBUM_PDFS) go out as media groups
+                    album.add(route, url, namef, ccimg if strategy == link_router.PHOTO else cc1, f"{str(count).zfill(3)} {name1}")
+                    count += 1
+                    if i + 1 < len(links):
+                        flush = album.should_flush(routes[i + 1], links[i + 1][1])
+                    else:
+                        flush = album.should_flush()
+                    if flush:
+                        if job:
+                            state = album.detach()
+                            first = state["items"][0]
+                            await job_queue.push(job, {"strategy": ALBUM, "album": state,
+                                                       "label": first["label"], "url": first["url"]})
+                        else:
+                            failed_count += await flush_album(bot, album, channel_id, fanout)
+                    continue
+
+                elif job:
+                    # Coordinator mode: everything a worker needs to download and upload
+                    item = {"strategy": strategy, "url": url, "cmd": cmd, "name": name, "namef": namef,
+                            "label": f"{str(count).zfill(3)} {name1}", "ext": route.suffix, "quality": raw_text2, "plan": plannable,
+                            "caption": {link_router.DOCUMENT: cc1, link_router.PDF_DOC: cc1,
+                                        link_router.HTML_DOC: cchtml, link_router.AUDIO_DOC: ccm}.get(strategy, cc)}
+                    if strategy == link_router.WIDEVINE:
+                        item.update(mpd=mpd, keys=keys_string, path=path)
+                    elif strategy == link_router.APPX_DECRYPT:
+                        item["appxkey"] = appxkey
+                    await job_queue.push(job, item)
+                    count += 1
+                    continue
+
+                elif strategy == link_router.DOCUMENT:
                     try:
                         ka = await helper.download(url, name)
                         # ULTRA FAST UPLOAD - Move to /tmp and upload without progress callbacks
                         from main import ultra_fast_upload
                         copy = await ultra_fast_upload(ka, channel_id, cc1, "document")
+                        fanout.replicate(copy)
                         count+=1
                         os.remove(ka)
                     except FloodWait as e:
                         await m.reply_text(str(e))
-                        time.sleep(e.x)
+                        metrics.record_floodwait(e.value)
+                        await asyncio.sleep(e.value)
                         continue    
   
-                elif ".pdf" in url:
+                elif strategy == link_router.PDF_DOC:
                     if "cwmediabkt99" in url:
                         max_retries = 15  # Define the maximum number of retries
                         retry_delay = 4  # Delay between retries in seconds
@@ -623,6 +693,7 @@ async def drm_handler(bot: Client, m: Message):
                                     # ULTRA FAST UPLOAD - Move to /tmp and upload without progress callbacks
                                     from main import ultra_fast_upload
                                     copy = await ultra_fast_upload(f'{namef}.pdf', channel_id, cc1, "document")
+                                    fanout.replicate(copy)
                                     count += 1
                                     os.remove(f'{namef}.pdf')
                                     success = True
@@ -643,56 +714,48 @@ async def drm_handler(bot: Client, m: Message):
                         try:
                             cmd = f'yt-dlp -o "{namef}.pdf" "{url}"'
                             download_cmd = f"{cmd} -R 25 --fragment-retries 25"
-                            os.system(download_cmd)
+                            await run_ytdlp(download_cmd)
                             copy = await bot.send_document(chat_id=channel_id, document=f'{namef}.pdf', caption=cc1)
+                            fanout.replicate(copy)
                             count += 1
                             os.remove(f'{namef}.pdf')
                         except FloodWait as e:
                             await m.reply_text(str(e))
-                            time.sleep(e.x)
+                            metrics.record_floodwait(e.value)
+                            await asyncio.sleep(e.value)
                             continue    
 
-                elif ".ws" in url and  url.endswith(".ws"):
+                elif strategy == link_router.HTML_DOC:
                     try:
                         await helper.pdf_download(f"{api_url}utkash-ws?url={url}&authorization={api_token}",f"{name}.html")
                         time.sleep(1)
-                        await bot.send_document(chat_id=channel_id, document=f"{name}.html", caption=cchtml)
+                        copy = await bot.send_document(chat_id=channel_id, document=f"{name}.html", caption=cchtml)
+                        fanout.replicate(copy)
                         os.remove(f'{name}.html')
                         count += 1
                     except FloodWait as e:
                         await m.reply_text(str(e))
-                        time.sleep(e.x)
+                        metrics.record_floodwait(e.value)
+                        await asyncio.sleep(e.value)
                         continue    
                             
-                elif any(ext in url for ext in [".jpg", ".jpeg", ".png"]):
-                    try:
-                        ext = url.split('.')[-1]
-                        cmd = f'yt-dlp -o "{namef}.{ext}" "{url}"'
-                        download_cmd = f"{cmd} -R 25 --fragment-retries 25"
-                        os.system(download_cmd)
-                        copy = await bot.send_photo(chat_id=channel_id, photo=f'{namef}.{ext}', caption=ccimg)
-                        count += 1
-                        os.remove(f'{namef}.{ext}')
-                    except FloodWait as e:
-                        await m.reply_text(str(e))
-                        time.sleep(e.x)
-                        continue    
-
-                elif any(ext in url for ext in [".mp3", ".wav", ".m4a"]):
+                elif strategy == link_router.AUDIO_DOC:
                     try:
-                        ext = url.split('.')[-1]
+                        ext = route.suffix[1:]
                         cmd = f'yt-dlp -o "{namef}.{ext}" "{url}"'
                         download_cmd = f"{cmd} -R 25 --fragment-retries 25"
-                        os.system(download_cmd)
+                        await run_ytdlp(download_cmd)
                         copy = await bot.send_document(chat_id=channel_id, document=f'{namef}.{ext}', caption=ccm)
+                        fanout.replicate(copy)
                         count += 1
                         os.remove(f'{namef}.{ext}')
                     except FloodWait as e:
                         await m.reply_text(str(e))
-                        time.sleep(e.x)
+                        metrics.record_floodwait(e.value)
+                        await asyncio.sleep(e.value)
                         continue    
                     
-                elif 'encrypted.m' in url:    
+                elif strategy == link_router.APPX_DECRYPT:
                     remaining_links = len(links) - count
                     progress = (count / len(links)) * 100
                     Show1 = f"<blockquote>🚀𝐏𝐫𝐨𝐠𝐫𝐞𝐬𝐬 » {progress:.2f}%</blockquote>\n┃\n" \
@@ -717,12 +780,13 @@ async def drm_handler(bot: Client, m: Message):
                     filename = res_file  
                     await prog1.delete(True)
                     await prog.delete(True)
-                    await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                    copy = await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                    fanout.replicate(copy)
                     count += 1  
                     await asyncio.sleep(1)  
                     continue  
 
-                elif 'drmcdni' in url or 'drm/wv' in url or 'drm/common' in url:
+                elif strategy == link_router.WIDEVINE:
                     remaining_links = len(links) - count
                     progress = (count / len(links)) * 100
                     Show1 = f"<blockquote>🚀𝐏𝐫𝐨𝐠𝐫𝐞𝐬𝐬 » {progress:.2f}%</blockquote>\n┃\n" \
@@ -747,7 +811,8 @@ async def drm_handler(bot: Client, m: Message):
                     filename = res_file
                     await prog1.delete(True)
                     await prog.delete(True)
-                    await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                    copy = await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                    fanout.replicate(copy)
                     count += 1
                     await asyncio.sleep(1)
                     continue
@@ -755,6 +820,7 @@ async def drm_handler(bot: Client, m: Message):
                 else:
                     remaining_links = len(links) - count
                     progress = (count / len(links)) * 100
+                    size_line = f"┣📦𝐒𝐢𝐳𝐞 » {fplan.describe()}\n┃\n" if fplan else ""
                     Show1 = f"<blockquote>🚀𝐏𝐫𝐨𝐠𝐫𝐞𝐬𝐬 » {progress:.2f}%</blockquote>\n┃\n" \
                            f"┣🔗𝐈𝐧𝐝𝐞𝐱 » {count}/{len(links)}\n┃\n" \
                            f"╰━🖇️𝐑𝐞𝐦𝐚𝐢𝐧 » {remaining_links}\n" \
@@ -765,6 +831,7 @@ async def drm_handler(bot: Client, m: Message):
                            f"━━━━━━━━━━━━━━━━━━━━━━━━━\n" \
                            f"<blockquote>📚𝐓𝐢𝐭𝐥𝐞 » {namef}</blockquote>\n┃\n" \
                            f"┣🍁𝐐𝐮𝐚𝐥𝐢𝐭𝐲 » {quality}\n┃\n" \
+                           f"{size_line}" \
                            f'┣━🔗𝐋𝐢𝐧𝐤 » <a href="{link0}">**Original Link**</a>\n┃\n' \
                            f'╰━━🖇️𝐔𝐫𝐥 » <a href="{url}">**Api Link**</a>\n' \
                            f"━━━━━━━━━━━━━━━━━━━━━━━━━\n" \
@@ -773,14 +840,15 @@ async def drm_handler(bot: Client, m: Message):
                     Show = f"<i><b>Video Downloading</b></i>\n<blockquote><b>{str(count).zfill(3)}) {name1}</b></blockquote>"
                     prog = await bot.send_message(channel_id, Show, disable_web_page_preview=True)
                     prog1 = await m.reply_text(Show1, disable_web_page_preview=True)
-                    res_file = await helper.download_video(url, cmd, name)
+                    res_file = await helper.download_video(url, cmd, name, prog1)
                     
                     # CRITICAL FIX: Check if download was successful before sending
                     if res_file and os.path.exists(res_file) and os.path.getsize(res_file) > 0:
                         filename = res_file
                         await prog1.delete(True)
                         await prog.delete(True)
-                        await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                        copy = await helper.send_vid(bot, m, cc, filename, vidwatermark, thumb, name, prog, channel_id)
+                        fanout.replicate(copy)
                     else:
                         # CRITICAL FIX: Send error as TEXT, not as video
                         await prog1.delete(True)
@@ -805,15 +873,28 @@ async def drm_handler(bot: Client, m: Message):
         await m.reply_text(e)
         time.sleep(2)
 
+    metrics.queue_depth.set(0, queue="batch")
+    if job:
+        # The report loop posts the summary once the workers have settled every item
+        await job_queue.close(job, coordinator_failed=failed_count)
+        await fanout.drain()
+        await m.reply_text(f"<blockquote><b>📮 {len(links) - start} links queued for workers</b></blockquote>\nJob `{job}` · the summary follows once the workers finish")
+        globals.processing_request = False
+        return
+
     success_count = len(links) - failed_count
-    video_count = v2_count + mpd_count + m3u8_count + yt_count + drm_count + zip_count + other_count
+    metrics.items_total.inc(success_count, result="ok")
+    metrics.items_total.inc(failed_count, result="failed")
     if m.document:
         if raw_text7 == "/d":
-            await bot.send_message(channel_id, f"<b>-┈━═.•°✅ Completed ✅°•.═━┈-</b>\n<blockquote><b>🎯Batch Name : {b_name}</b></blockquote>\n<blockquote>🔗 Total URLs: {len(links)} \n┃   ┠🔴 Total Failed URLs: {failed_count}\n┃   ┠🟢 Total Successful URLs: {success_count}\n┃   ┃   ┠🎥 Total Video URLs: {video_count}\n┃   ┃   ┠📄 Total PDF URLs: {pdf_count}\n┃   ┃   ┠📸 Total IMAGE URLs: {img_count}</blockquote>\n")
+            summary = await bot.send_message(channel_id, batch_summary(b_name, len(links), failed_count, video_count, pdf_count, img_count))
+            fanout.replicate(summary)
         else:
-            await bot.send_message(channel_id, f"<b>-┈━═.•°✅ Completed ✅°•.═━┈-</b>\n<blockquote><b>🎯Batch Name : {b_name}</b></blockquote>\n<blockquote>🔗 Total URLs: {len(links)} \n┃   ┠🔴 Total Failed URLs: {failed_count}\n┃   ┠🟢 Total Successful URLs: {success_count}\n┃   ┃   ┠🎥 Total Video URLs: {video_count}\n┃   ┃   ┠📄 Total PDF URLs: {pdf_count}\n┃   ┃   ┠📸 Total IMAGE URLs: {img_count}</blockquote>\n")
+            summary = await bot.send_message(channel_id, batch_summary(b_name, len(links), failed_count, video_count, pdf_count, img_count))
+            fanout.replicate(summary)
             await bot.send_message(m.chat.id, f"<blockquote><b>✅ Your Task is completed, please check your Set Channel📱</b></blockquote>")
 
+    await fanout.drain()
 
     # Mark processing as complete before final cleanup
     globals.processing_request = False
@@ -821,4 +902,4 @@ async def drm_handler(bot: Client, m: Message):
     # Final cleanup after completing all downloads and sending results
     final_cleaned = final_cleanup()
     if final_cleaned > 0:
-        print(f"🧹 Final cleanup: Removed {final_cleaned} temporary files after completing downloads")
+        logger.info(f"🧹 Final cleanup: Removed {final_cleaned} temporary files after completing downloads")
@@ -0,0 +1,118 @@
+"""
+Channel Fan-out
+Mirrors a batch to several channels while uploading each file only once.
+Items are uploaded to the first destination; every sent message is then
+copied to the other destinations with copy_message (copy_media_group for
+albums), which reuses Telegram's stored file instead of sending the bytes
+again. Copies run in a background worker so the next download is not held
+up, in upload order, with all mirrors of one item copied in parallel.
+"""
+
+import re
+import asyncio
+import logging
+
+from pyrogram.errors import FloodWait
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+copies_total = metrics.registry.register(metrics.Counter("bot_fanout_copies_total", "Messages copied to mirror channels", ["result"]))
+
+
+def parse_destinations(text, default):
+    """
+    Destination chat ids from the channel prompt: "/d", one id, or several
+    separated by spaces or commas (the first is uploaded to, the rest mirror it)
+
+    Returns:
+        list: chat ids, primary first, without duplicates
+    """
+    if not text or "/d" in text:
+        return [default]
+    destinations = []
+    for token in filter(None, re.split(r"[\s,]+", text.strip())):
+        chat = int(token) if token.lstrip("-").isdigit() else token
+        if chat not in destinations:
+            destinations.append(chat)
+    return destinations or [default]
+
+
+class FanOut:
+    """Replicates messages from the primary destination to the mirrors"""
+
+    def __init__(self, bot, destinations):
+        self.bot = bot
+        self.primary = destinations[0]
+        self.mirrors = list(destinations[1:])
+        self.failed = 0
+        self._queue = None
+        self._worker = None
+
+    async def _call(self, method, *args, **kwargs):
+        while True:
+            try:
+                return await method(*args, **kwargs)
+            except FloodWait as e:
+                metrics.record_floodwait(e.value)
+                await asyncio.sleep(e.value)
+
+    async def _copy_to(self, mirror, messages, pin):
+        try:
+            copied = []
+            groups = set()
+            for message in messages:
+                if message.media_group_id:
+                    # One call copies the whole album, keeping it grouped
+                    if message.media_group_id not in groups:
+                        groups.add(message.media_group_id)
+                        copied.extend(await self._call(self.bot.copy_media_group, mirror, self.primary, message.id))
+                else:
+                    copied.append(await self._call(self.bot.copy_message, mirror, self.primary, message.id))
+            copies_total.inc(len(messages), result="ok")
+            if pin and copied:
+                service = await self.bot.pin_chat_message(mirror, copied[0].id, disable_notification=True)
+                # Same as the primary channel: drop the "pinned a message" notice
+                if service:
+                    await service.delete()
+        except Exception as e:
+            self.failed += 1
+            copies_total.inc(len(messages), result="failed")
+            logger.warning("Copy to mirror %s failed: %s", mirror, e)
+
+    async def _copy(self, messages, pin):
+        await asyncio.gather(*(self._copy_to(mirror, messages, pin) for mirror in self.mirrors))
+
+    async def _run(self):
+        while True:
+            messages, pin = await self._queue.get()
+            try:
+                await self._copy(messages, pin)
+            finally:
+                self._queue.task_done()
+
+    def replicate(self, sent, pin=False):
+        """
+        Queue a sent message (or list of messages, e.g. an album or split
+        parts) for copying to every mirror; returns immediately
+        """
+        if not self.mirrors or not sent:
+            return
+        messages = [message for message in (sent if isinstance(sent, list) else [sent]) if message is not None]
+        if not messages:
+            return
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait((messages, pin))
+
+    async def drain(self):
+        """Wait for all queued copies, then stop the worker"""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        self._worker = None
+        if self.failed:
+            logger.warning("Fan-out finished with %d failed mirror copies", self.failed)
@@ -0,0 +1,290 @@
+"""
+Format Planner
+Picks the yt-dlp format from the extractor's own format list instead of a
+static selector string. For the quality chosen at the resolution prompt it
+takes the highest height not above it, prefers H.264/HEVC so the upload
+stays streamable, then the candidate that needs no merge and the fewest
+bytes (a progressive format if one exists, else the smallest video-only +
+audio pair), and estimates the download size up front.
+
+Format lists are cached per canonical URL for FORMAT_CACHE_TTL seconds.
+Extractions run in a worker thread through extract(), which the title lookup
+in drm_handler shares, and the info JSON is kept on disk so yt-dlp can
+download with --load-info-json instead of extracting a second time.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+
+from . import metrics
+from .lazy_imports import lazy_import
+from .url_canon import canonical_key
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import("yt_dlp")
+
+CACHE_TTL = int(os.environ.get("FORMAT_CACHE_TTL", "900"))
+CACHE_SIZE = 64
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "format_cache")
+# Audio above this bitrate costs bytes without audible gain for lectures
+AUDIO_MAX_KBPS = 160
+# Smaller VP9/AV1 streams would end up as documents after normalization
+STREAM_VCODECS = ("avc", "h264", "hev", "hvc", "h265")
+
+FORMAT_KEYS = ("format_id", "ext", "height", "width", "vcodec", "acodec", "filesize",
+               "filesize_approx", "tbr", "abr", "protocol")
+
+MB = 1024 * 1024
+
+
+def fallback_selector(quality, youtube=False, embed=False):
+    """The static selectors, for links the planner has no format list for"""
+    if youtube:
+        return f"bv*[height<={quality}][ext=mp4]+ba[ext=m4a]/b[height<=?{quality}]"
+    if embed:
+        return f"bestvideo[height<={quality}]+bestaudio/best[height<={quality}]"
+    return f"b[height<={quality}]/bv[height<={quality}]+ba/b/bv+ba"
+
+
+class FormatPlan:
+    """The chosen format and what it is expected to cost"""
+
+    __slots__ = ("selector", "format_id", "height", "size", "merge", "info_path")
+
+    def __init__(self, selector, format_id, height, size, merge, info_path=None):
+        self.selector = selector
+        self.format_id = format_id
+        self.height = height
+        self.size = size
+        self.merge = merge
+        self.info_path = info_path
+
+    def describe(self):
+        size = f"~{self.size / MB:.0f} MB" if self.size else "size unknown"
+        height = f"{self.height}p" if self.height else "unknown height"
+        return f"{size} · {height} · {'merge' if self.merge else 'no merge'}"
+
+    def __repr__(self):
+        return f"<FormatPlan {self.format_id} {self.describe()}>"
+
+
+def _has_video(fmt):
+    return fmt.get("vcodec") != "none"
+
+
+def _has_audio(fmt):
+    return fmt.get("acodec") != "none"
+
+
+def _streamable(fmt):
+    """H.264/HEVC (or unknown) video, which Telegram can play inline"""
+    vcodec = fmt.get("vcodec")
+    return vcodec is None or vcodec.startswith(STREAM_VCODECS)
+
+
+def _size(fmt, duration):
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if not size and fmt.get("tbr") and duration:
+        size = fmt["tbr"] * 1000 / 8 * duration
+    return int(size) if size else None
+
+
+def _pick_audio(audios, video_ext, duration):
+    """Same container family as the video if possible, then the best bitrate up to AUDIO_MAX_KBPS"""
+    family = {"mp4": "m4a", "webm": "webm"}.get(video_ext)
+    pool = [a for a in audios if a.get("ext") == family] or audios
+    capped = [a for a in pool if (a.get("abr") or a.get("tbr") or 0) <= AUDIO_MAX_KBPS]
+    if capped:
+        return max(capped, key=lambda a: a.get("abr") or a.get("tbr") or 0)
+    return min(pool, key=lambda a: _size(a, duration) or float("inf"))
+
+
+def choose(formats, quality, duration=None):
+    """
+    Choose a format for `quality` (a height such as "720") from a format list
+
+    Returns:
+        FormatPlan or None if the list has no video formats
+    """
+    limit = int(quality) if str(quality).isdigit() else None
+    videos = [f for f in formats if _has_video(f) and f.get("format_id")]
+    if not videos:
+        return None
+    fits = [f for f in videos if limit is None or not f.get("height") or f["height"] <= limit]
+    if not fits:
+        # Nothing at or below the requested quality: take the smallest there is
+        lowest = min(f.get("height") or 0 for f in videos)
+        fits = [f for f in videos if (f.get("height") or 0) == lowest]
+    target = max(f.get("height") or 0 for f in fits)
+    at_target = [f for f in fits if (f.get("height") or 0) == target]
+    at_target = [f for f in at_target if _streamable(f)] or at_target
+    fallback = fallback_selector(quality if limit else target or 720)
+
+    progressive = [f for f in at_target if _has_audio(f)]
+    if progressive:
+        best = min(progressive, key=lambda f: _size(f, duration) or float("inf"))
+        return FormatPlan(f"{best['format_id']}/{fallback}", best["format_id"], target or None,
+                          _size(best, duration), merge=False)
+
+    audios = [f for f in formats if not _has_video(f) and _has_audio(f) and f.get("format_id")]
+    best, best_size = None, None
+    for video in at_target:
+        if not audios:
+            break
+        audio = _pick_audio(audios, video.get("ext"), duration)
+        video_size, audio_size = _size(video, duration), _size(audio, duration)
+        size = video_size + audio_size if video_size and audio_size else None
+        if best is None or (size or float("inf")) < (best_size or float("inf")):
+            best, best_size = (video, audio), size
+    if best is None:
+        # Video-only formats and no audio track anywhere
+        video = min(at_target, key=lambda f: _size(f, duration) or float("inf"))
+        return FormatPlan(f"{video['format_id']}/{fallback}", video["format_id"], target or None,
+                          _size(video, duration), merge=False)
+    format_id = f"{best[0]['format_id']}+{best[1]['format_id']}"
+    return FormatPlan(f"{format_id}/{fallback}", format_id, target or None, best_size, merge=True)
+
+
+class FormatCache:
+    """Slim format lists per canonical URL, plus the info JSON for --load-info-json"""
+
+    def __init__(self, ttl=CACHE_TTL, size=CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry and entry["info_path"]:
+            try:
+                os.remove(entry["info_path"])
+            except OSError:
+                pass
+
+    def get(self, url):
+        key = canonical_key(url)
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry["time"] < self.ttl and (
+                not entry["info_path"] or os.path.exists(entry["info_path"])):
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if entry:
+            self._drop(key)
+        self.misses += 1
+        return None
+
+    def put(self, url, info, info_path=None):
+        """
+        Store the formats of an extract_info(download=False) result
+
+        info_path is the info JSON already written by _save_info(); without
+        it the JSON is written here.
+        """
+        formats = _formats(info)
+        if not formats:
+            return None
+        key = canonical_key(url)
+        if info_path is None:
+            info_path = _save_info(url, info)
+        elif self.entries.get(key, {}).get("info_path") == info_path:
+            # Same file name per URL: keep the JSON just written for this entry
+            self.entries.pop(key)
+        self._drop(key)
+        entry = {
+            "time": time.monotonic(),
+            "formats": [{k: f.get(k) for k in FORMAT_KEYS} for f in formats],
+            "duration": info.get("duration"),
+            "info_path": info_path,
+        }
+        self.entries[key] = entry
+        while len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+        return entry
+
+
+def _formats(info):
+    """Format list of a single-video extraction, else []"""
+    if info.get("_type", "video") != "video":
+        return []
+    return info.get("formats") or ([info] if info.get("format_id") else [])
+
+
+def _save_info(url, info):
+    """Write the info JSON for --load-info-json; returns its path or None"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        info_path = os.path.join(CACHE_DIR, hashlib.sha1(canonical_key(url).encode()).hexdigest()[:16] + ".info.json")
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(yt_dlp.YoutubeDL.sanitize_info(info), f)
+        return info_path
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("Could not keep info JSON for %s: %s", url, e)
+        return None
+
+
+def _extract(url):
+    """Extraction plus its saved info JSON; runs in a worker thread"""
+    with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True, "noplaylist": True}) as ydl:
+        info = ydl.extract_info(url, download=False) or {}
+    return info, _save_info(url, info) if _formats(info) else None
+
+
+class FormatPlanner:
+    """Plans downloads from cached (or freshly extracted) format lists"""
+
+    def __init__(self):
+        self.cache = FormatCache()
+
+    def remember(self, url, info):
+        """Feed an extraction the caller already did into the cache"""
+        try:
+            self.cache.put(url, info)
+        except Exception as e:
+            logger.warning("Format cache store failed for %s: %s", url, e)
+
+    async def _extract_entry(self, url):
+        with metrics.stage_timer("extract"):
+            info, info_path = await asyncio.get_running_loop().run_in_executor(None, _extract, url)
+        return info, self.cache.put(url, info, info_path)
+
+    async def extract(self, url):
+        """
+        extract_info(download=False) for `url` without blocking the event loop;
+        the result also feeds the format cache. Raises what yt-dlp raises.
+        """
+        info, _ = await self._extract_entry(url)
+        return info
+
+    async def plan(self, url, quality, extract=True):
+        """
+        FormatPlan for `url` at `quality`, or None when no format list is
+        available (the caller keeps its fallback selector)
+        """
+        entry = self.cache.get(url)
+        if entry is None and extract:
+            try:
+                _, entry = await self._extract_entry(url)
+            except Exception as e:
+                logger.info("No format list for %s: %s", url, str(e)[:200])
+                return None
+        if not entry:
+            return None
+        plan = choose(entry["formats"], quality, entry["duration"])
+        if plan:
+            plan.info_path = entry["info_path"]
+            logger.info("🎯 Format plan for %sp: %s (%s)", quality, plan.format_id, plan.describe())
+        return plan
+
+
+# Global planner instance
+format_planner = FormatPlanner()
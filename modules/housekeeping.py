@@ -0,0 +1,171 @@
+"""
+Housekeeping
+Scheduled background service that replaces the old per-download cleanup
+ritual. A cheap check runs every HOUSEKEEPING_INTERVAL seconds and a sweep
+only happens when a measured trigger fires (disk usage, memory pressure,
+orphaned partial files past their age limit) or the periodic sweep is due.
+Sweeps run in a worker thread, so the download path and the event loop pay
+nothing, and each run records what it reclaimed and how long it took.
+"""
+
+import os
+import gc
+import glob
+import fnmatch
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+from collections import deque
+
+from . import metrics
+from .memory_governor import memory_governor, ELEVATED, HIGH, CRITICAL
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = int(os.environ.get("HOUSEKEEPING_INTERVAL", "60"))
+# Full sweep at least this often even when no trigger fires
+SWEEP_INTERVAL = int(os.environ.get("HOUSEKEEPING_SWEEP_INTERVAL", "900"))
+DISK_TRIGGER_PERCENT = float(os.environ.get("HOUSEKEEPING_DISK_PERCENT", "85"))
+# Partial files untouched this long belong to no running download
+ORPHAN_AGE = int(os.environ.get("HOUSEKEEPING_ORPHAN_AGE", "1800"))
+
+# Leftovers of interrupted yt-dlp / aria / ffmpeg runs
+ORPHAN_PATTERNS = ("*.part", "*.part-Frag*", "*.ytdl", "*.download", "*.tmp", "*.temp")
+# Never descended into while scanning the working directory
+SKIP_DIRS = {"venv", "node_modules", "__pycache__", "site-packages"}
+# Prefix of the bot's own temporary directories; other processes' scratch
+# space in the shared temp dir is never touched
+SCRATCH_PREFIX = "bot-scratch-"
+SCRATCH_PATTERNS = ("yt-dlp*", SCRATCH_PREFIX + "*")
+
+reclaimed_bytes = metrics.registry.register(metrics.Counter("bot_housekeeping_reclaimed_bytes_total", "Bytes freed by housekeeping"))
+runs_total = metrics.registry.register(metrics.Counter("bot_housekeeping_runs_total", "Housekeeping sweeps by trigger", ["trigger"]))
+
+
+def _age(path, now):
+    """Seconds since anything under path was last written"""
+    try:
+        newest = os.stat(path).st_mtime
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+        return now - newest
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    """Delete a file or directory tree; returns bytes freed"""
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(path) for name in names)
+            shutil.rmtree(path, ignore_errors=True)
+            return size
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+
+def find_orphans(now=None, max_age=ORPHAN_AGE):
+    """Partial download files and scratch dirs older than max_age"""
+    now = now or time.time()
+    found = []
+    for root, dirs, names in os.walk("."):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS]
+        for name in names:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in ORPHAN_PATTERNS):
+                path = os.path.join(root, name)
+                if _age(path, now) >= max_age:
+                    found.append(path)
+    temp_dir = tempfile.gettempdir()
+    for pattern in SCRATCH_PATTERNS:
+        found.extend(path for path in glob.glob(os.path.join(temp_dir, pattern))
+                     if _age(path, now) >= max_age)
+    return found
+
+
+class Housekeeper:
+    """Watches the triggers and runs sweeps off the event loop"""
+
+    def __init__(self, interval=CHECK_INTERVAL):
+        self.interval = interval
+        self.last_sweep = time.time()
+        self.history = deque(maxlen=20)
+        self.running = False
+
+    def triggers(self):
+        """Names of the conditions that currently call for a sweep (blocking)"""
+        fired = []
+        try:
+            usage = shutil.disk_usage(".")
+            if usage.used / usage.total * 100 >= DISK_TRIGGER_PERCENT:
+                fired.append("disk")
+        except OSError:
+            pass
+        if memory_governor.level() in (ELEVATED, HIGH, CRITICAL):
+            fired.append("memory")
+        if find_orphans():
+            fired.append("orphans")
+        if time.time() - self.last_sweep >= SWEEP_INTERVAL:
+            fired.append("schedule")
+        return fired
+
+    def sweep(self, reason):
+        """Blocking sweep (worker thread); returns the run report"""
+        started = time.perf_counter()
+        orphans = find_orphans()
+        freed = sum(_remove(path) for path in orphans)
+        collected = 0
+        if "memory" in reason:
+            collected = gc.collect()
+        disk = shutil.disk_usage(".")
+        return {
+            "time": time.time(),
+            "trigger": reason,
+            "files": len(orphans),
+            "bytes": freed,
+            "gc_objects": collected,
+            "seconds": round(time.perf_counter() - started, 3),
+            "disk_percent": round(disk.used / disk.total * 100, 1),
+            "memory": memory_governor.snapshot(fresh=True)["level"],
+        }
+
+    async def run_once(self, reason="manual"):
+        if self.running:
+            return None
+        self.running = True
+        try:
+            loop = asyncio.get_running_loop()
+            report = await loop.run_in_executor(None, self.sweep, reason)
+        finally:
+            self.running = False
+        self.last_sweep = time.time()
+        self.history.append(report)
+        reclaimed_bytes.inc(report["bytes"])
+        runs_total.inc(trigger=reason)
+        metrics.stage_seconds.observe(report["seconds"], stage="housekeeping")
+        if report["files"] or report["gc_objects"]:
+            logger.info("🧹 Housekeeping (%s): removed %d orphans, %.1fMB freed, %d objects collected in %.2fs",
+                        reason, report["files"], report["bytes"] / (1024 * 1024), report["gc_objects"], report["seconds"])
+        return report
+
+    async def loop(self):
+        """Background task: check triggers every interval, sweep when one fires"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                fired = await asyncio.get_running_loop().run_in_executor(None, self.triggers)
+                if fired:
+                    await self.run_once("+".join(fired))
+            except Exception as e:
+                logger.warning("Housekeeping run failed: %s", e)
+
+
+# Global housekeeper instance
+housekeeper = Housekeeper()
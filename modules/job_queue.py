@@ -0,0 +1,541 @@
+"""
+Job Queue
+Durable work queue between the coordinator bot and download workers
+(BOT_MODE=coordinator). The coordinator pushes one entry per batch item;
+workers lease entries, keep the lease alive with heartbeats while they
+download and upload, and finish them with a result.
+
+A lease that is not renewed within JOB_LEASE_SECONDS (worker crashed, host
+lost) expires and the item goes back to the front of the queue for another
+worker, up to JOB_MAX_ATTEMPTS times.
+
+Backends:
+- SQLite (default): JOB_QUEUE_PATH under STATE_DIR, for workers on this host
+- Redis-compatible server: JOB_QUEUE_URL=redis://..., for workers on several
+  hosts (needs the optional `redis` package)
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+
+from vars import STATE_DIR
+
+# Optional Redis backend
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+QUEUE_URL = os.environ.get("JOB_QUEUE_URL", "")
+# Absolute, since workers run from their own directories
+QUEUE_PATH = os.path.abspath(os.environ.get("JOB_QUEUE_PATH", os.path.join(STATE_DIR, "jobs.sqlite3")))
+LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+REDIS_PREFIX = os.environ.get("JOB_QUEUE_PREFIX", "jobq")
+# Reported jobs are kept this long for /queue and log correlation
+KEEP_SECONDS = 7 * 24 * 3600
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+LOST_WORKER = "worker lost"
+
+
+class LeasedItem:
+    """One queue entry held by a worker"""
+
+    __slots__ = ("id", "job_id", "seq", "payload", "meta", "attempts")
+
+    def __init__(self, id, job_id, seq, payload, meta, attempts):
+        self.id = id
+        self.job_id = job_id
+        self.seq = seq
+        self.payload = payload
+        self.meta = meta
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"<LeasedItem {self.job_id}#{self.seq} attempt {self.attempts}>"
+
+
+class FinishedJob:
+    """A closed job whose items have all been settled"""
+
+    __slots__ = ("id", "chat_id", "meta", "items")
+
+    def __init__(self, id, chat_id, meta, items):
+        self.id = id
+        self.chat_id = chat_id
+        self.meta = meta
+        # [(status, payload, result, error)] in push order
+        self.items = items
+
+
+class SQLiteQueue:
+    """Lease queue in a local SQLite database (WAL, safe across processes)"""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA busy_timeout=30000")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, chat_id INTEGER, meta TEXT, created REAL,
+                    closed INTEGER DEFAULT 0, cancelled INTEGER DEFAULT 0, reported INTEGER DEFAULT 0);
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, seq INTEGER, payload TEXT,
+                    status TEXT DEFAULT 'queued', worker TEXT, lease_until REAL, attempts INTEGER DEFAULT 0,
+                    result TEXT, error TEXT, updated REAL);
+                CREATE INDEX IF NOT EXISTS items_status ON items(status, lease_until);
+                CREATE INDEX IF NOT EXISTS items_job ON items(job_id, seq);
+            """)
+            self._db = db
+        return self._db
+
+    def _write(self, func, *args):
+        """Run func(db, ...) inside one IMMEDIATE transaction"""
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(db, *args)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    def _reap(self, db, now):
+        """Fail items whose lease expired too often; the rest become leasable again"""
+        db.execute("UPDATE items SET status=?, error=?, worker=NULL, updated=? "
+                   "WHERE status=? AND lease_until<? AND attempts>=?",
+                   (FAILED, LOST_WORKER, now, LEASED, now, MAX_ATTEMPTS))
+
+    def create_job(self, job_id, chat_id, meta):
+        def create(db):
+            db.execute("INSERT INTO jobs (id, chat_id, meta, created) VALUES (?, ?, ?, ?)",
+                       (job_id, chat_id, json.dumps(meta), time.time()))
+        self._write(create)
+
+    def push(self, job_id, payloads):
+        def push(db):
+            seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM items WHERE job_id=?", (job_id,)).fetchone()[0]
+            now = time.time()
+            db.executemany("INSERT INTO items (job_id, seq, payload, updated) VALUES (?, ?, ?, ?)",
+                           [(job_id, seq + n, json.dumps(p), now) for n, p in enumerate(payloads, 1)])
+        self._write(push)
+
+    def close(self, job_id, meta_update=None):
+        def close(db):
+            if meta_update:
+                row = db.execute("SELECT meta FROM jobs WHERE id=?", (job_id,)).fetchone()
+                meta = {**json.loads(row[0]), **meta_update} if row else meta_update
+                db.execute("UPDATE jobs SET meta=? WHERE id=?", (json.dumps(meta), job_id))
+            db.execute("UPDATE jobs SET closed=1 WHERE id=?", (job_id,))
+        self._write(close)
+
+    def cancel(self, job_id):
+        def cancel(db):
+            db.execute("UPDATE jobs SET cancelled=1, closed=1 WHERE id=?", (job_id,))
+            return db.execute("UPDATE items SET status=?, updated=? WHERE job_id=? AND status=?",
+                              (CANCELLED, time.time(), job_id, QUEUED)).rowcount
+        return self._write(cancel)
+
+    def lease(self, worker, seconds=LEASE_SECONDS):
+        def lease(db):
+            now = time.time()
+            self._reap(db, now)
+            row = db.execute(
+                "SELECT items.id, items.job_id, items.seq, items.payload, jobs.meta, items.attempts, "
+                "items.status, items.worker FROM items JOIN jobs ON jobs.id = items.job_id "
+                "WHERE items.status=? OR (items.status=? AND items.lease_until<?) "
+                "ORDER BY jobs.created, items.seq LIMIT 1",
+                (QUEUED, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            item_id, job_id, seq, payload, meta, attempts, status, previous = row
+            if status == LEASED:
+                logger.warning("♻️ Lease of %s#%s expired on %s, requeued", job_id, seq, previous)
+            db.execute("UPDATE items SET status=?, worker=?, lease_until=?, attempts=attempts+1, updated=? WHERE id=?",
+                       (LEASED, worker, now + seconds, now, item_id))
+            return LeasedItem(item_id, job_id, seq, json.loads(payload), json.loads(meta), attempts + 1)
+        return self._write(lease)
+
+    def heartbeat(self, item_id, worker, seconds=LEASE_SECONDS):
+        def heartbeat(db):
+            now = time.time()
+            return db.execute("UPDATE items SET lease_until=?, updated=? WHERE id=? AND worker=? AND status=?",
+                              (now + seconds, now, item_id, worker, LEASED)).rowcount == 1
+        return self._write(heartbeat)
+
+    def finish(self, item_id, worker, status, result=None, error=None):
+        def finish(db):
+            return db.execute("UPDATE items SET status=?, result=?, error=?, lease_until=NULL, updated=? "
+                              "WHERE id=? AND worker=? AND status=?",
+                              (status, json.dumps(result) if result is not None else None, error,
+                               time.time(), item_id, worker, LEASED)).rowcount == 1
+        return self._write(finish)
+
+    def in_flight_before(self, job_id, seq):
+        with self._lock:
+            return self._conn().execute(
+                "SELECT COUNT(*) FROM items WHERE job_id=? AND seq<? AND status=? AND lease_until>=?",
+                (job_id, seq, LEASED, time.time())).fetchone()[0]
+
+    def release(self, item_id, worker):
+        """Hand a leased item back untouched (worker shutting down)"""
+        def release(db):
+            db.execute("UPDATE items SET status=?, worker=NULL, lease_until=NULL, attempts=MAX(attempts-1, 0), "
+                       "updated=? WHERE id=? AND worker=? AND status=?",
+                       (QUEUED, time.time(), item_id, worker, LEASED))
+        self._write(release)
+
+    def finished_jobs(self):
+        def finished(db):
+            self._reap(db, time.time())
+            jobs = []
+            for job_id, chat_id, meta in db.execute(
+                    "SELECT id, chat_id, meta FROM jobs WHERE closed=1 AND reported=0 AND NOT EXISTS "
+                    "(SELECT 1 FROM items WHERE items.job_id = jobs.id AND items.status IN (?, ?)) "
+                    "ORDER BY created", (QUEUED, LEASED)).fetchall():
+                items = [(status, json.loads(payload), json.loads(result) if result else None, error)
+                         for status, payload, result, error in db.execute(
+                             "SELECT status, payload, result, error FROM items WHERE job_id=? ORDER BY seq", (job_id,))]
+                jobs.append(FinishedJob(job_id, chat_id, json.loads(meta), items))
+            return jobs
+        return self._write(finished)
+
+    def mark_reported(self, job_id):
+        def mark(db):
+            db.execute("UPDATE jobs SET reported=1 WHERE id=?", (job_id,))
+            # Old reported jobs are only history; keep the file small
+            cutoff = time.time() - KEEP_SECONDS
+            db.execute("DELETE FROM items WHERE job_id IN (SELECT id FROM jobs WHERE reported=1 AND created<?)", (cutoff,))
+            db.execute("DELETE FROM jobs WHERE reported=1 AND created<?", (cutoff,))
+        self._write(mark)
+
+    def open_jobs(self, chat_id):
+        with self._lock:
+            return [row[0] for row in self._conn().execute(
+                "SELECT id FROM jobs WHERE chat_id=? AND reported=0 AND cancelled=0", (chat_id,))]
+
+    def stats(self):
+        with self._lock:
+            db = self._conn()
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+            workers = [row[0] for row in db.execute(
+                "SELECT DISTINCT worker FROM items WHERE status=? AND lease_until>=?", (LEASED, time.time()))]
+            jobs = db.execute("SELECT COUNT(*) FROM jobs WHERE reported=0").fetchone()[0]
+        return {"items": counts, "workers": workers, "open_jobs": jobs}
+
+
+# Expired leases: requeue at the front, or fail after MAX_ATTEMPTS.
+# ARGV: now, max_attempts, prefix
+_REAP_LUA = """
+local prefix = ARGV[3]
+local expired = redis.call('ZRANGEBYSCORE', prefix .. ':leases', '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', prefix .. ':leases', id)
+    local key = prefix .. ':item:' .. id
+    if tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[2]) then
+        redis.call('HSET', key, 'status', 'failed', 'error', 'worker lost')
+    else
+        redis.call('HSET', key, 'status', 'queued')
+        redis.call('LPUSH', prefix .. ':ready', id)
+    end
+end
+"""
+
+# ARGV: now, max_attempts, prefix, worker, lease deadline
+_LEASE_LUA = _REAP_LUA + """
+while true do
+    local id = redis.call('LPOP', prefix .. ':ready')
+    if not id then return false end
+    local key = prefix .. ':item:' .. id
+    if redis.call('HGET', key, 'status') == 'queued' then
+        redis.call('HSET', key, 'status', 'leased', 'worker', ARGV[4])
+        redis.call('HINCRBY', key, 'attempts', 1)
+        redis.call('ZADD', prefix .. ':leases', ARGV[5], id)
+        return id
+    end
+end
+"""
+
+# ARGV: prefix, id, worker, then the new status fields as name/value pairs
+_OWNED_LUA = """
+local key = ARGV[1] .. ':item:' .. ARGV[2]
+if redis.call('HGET', key, 'status') ~= 'leased' or redis.call('HGET', key, 'worker') ~= ARGV[3] then
+    return 0
+end
+"""
+
+# ARGV: prefix, id, worker, deadline
+_HEARTBEAT_LUA = _OWNED_LUA + """
+redis.call('ZADD', ARGV[1] .. ':leases', ARGV[4], ARGV[2])
+return 1
+"""
+
+# ARGV: prefix, id, worker, status, result, error
+_FINISH_LUA = _OWNED_LUA + """
+redis.call('ZREM', ARGV[1] .. ':leases', ARGV[2])
+redis.call('HSET', key, 'status', ARGV[4], 'result', ARGV[5], 'error', ARGV[6])
+return 1
+"""
+
+# ARGV: prefix, id, worker
+_RELEASE_LUA = _OWNED_LUA + """
+redis.call('ZREM', ARGV[1] .. ':leases', ARGV[2])
+redis.call('HSET', key, 'status', 'queued')
+redis.call('HINCRBY', key, 'attempts', -1)
+redis.call('LPUSH', ARGV[1] .. ':ready', ARGV[2])
+return 1
+"""
+
+# ARGV: prefix, id
+_CANCEL_LUA = """
+local key = ARGV[1] .. ':item:' .. ARGV[2]
+if redis.call('HGET', key, 'status') == 'queued' then
+    redis.call('HSET', key, 'status', 'cancelled')
+    return 1
+end
+return 0
+"""
+
+
+class RedisQueue:
+    """The same lease queue on a Redis-compatible server, for workers on several hosts"""
+
+    def __init__(self, url=QUEUE_URL, prefix=REDIS_PREFIX):
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._reap_script = self.client.register_script(_REAP_LUA)
+        self._lease = self.client.register_script(_LEASE_LUA)
+        self._heartbeat = self.client.register_script(_HEARTBEAT_LUA)
+        self._finish = self.client.register_script(_FINISH_LUA)
+        self._release = self.client.register_script(_RELEASE_LUA)
+        self._cancel = self.client.register_script(_CANCEL_LUA)
+
+    def _key(self, *parts):
+        return ":".join((self.prefix, *map(str, parts)))
+
+    def _reap(self):
+        self._reap_script(args=[time.time(), MAX_ATTEMPTS, self.prefix])
+
+    def create_job(self, job_id, chat_id, meta):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("job", job_id), mapping={
+            "chat_id": chat_id, "meta": json.dumps(meta), "created": time.time(),
+            "closed": 0, "cancelled": 0})
+        pipe.sadd(self._key("jobs"), job_id)
+        pipe.execute()
+
+    def push(self, job_id, payloads):
+        last = self.client.incrby(self._key("next"), len(payloads))
+        ids = range(last - len(payloads) + 1, last + 1)
+        # Only the coordinator pushes to a job, so the length is stable here
+        base = self.client.llen(self._key("job", job_id, "items"))
+        pipe = self.client.pipeline()
+        for n, (item_id, payload) in enumerate(zip(ids, payloads), 1):
+            pipe.hset(self._key("item", item_id), mapping={
+                "job": job_id, "seq": base + n, "payload": json.dumps(payload), "status": QUEUED, "attempts": 0})
+        pipe.rpush(self._key("job", job_id, "items"), *ids)
+        pipe.rpush(self._key("ready"), *ids)
+        pipe.execute()
+
+    def close(self, job_id, meta_update=None):
+        key = self._key("job", job_id)
+        if meta_update:
+            meta = json.loads(self.client.hget(key, "meta") or "{}")
+            self.client.hset(key, "meta", json.dumps({**meta, **meta_update}))
+        self.client.hset(key, "closed", 1)
+
+    def cancel(self, job_id):
+        self.client.hset(self._key("job", job_id), mapping={"cancelled": 1, "closed": 1})
+        return sum(self._cancel(args=[self.prefix, item_id])
+                   for item_id in self.client.lrange(self._key("job", job_id, "items"), 0, -1))
+
+    def lease(self, worker, seconds=LEASE_SECONDS):
+        now = time.time()
+        item_id = self._lease(args=[now, MAX_ATTEMPTS, self.prefix, worker, now + seconds])
+        if not item_id:
+            return None
+        item = self.client.hgetall(self._key("item", item_id))
+        job = self.client.hgetall(self._key("job", item["job"]))
+        if int(item["attempts"]) > 1:
+            logger.warning("♻️ Item %s#%s requeued after an expired lease", item["job"], item["seq"])
+        return LeasedItem(item_id, item["job"], int(item["seq"]), json.loads(item["payload"]),
+                          json.loads(job.get("meta") or "{}"), int(item["attempts"]))
+
+    def heartbeat(self, item_id, worker, seconds=LEASE_SECONDS):
+        return bool(self._heartbeat(args=[self.prefix, item_id, worker, time.time() + seconds]))
+
+    def finish(self, item_id, worker, status, result=None, error=None):
+        return bool(self._finish(args=[self.prefix, item_id, worker, status,
+                                       json.dumps(result) if result is not None else "", error or ""]))
+
+    def release(self, item_id, worker):
+        self._release(args=[self.prefix, item_id, worker])
+
+    def in_flight_before(self, job_id, seq):
+        # seq counts from 1, so the earlier items are the first seq-1 ids
+        ids = self.client.lrange(self._key("job", job_id, "items"), 0, seq - 2)
+        pipe = self.client.pipeline()
+        for item_id in ids:
+            pipe.hget(self._key("item", item_id), "status")
+            pipe.zscore(self._key("leases"), item_id)
+        values = pipe.execute()
+        now = time.time()
+        return sum(1 for status, deadline in zip(values[::2], values[1::2])
+                   if status == LEASED and deadline is not None and deadline >= now)
+
+    def _items(self, job_id):
+        ids = self.client.lrange(self._key("job", job_id, "items"), 0, -1)
+        pipe = self.client.pipeline()
+        for item_id in ids:
+            pipe.hgetall(self._key("item", item_id))
+        return pipe.execute()
+
+    def finished_jobs(self):
+        self._reap()
+        jobs = []
+        for job_id in self.client.smembers(self._key("jobs")):
+            job = self.client.hgetall(self._key("job", job_id))
+            if not job or job.get("closed") != "1":
+                continue
+            items = self._items(job_id)
+            if any(item.get("status") in (QUEUED, LEASED) for item in items):
+                continue
+            jobs.append(FinishedJob(job_id, int(job["chat_id"]), json.loads(job["meta"]), [
+                (item["status"], json.loads(item["payload"]),
+                 json.loads(item["result"]) if item.get("result") else None, item.get("error") or None)
+                for item in items]))
+        return sorted(jobs, key=lambda job: job.meta.get("created", 0))
+
+    def mark_reported(self, job_id):
+        ids = self.client.lrange(self._key("job", job_id, "items"), 0, -1)
+        pipe = self.client.pipeline()
+        pipe.srem(self._key("jobs"), job_id)
+        for key in [self._key("job", job_id), self._key("job", job_id, "items")] + [self._key("item", i) for i in ids]:
+            pipe.expire(key, KEEP_SECONDS)
+        pipe.execute()
+
+    def open_jobs(self, chat_id):
+        jobs = []
+        for job_id in self.client.smembers(self._key("jobs")):
+            chat, cancelled = self.client.hmget(self._key("job", job_id), "chat_id", "cancelled")
+            if chat == str(chat_id) and cancelled != "1":
+                jobs.append(job_id)
+        return jobs
+
+    def stats(self):
+        counts = {}
+        workers = set()
+        now = time.time()
+        for job_id in self.client.smembers(self._key("jobs")):
+            for item in self._items(job_id):
+                counts[item.get("status")] = counts.get(item.get("status"), 0) + 1
+        for item_id, deadline in self.client.zrange(self._key("leases"), 0, -1, withscores=True):
+            if deadline >= now:
+                workers.add(self.client.hget(self._key("item", item_id), "worker"))
+        return {"items": counts, "workers": sorted(filter(None, workers)),
+                "open_jobs": self.client.scard(self._key("jobs"))}
+
+
+class JobQueue:
+    """
+    Async front for the configured backend; backend calls are short but do
+    I/O, so they run in the default executor instead of on the event loop
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if QUEUE_URL.startswith(("redis://", "rediss://", "unix://")):
+                if not REDIS_AVAILABLE:
+                    raise RuntimeError("JOB_QUEUE_URL points at Redis but the redis package is not installed")
+                self._backend = RedisQueue(QUEUE_URL)
+                logger.info("📮 Job queue: Redis (%s)", QUEUE_URL.split("@")[-1])
+            else:
+                self._backend = SQLiteQueue(QUEUE_PATH)
+                logger.info("📮 Job queue: SQLite (%s)", QUEUE_PATH)
+        return self._backend
+
+    async def _call(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, getattr(self.backend, method), *args)
+
+    async def create_job(self, chat_id, meta, job_id=None):
+        """Open a job; items are pushed as the batch is prepared. Returns the job id"""
+        job_id = job_id or uuid.uuid4().hex[:12]
+        await self._call("create_job", job_id, chat_id, {**meta, "created": time.time()})
+        return job_id
+
+    async def push(self, job_id, *payloads):
+        if payloads:
+            await self._call("push", job_id, list(payloads))
+
+    async def close(self, job_id, **meta_update):
+        """No more items; the job can be reported once workers settle the rest"""
+        await self._call("close", job_id, meta_update or None)
+
+    async def cancel(self, job_id):
+        """Drop items no worker has started; returns how many were dropped"""
+        return await self._call("cancel", job_id)
+
+    async def lease(self, worker, seconds=LEASE_SECONDS):
+        return await self._call("lease", worker, seconds)
+
+    async def heartbeat(self, item, worker, seconds=LEASE_SECONDS):
+        """Extend the lease; False means it expired and another worker may hold the item"""
+        return await self._call("heartbeat", item.id, worker, seconds)
+
+    async def complete(self, item, worker, result=None):
+        return await self._call("finish", item.id, worker, DONE, result, None)
+
+    async def fail(self, item, worker, error, result=None):
+        return await self._call("finish", item.id, worker, FAILED, result, str(error)[:500])
+
+    async def release(self, item, worker):
+        await self._call("release", item.id, worker)
+
+    async def in_flight_before(self, item):
+        """Earlier items of the item's job that a live worker still holds"""
+        return await self._call("in_flight_before", item.job_id, item.seq)
+
+    async def finished_jobs(self):
+        return await self._call("finished_jobs")
+
+    async def mark_reported(self, job_id):
+        await self._call("mark_reported", job_id)
+
+    async def open_jobs(self, chat_id):
+        return await self._call("open_jobs", chat_id)
+
+    async def stats(self):
+        return await self._call("stats")
+
+
+# Global queue instance
+job_queue = JobQueue()
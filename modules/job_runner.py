@@ -0,0 +1,232 @@
+"""
+Job Runner
+Worker side of coordinator mode: runs one leased queue item through the
+same download and upload steps drm_handler uses in-process. The coordinator
+has already resolved the link (signed URL, keys, yt-dlp command, caption),
+so an item carries everything it needs and any worker on any host can take
+it. Format planning (a full extraction) is left to the worker, where it
+scales with the number of workers. Failures are reported to the channel the same way the batch loop does.
+
+Items download as soon as they are leased, but each one waits for its turn
+before anything is posted, so the channel receives a batch in order however
+many workers share it.
+"""
+
+import os
+import asyncio
+import logging
+
+import aiohttp
+from pyrogram.errors import FloodWait
+
+from . import saini as helper
+from . import metrics
+from . import link_router
+from .ytdlp_pool import run_ytdlp
+from .job_queue import job_queue
+from .album_batcher import AlbumBatcher
+from .format_planner import format_planner
+from .fanout import FanOut
+from .lazy_imports import lazy_import
+from vars import api_url, api_token
+
+logger = logging.getLogger(__name__)
+
+cloudscraper = lazy_import("cloudscraper")
+
+# Payload strategy for a detached album (several links, one media group)
+ALBUM = "album"
+FLOODWAIT_RETRIES = 3
+PDF_RETRIES = 15
+PDF_RETRY_DELAY = 4
+# Seconds between checks while a finished item waits for its turn to post
+ORDER_POLL_SECONDS = float(os.environ.get("JOB_ORDER_POLL_SECONDS", "2"))
+
+
+def failure_text(label, url, reason):
+    return (f'⚠️**Downloading Failed**⚠️\n**Name** =>> `{label}`\n**Url** =>> {url}\n\n'
+            f'<blockquote expandable><i><b>Failed Reason: {reason}</b></i></blockquote>')
+
+
+def units(payload):
+    """Links an item stands for in the batch summary"""
+    if payload.get("strategy") == ALBUM:
+        return len(payload["album"]["items"])
+    return 1
+
+
+async def wait_turn(item):
+    """
+    Hold an item until the earlier items of its job that live workers hold
+    are settled. An earlier item whose worker was lost (lease expired or
+    handed back) does not hold later ones up; it is posted out of order when
+    it is retried.
+    """
+    while True:
+        try:
+            if not await job_queue.in_flight_before(item):
+                return
+        except Exception as e:
+            logger.warning("Order check for %s failed, posting now: %s", item, e)
+            return
+        await asyncio.sleep(ORDER_POLL_SECONDS)
+
+
+async def job_thumb(job_id, thumb):
+    """The job's custom thumbnail as a local file (fetched once per job), or "/d" """
+    if not thumb.startswith(("http://", "https://")):
+        return thumb
+    path = f"thumb_{job_id}.jpg"
+    if not os.path.exists(path):
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                async with session.get(thumb) as resp:
+                    resp.raise_for_status()
+                    with open(path, "wb") as f:
+                        f.write(await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logger.warning("Thumbnail fetch failed for job %s: %s", job_id, e)
+            return "/d"
+    return path
+
+
+def _fetch_pdf(url, path):
+    """cwmediabkt99 PDFs sit behind Cloudflare; returns None or the failure reason"""
+    response = cloudscraper.create_scraper().get(url.replace(" ", "%20"))
+    if response.status_code != 200:
+        return f"{response.status_code} {response.reason}"
+    with open(path, "wb") as f:
+        f.write(response.content)
+    return None
+
+
+async def _send_document(bot, item, fanout, channel_id, path, caption):
+    await wait_turn(item)
+    copy = await bot.send_document(chat_id=channel_id, document=path, caption=caption)
+    fanout.replicate(copy)
+    os.remove(path)
+
+
+async def _video(bot, item, worker, fanout, download):
+    p, meta = item.payload, item.meta
+    channel_id = meta["channel_id"]
+    prog = await bot.send_message(channel_id, f"<i><b>Video Downloading</b></i>\n<blockquote><b>{p['label']}</b></blockquote>", disable_web_page_preview=True)
+    status = await bot.send_message(meta["chat_id"], f"<blockquote><b>⚡Dᴏᴡɴʟᴏᴀᴅɪɴɢ Sᴛᴀʀᴛᴇᴅ...⏳</b></blockquote>\n<blockquote>📚𝐓𝐢𝐭𝐥𝐞 » {p['namef']}</blockquote>\n🛠 Worker » `{worker}`", disable_web_page_preview=True)
+    try:
+        filename = await download(status)
+    finally:
+        await status.delete(True)
+        await prog.delete(True)
+    if not filename or not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        raise RuntimeError("Video file not found or empty after download")
+    await wait_turn(item)
+    thumb = await job_thumb(item.job_id, meta.get("thumb", "/d"))
+    copy = await helper.send_vid(bot, None, p["caption"], filename, meta.get("vidwatermark", "/d"), thumb, p["name"], prog, channel_id)
+    if copy is None:
+        # send_vid already posted why (empty, truncated or unsplittable file)
+        return {"sent": 0, "failed": 1, "notified": True}
+    fanout.replicate(copy)
+    return {"sent": 1, "failed": 0}
+
+
+async def _run(bot, item, worker, fanout):
+    p, meta = item.payload, item.meta
+    channel_id = meta["channel_id"]
+    strategy = p["strategy"]
+    url = p.get("url")
+
+    if strategy == ALBUM:
+        album = AlbumBatcher.restore(bot, channel_id, p["album"])
+        await wait_turn(item)
+        sent, failed = await album.flush()
+        fanout.replicate(sent)
+        for album_item, reason in failed:
+            await bot.send_message(channel_id, failure_text(album_item.label, album_item.url, reason), disable_web_page_preview=True)
+        return {"sent": units(p) - len(failed), "failed": len(failed), "notified": True}
+
+    if strategy == link_router.DOCUMENT:
+        path = await helper.download(url, p["name"])
+        await _send_document(bot, item, fanout, channel_id, path, p["caption"])
+
+    elif strategy == link_router.PDF_DOC:
+        path = f"{p['namef']}.pdf"
+        if "cwmediabkt99" in url:
+            loop = asyncio.get_running_loop()
+            for attempt in range(PDF_RETRIES):
+                await asyncio.sleep(PDF_RETRY_DELAY)
+                try:
+                    reason = await loop.run_in_executor(None, _fetch_pdf, url, path)
+                except Exception as e:
+                    reason = str(e)
+                if reason is None:
+                    break
+                logger.warning("PDF attempt %d/%d failed for %s: %s", attempt + 1, PDF_RETRIES, p["label"], reason)
+            else:
+                raise RuntimeError(f"PDF download failed after {PDF_RETRIES} attempts: {reason}")
+        else:
+            await run_ytdlp(f'yt-dlp -o "{path}" "{url}" -R 25 --fragment-retries 25')
+        await _send_document(bot, item, fanout, channel_id, path, p["caption"])
+
+    elif strategy == link_router.HTML_DOC:
+        path = f"{p['name']}.html"
+        await helper.pdf_download(f"{api_url}utkash-ws?url={url}&authorization={api_token}", path)
+        await _send_document(bot, item, fanout, channel_id, path, p["caption"])
+
+    elif strategy == link_router.AUDIO_DOC:
+        path = f"{p['namef']}{p['ext']}"
+        await run_ytdlp(f'yt-dlp -o "{path}" "{url}" -R 25 --fragment-retries 25')
+        await _send_document(bot, item, fanout, channel_id, path, p["caption"])
+
+    elif strategy == link_router.APPX_DECRYPT:
+        return await _video(bot, item, worker, fanout,
+                            lambda status: helper.download_and_decrypt_video(url, p["cmd"], p["name"], p["appxkey"]))
+
+    elif strategy == link_router.WIDEVINE:
+        return await _video(bot, item, worker, fanout,
+                            lambda status: helper.decrypt_and_merge_video(p["mpd"], p["keys"], p["path"], p["name"], p["quality"]))
+
+    else:
+        cmd = p["cmd"]
+        if p.get("plan"):
+            # Planned here, not by the coordinator, so extraction scales with workers
+            fplan = await format_planner.plan(url, p["quality"])
+            if fplan and fplan.info_path:
+                cmd = f'yt-dlp --load-info-json "{fplan.info_path}" -f "{fplan.selector}" -o "{p["name"]}.mp4"'
+            elif fplan:
+                cmd = f'yt-dlp -f "{fplan.selector}" "{url}" -o "{p["name"]}.mp4"'
+        return await _video(bot, item, worker, fanout,
+                            lambda status: helper.download_video(url, cmd, p["name"], status))
+
+    return {"sent": 1, "failed": 0}
+
+
+async def run_item(bot, item, worker=""):
+    """
+    Download and upload one leased item, mirroring it like the batch loop
+
+    Returns:
+        dict: {"sent": n, "failed": n}; "error" is set when the item failed
+        outright (a failure notice has been posted to the channel)
+    """
+    p, meta = item.payload, item.meta
+    fanout = FanOut(bot, meta.get("destinations") or [meta["channel_id"]])
+    try:
+        for attempt in range(FLOODWAIT_RETRIES):
+            try:
+                with metrics.track_job("worker"):
+                    return await _run(bot, item, worker, fanout)
+            except FloodWait as e:
+                metrics.record_floodwait(e.value)
+                logger.warning("FloodWait %ss on %s#%s", e.value, item.job_id, item.seq)
+                await asyncio.sleep(e.value)
+        raise RuntimeError(f"FloodWait persisted after {FLOODWAIT_RETRIES} attempts")
+    except Exception as e:
+        logger.error("Item %s#%s failed: %s", item.job_id, item.seq, e)
+        try:
+            await wait_turn(item)
+            await bot.send_message(meta["channel_id"], failure_text(p.get("label"), p.get("url"), e), disable_web_page_preview=True)
+        except Exception as notify_error:
+            logger.warning("Could not post failure notice: %s", notify_error)
+        return {"sent": 0, "failed": units(p), "notified": True, "error": str(e)}
+    finally:
+        await fanout.drain()
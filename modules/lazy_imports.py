@@ -0,0 +1,155 @@
+"""
+Lazy Imports & Startup Profile
+Heavy third-party modules (yt-dlp, cloudscraper, m3u8, pycryptodome, ...) are
+bound as LazyModule proxies and only imported when a handler first touches
+them, so a cold start pays for Pyrogram and little else. Every deferred load
+and a few startup milestones are recorded for the /importprofile command.
+"""
+
+import os
+import sys
+import html
+import time
+import types
+import asyncio
+import importlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    PROCESS_STARTED = psutil.Process().create_time()
+except Exception:
+    PROCESS_STARTED = time.time()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_lock = threading.RLock()
+_proxies = {}
+load_times = {}   # module -> {"seconds", "first_use", "since_start"}
+milestones = {}   # milestone -> seconds since process start
+
+
+def _caller():
+    """module:function of the first frame outside this file"""
+    frame = sys._getframe(1)
+    while frame and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with _lock:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                name = self.__name__
+                already = name in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(name)
+                if not already:
+                    load_times[name] = {
+                        "seconds": time.perf_counter() - start,
+                        "first_use": _caller(),
+                        "since_start": time.time() - PROCESS_STARTED,
+                    }
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "deferred"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """Return a shared proxy for module `name`, e.g. `yt_dlp = lazy_import("yt_dlp")`"""
+    with _lock:
+        proxy = _proxies.get(name)
+        if proxy is None:
+            proxy = _proxies[name] = LazyModule(name)
+        return proxy
+
+
+def mark(milestone):
+    """Record the first time a startup milestone is reached"""
+    if milestone not in milestones:
+        milestones[milestone] = time.time() - PROCESS_STARTED
+
+
+def deferred_modules():
+    """Lazy modules nobody has needed yet"""
+    return sorted(name for name, proxy in _proxies.items() if proxy.__dict__["_lazy_module"] is None)
+
+
+async def importtime_profile(target="main", limit=15):
+    """
+    Import `target` in a fresh interpreter under -X importtime
+
+    Returns:
+        list: (cumulative_us, self_us, module) for the slowest top-level imports
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-X", "importtime", "-c", f"import {target}",
+        cwd=PROJECT_ROOT,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await asyncio.wait_for(process.communicate(), timeout=120)
+    rows = []
+    for line in stderr.decode(errors="replace").splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        # After the separator space, a two-space indent marks a direct import of the target
+        module = module[1:]
+        if module.startswith("  ") and not module.startswith("   "):
+            rows.append((int(cumulative_us), int(self_us), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def format_report(profile=None):
+    text = "<b>⏱️ Startup & import profile</b>\n"
+    if milestones:
+        text += "\n<b>Milestones (since process start)</b>\n<blockquote>"
+        text += "\n".join(f"{html.escape(name)}: {seconds:.2f}s"
+                          for name, seconds in sorted(milestones.items(), key=lambda item: item[1]))
+        text += "</blockquote>"
+    if load_times:
+        text += "\n<b>Deferred imports loaded</b>\n<blockquote>"
+        text += "\n".join(f"{html.escape(name)}: {info['seconds'] * 1000:.0f}ms "
+                          f"(at {info['since_start']:.0f}s by {html.escape(info['first_use'])})"
+                          for name, info in sorted(load_times.items(), key=lambda item: -item[1]["seconds"]))
+        text += "</blockquote>"
+    deferred = deferred_modules()
+    if deferred:
+        text += f"\n<b>Still deferred</b>\n<blockquote>{html.escape(', '.join(deferred))}</blockquote>"
+    if profile:
+        text += "\n<b>Slowest imports of main (fresh interpreter)</b>\n<blockquote>"
+        text += "\n".join(f"{html.escape(module)}: {cumulative / 1000:.0f}ms"
+                          for cumulative, _, module in profile)
+        text += "</blockquote>"
+    return text
@@ -0,0 +1,135 @@
+"""
+Link Router
+Classifies every batch link once, from its parsed host, path suffix and query,
+into an item kind. The kind picks the upload strategy from a lookup table and
+feeds the summary counts, so a path that merely contains "v2", "zip" or "drm"
+no longer sends a link down the wrong handler.
+"""
+
+import os
+from urllib.parse import urlsplit, parse_qsl
+
+
+# Item kinds
+YOUTUBE = "youtube"
+DRIVE = "drive"
+PDF = "pdf"
+IMAGE = "image"
+AUDIO = "audio"
+WEB_HTML = "ws"
+APPX = "appx"
+DRM = "drm"
+MPD = "mpd"
+M3U8 = "m3u8"
+ZIP = "zip"
+V2 = "v2"
+VIDEO = "video"
+
+# Upload strategies used by drm_handler
+DOCUMENT = "document"
+PDF_DOC = "pdf"
+HTML_DOC = "html"
+PHOTO = "photo"
+AUDIO_DOC = "audio"
+APPX_DECRYPT = "appx"
+WIDEVINE = "widevine"
+VIDEO_DL = "video"
+
+STRATEGIES = {
+    DRIVE: DOCUMENT,
+    PDF: PDF_DOC,
+    WEB_HTML: HTML_DOC,
+    IMAGE: PHOTO,
+    AUDIO: AUDIO_DOC,
+    APPX: APPX_DECRYPT,
+    DRM: WIDEVINE,
+}
+
+# Files served as-is; checked before the DRM/stream rules
+FILE_SUFFIXES = {
+    ".pdf": PDF,
+    ".jpg": IMAGE, ".jpeg": IMAGE, ".png": IMAGE,
+    ".mp3": AUDIO, ".wav": AUDIO, ".m4a": AUDIO,
+    ".ws": WEB_HTML,
+}
+STREAM_SUFFIXES = {".mpd": MPD, ".m3u8": M3U8, ".zip": ZIP}
+
+DRIVE_HOSTS = {"drive.google.com", "docs.google.com", "drive.usercontent.google.com"}
+DRM_HOSTS = {"cpvod.testbook.com"}
+DRM_PATHS = ("/drm/wv", "/drm/common")
+
+# Batch summary buckets ("other" for everything else)
+COUNT_KEYS = {PDF: "pdf", IMAGE: "img", V2: "v2", MPD: "mpd", M3U8: "m3u8",
+              DRM: "drm", YOUTUBE: "yt", ZIP: "zip"}
+COUNT_ORDER = ("pdf", "img", "v2", "mpd", "m3u8", "drm", "yt", "zip", "other")
+
+
+class Route:
+    """Classification of one link"""
+
+    __slots__ = ("url", "kind", "host", "path", "suffix", "strategy")
+
+    def __init__(self, url, kind, host, path, suffix):
+        self.url = url
+        self.kind = kind
+        self.host = host
+        self.path = path
+        self.suffix = suffix
+        self.strategy = STRATEGIES.get(kind, VIDEO_DL)
+
+    def __repr__(self):
+        return f"<Route {self.kind} -> {self.strategy} {self.url[:60]!r}>"
+
+
+def _suffix(path):
+    # Appx links carry their key after '*': ".../encrypted.mkv*KEY"
+    name = path.split("*", 1)[0].rsplit("/", 1)[-1]
+    return os.path.splitext(name)[1].lower()
+
+
+def classify(url):
+    """Parse `url` once and return its Route"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return Route(url, VIDEO, "", "", "")
+    host = (parts.hostname or "").lower()
+    path = parts.path
+    suffix = _suffix(path)
+
+    if suffix not in FILE_SUFFIXES and parts.query:
+        # API links that name the file in the query (.../get?file=notes.pdf)
+        suffix = next((s for s in (_suffix(v) for _, v in parse_qsl(parts.query)) if s in FILE_SUFFIXES), suffix)
+
+    if host.endswith(("youtube.com", "youtu.be", "youtube-nocookie.com")):
+        kind = YOUTUBE
+    elif host in DRIVE_HOSTS:
+        kind = DRIVE
+    elif suffix in FILE_SUFFIXES:
+        kind = FILE_SUFFIXES[suffix]
+    elif "encrypted.m" in path:
+        kind = APPX
+    elif (host in DRM_HOSTS or "drmcdni" in host
+          or (host.endswith("classplusapp.com") and "/drm/" in path)
+          or any(marker in path for marker in DRM_PATHS)):
+        kind = DRM
+    elif suffix in STREAM_SUFFIXES:
+        kind = STREAM_SUFFIXES[suffix]
+    elif "v2" in path.lower().split("/"):
+        kind = V2
+    else:
+        kind = VIDEO
+    return Route(url, kind, host, path, suffix)
+
+
+def route_links(links):
+    """Routes for (title, url) pairs, in order"""
+    return [classify(url) for _, url in links]
+
+
+def count_kinds(routes):
+    """Summary counts keyed by COUNT_ORDER"""
+    counts = dict.fromkeys(COUNT_ORDER, 0)
+    for route in routes:
+        counts[COUNT_KEYS.get(route.kind, "other")] += 1
+    return counts
@@ -1,20 +1,265 @@
-# logs.py
-
-import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime, timedelta
-
-# Set up logging
-logging.basicConfig(
-    level=logging.ERROR,
-    format="%(asctime)s - %(levelname)s - %(message)s [%(filename)s:%(lineno)d]",
-    datefmt="%d-%b-%y %H:%M:%S",
-    handlers=[
-        RotatingFileHandler("logs.txt", maxBytes=50000000, backupCount=10),
-        logging.StreamHandler(),
-    ],
-)
-logging.getLogger("pyrogram").setLevel(logging.WARNING)
-
-# Initialize logger
-logger = logging.getLogger()
+# logs.py
+"""
+Logging Pipeline
+Every record goes through a QueueHandler, so the calling thread (usually the
+event loop) only enqueues. A QueueListener thread does the formatting and
+file I/O: JSON lines with job/item correlation ids into a rotating file under
+LOG_DIR, plus the familiar one-line format on the console. High-frequency
+progress records are sampled, and levels can be set per module with
+LOG_LEVELS="pyrogram=WARNING,modules.saini=DEBUG".
+"""
+
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import itertools
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.environ.get("LOG_DIR", "logs")
+LOG_FILE = os.path.join(LOG_DIR, "bot.jsonl")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "pyrogram=WARNING")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+# A sampled record key is logged at most once per this many seconds
+LOG_SAMPLE_SECONDS = float(os.environ.get("LOG_SAMPLE_SECONDS", "5"))
+
+CONSOLE_FORMAT = "%(asctime)s - %(levelname)s - %(message)s [%(filename)s:%(lineno)d]"
+CONSOLE_DATEFMT = "%d-%b-%y %H:%M:%S"
+
+# Correlation ids for the batch (job) and the link inside it (item)
+job_id = contextvars.ContextVar("job_id", default=None)
+item_id = contextvars.ContextVar("item_id", default=None)
+_job_seq = itertools.count(1)
+
+# Attributes every LogRecord has; anything else came in via extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "job", "item", "sample"}
+
+
+def new_job_id(prefix="job"):
+    return f"{prefix}-{int(time.time()) % 100000:05d}-{next(_job_seq)}"
+
+
+@contextmanager
+def log_context(job=None, item=None):
+    """Tag every record logged inside the block (and tasks it spawns) with job/item ids"""
+    tokens = []
+    if job is not None:
+        tokens.append((job_id, job_id.set(job)))
+    if item is not None:
+        tokens.append((item_id, item_id.set(item)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def set_item(item):
+    """Set the current item id for the rest of this job (loop bodies)"""
+    item_id.set(item)
+
+
+def job_scope(prefix):
+    """
+    Decorator giving each run of a handler coroutine its own job id
+
+    Pyrogram runs handlers inside long-lived dispatcher tasks, so ids set
+    directly would leak into the next update; the wrapper restores them.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            job_token = job_id.set(new_job_id(prefix))
+            item_token = item_id.set(None)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                item_id.reset(item_token)
+                job_id.reset(job_token)
+        return wrapper
+    return decorate
+
+
+class ContextFilter(logging.Filter):
+    """Copies correlation ids onto the record on the caller's side of the queue"""
+
+    def filter(self, record):
+        record.job = job_id.get()
+        record.item = item_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops records logged with extra={"sample": key} when the same key (per
+    job) was let through less than LOG_SAMPLE_SECONDS ago; counts the drops
+    """
+
+    def __init__(self, interval=LOG_SAMPLE_SECONDS):
+        super().__init__()
+        self.interval = interval
+        self.last = {}
+        self.dropped = 0
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        key = (key, getattr(record, "job", None))
+        now = time.monotonic()
+        if now - self.last.get(key, -self.interval) < self.interval:
+            self.dropped += 1
+            return False
+        self.last[key] = now
+        if len(self.last) > 1000:
+            self.last.clear()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "src": f"{record.filename}:{record.lineno}",
+        }
+        if getattr(record, "job", None):
+            entry["job"] = record.job
+        if getattr(record, "item", None) is not None:
+            entry["item"] = record.item
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Keep the record's fields for the JSON formatter; only render msg/args
+        # and the traceback here, since args may not survive the thread hop
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+sampler = SamplingFilter()
+
+
+def _apply_levels(spec):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS):
+    """Install the queue pipeline on the root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT, CONSOLE_DATEFMT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(sampler)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    _apply_levels(levels)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _log_files():
+    """Current and rotated log files, oldest first"""
+    files = [f"{LOG_FILE}.{n}" for n in range(LOG_BACKUPS, 0, -1)] + [LOG_FILE]
+    return [path for path in files if os.path.exists(path)]
+
+
+def export_logs(since=None, until=None, level=None, job=None):
+    """
+    Gzipped JSON-lines export of the records in [since, until)
+
+    Args:
+        since, until: aware datetime bounds, either may be None
+        level: minimum level name, e.g. "WARNING"
+        job: only records of this job id
+
+    Returns:
+        tuple: (BytesIO positioned at 0, number of records)
+    """
+    minimum = logging.getLevelName(level.upper()) if level else 0
+    since_s = since.astimezone(timezone.utc).isoformat(timespec="milliseconds") if since else None
+    until_s = until.astimezone(timezone.utc).isoformat(timespec="milliseconds") if until else None
+    out = io.BytesIO()
+    count = 0
+    with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+        for path in _log_files():
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    ts = entry.get("ts", "")
+                    # ISO timestamps in one timezone compare correctly as strings
+                    if (since_s and ts < since_s) or (until_s and ts >= until_s):
+                        continue
+                    if minimum and logging.getLevelName(entry.get("level", "INFO")) < minimum:
+                        continue
+                    if job and entry.get("job") != job:
+                        continue
+                    gz.write(line.encode("utf-8"))
+                    count += 1
+    out.seek(0)
+    return out, count
+
+
+setup_logging()
+
+# Initialize logger
+logger = logging.getLogger()
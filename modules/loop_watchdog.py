@@ -0,0 +1,149 @@
+"""
+Event Loop Watchdog
+Finds blocking calls on the bot's event loop. A probe coroutine ticks every
+PROBE_INTERVAL seconds; a separate thread notices when the tick is late by
+more than BLOCKING_THRESHOLD and captures the loop thread's stack at that
+moment. Blocks are aggregated per call site (module:line) into a ranked
+report for the /blockers owner command and the metrics endpoint.
+"""
+
+import os
+import sys
+import html
+import time
+import asyncio
+import threading
+import traceback
+import logging
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL = float(os.environ.get("LOOP_PROBE_INTERVAL", "0.1"))
+BLOCKING_THRESHOLD = float(os.environ.get("LOOP_BLOCKING_THRESHOLD", "0.5"))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+blocked_seconds = metrics.registry.register(metrics.Counter(
+    "bot_loop_blocked_seconds_total", "Event loop time blocked, by call site", ["site"]))
+blocked_count = metrics.registry.register(metrics.Counter(
+    "bot_loop_blocks_total", "Event loop blocks over the threshold, by call site", ["site"]))
+
+
+def _is_project_file(filename):
+    path = os.path.abspath(filename)
+    return path.startswith(PROJECT_ROOT) and "site-packages" not in path
+
+
+def _relpath(filename):
+    try:
+        return os.path.relpath(filename, PROJECT_ROOT)
+    except ValueError:
+        return filename
+
+
+class LoopWatchdog:
+    """Lag probe plus stack-sampling watchdog thread for one event loop"""
+
+    def __init__(self, threshold=BLOCKING_THRESHOLD, interval=PROBE_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.sites = {}
+        self.max_lag = 0.0
+        self._loop_thread_id = None
+        self._last_tick = None
+        self._pending = None  # (block start tick, site, stack) captured for the current block
+        self._lock = threading.Lock()
+        self._thread = None
+        self._task = None
+
+    def start(self, loop):
+        """Schedule the probe on loop and start the watchdog thread"""
+        if self._task is not None:
+            return
+        self._task = loop.create_task(self._probe())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def _probe(self):
+        self._loop_thread_id = threading.get_ident()
+        loop = asyncio.get_running_loop()
+        self._last_tick = time.monotonic()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._last_tick = time.monotonic()
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._record_block(pending, lag)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval / 2)
+            with self._lock:
+                tick = self._last_tick
+                if tick is None or self._pending is not None:
+                    continue
+                if time.monotonic() - tick < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                self._pending = (tick,) + self._describe(frame)
+
+    @staticmethod
+    def _describe(frame):
+        """Return (site, stack text) for the blocking frame"""
+        stack = traceback.extract_stack(frame)
+        site = None
+        # Attribute the block to the innermost frame in our own code
+        for entry in reversed(stack):
+            if _is_project_file(entry.filename):
+                site = f"{_relpath(entry.filename)}:{entry.lineno} in {entry.name}"
+                break
+        if site is None and stack:
+            top = stack[-1]
+            site = f"{top.filename}:{top.lineno} in {top.name}"
+        text = "".join(traceback.format_list(stack[-8:]))
+        return site or "unknown", text
+
+    def _record_block(self, pending, lag):
+        site, stack = (pending[1], pending[2]) if pending else ("unattributed", "")
+        entry = self.sites.setdefault(site, {"count": 0, "total": 0.0, "max": 0.0, "stack": stack})
+        entry["count"] += 1
+        entry["total"] += lag
+        entry["max"] = max(entry["max"], lag)
+        if stack:
+            entry["stack"] = stack
+        blocked_seconds.inc(lag, site=site)
+        blocked_count.inc(site=site)
+        logger.warning("Event loop blocked %.2fs at %s", lag, site)
+
+    def report(self, limit=10):
+        """Call sites ranked by total blocked time"""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1]["total"], reverse=True)
+        return [dict(site=site, **stats) for site, stats in ranked[:limit]]
+
+    def format_report(self, limit=10):
+        rows = self.report(limit)
+        if not rows:
+            return (f"<b>✅ No event loop blocks over {self.threshold:.2f}s</b>\n"
+                    f"<blockquote>Max lag seen: {self.max_lag:.3f}s</blockquote>")
+        text = f"<b>🧱 Top event loop blockers (>{self.threshold:.2f}s)</b>\n"
+        for n, row in enumerate(rows, 1):
+            text += (f"\n<b>{n}. {html.escape(row['site'])}</b>\n"
+                     f"<blockquote>{row['count']}x | total {row['total']:.1f}s | max {row['max']:.1f}s</blockquote>")
+        text += f"\n\n<i>Max lag seen: {self.max_lag:.3f}s</i>"
+        return text
+
+    def reset(self):
+        self.sites.clear()
+        self.max_lag = 0.0
+
+
+# Global watchdog instance
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,192 @@
+"""
+Media Normalizer
+Pre-upload stage for send_vid. The probe's container and codecs decide, once
+and up front, how a file goes to Telegram:
+
+- streamable MP4 (H.264/HEVC + AAC/MP3, moov atom first): sent as-is
+- same codecs in MKV/WebM/TS or with the moov at the end: stream-copy
+  remux to MP4 with +faststart (audio alone re-encoded to AAC if needed)
+- video codecs Telegram cannot stream (VP9, AV1, ...): sent as a document
+- truncated or unreadable files: rejected before any bytes are uploaded
+
+This replaces the blind send_video -> send_document retry, which uploaded
+every rejected file twice.
+"""
+
+import os
+import json
+import struct
+import asyncio
+import logging
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+VIDEO = "video"
+DOCUMENT = "document"
+
+STREAM_VIDEO_CODECS = {"h264", "hevc"}
+MP4_AUDIO_CODECS = {"aac", "mp3"}
+MP4_FORMATS = {"mov", "mp4", "m4a", "3gp", "3g2", "mj2"}
+# Less than this fraction of the container's declared duration in the
+# streams means the download was cut short
+MIN_STREAM_RATIO = 0.9
+
+
+class MediaPlan:
+    """How a file should be uploaded"""
+
+    __slots__ = ("path", "method", "reason", "duration", "width", "height")
+
+    def __init__(self, path, method, reason="", duration=0.0, width=0, height=0):
+        self.path = path
+        self.method = method
+        self.reason = reason
+        self.duration = duration
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return f"<MediaPlan {self.method} {self.path!r} {self.reason}>"
+
+
+async def _run(*args):
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def probe_streams(filename):
+    """ffprobe format and stream info as a dict, or None if the file is unreadable"""
+    with metrics.stage_timer("probe"):
+        code, out, err = await _run("ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", filename)
+    if code != 0:
+        logger.warning("ffprobe rejected %s: %s", filename, err.strip()[:200])
+        return None
+    try:
+        return json.loads(out)
+    except ValueError:
+        return None
+
+
+def mp4_layout(filename):
+    """
+    Walk the top-level MP4 boxes
+
+    Returns:
+        str: "faststart" (moov before mdat), "moov_at_end", or "truncated"
+        (a box runs past end of file, or no moov at all)
+    """
+    size = os.path.getsize(filename)
+    seen_mdat = False
+    offset = 0
+    with open(filename, "rb") as f:
+        while offset + 8 <= size:
+            f.seek(offset)
+            box_size, box_type = struct.unpack(">I4s", f.read(8))
+            if box_size == 1:
+                box_size = struct.unpack(">Q", f.read(8))[0]
+            elif box_size == 0:
+                box_size = size - offset
+            if box_size < 8 or offset + box_size > size:
+                return "truncated"
+            if box_type == b"moov":
+                return "moov_at_end" if seen_mdat else "faststart"
+            if box_type == b"mdat":
+                seen_mdat = True
+            offset += box_size
+    return "truncated"
+
+
+def _stream_duration(stream):
+    try:
+        return float(stream.get("duration") or 0)
+    except ValueError:
+        return 0.0
+
+
+def plan_upload(filename, info):
+    """
+    Decide the upload path from probe output (no I/O besides the MP4 box walk)
+
+    Returns:
+        tuple: (MediaPlan, remux) where remux is None, "copy" or "audio"
+    """
+    if not info:
+        return MediaPlan(filename, None, "unreadable container"), None
+    fmt = info.get("format", {})
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    try:
+        length = float(fmt.get("duration") or 0)
+    except ValueError:
+        length = 0.0
+
+    if not video:
+        return MediaPlan(filename, DOCUMENT, "no video stream", length), None
+    if length <= 0:
+        return MediaPlan(filename, None, "no duration (truncated download?)"), None
+    longest = max((_stream_duration(s) for s in streams), default=0)
+    if longest and longest < length * MIN_STREAM_RATIO:
+        return MediaPlan(filename, None, f"streams end at {longest:.0f}s of {length:.0f}s (truncated)"), None
+
+    width, height = int(video.get("width") or 0), int(video.get("height") or 0)
+    plan = MediaPlan(filename, VIDEO, "", length, width, height)
+    if video.get("codec_name") not in STREAM_VIDEO_CODECS:
+        plan.method, plan.reason = DOCUMENT, f"{video.get('codec_name')} is not streamable"
+        return plan, None
+
+    audio_ok = audio is None or audio.get("codec_name") in MP4_AUDIO_CODECS
+    formats = set(fmt.get("format_name", "").split(","))
+    if formats & MP4_FORMATS:
+        layout = mp4_layout(filename)
+        if layout == "truncated":
+            return MediaPlan(filename, None, "MP4 boxes incomplete (truncated)"), None
+        if layout == "faststart" and audio_ok:
+            return plan, None
+        plan.reason = "moov at end" if layout == "moov_at_end" else f"{audio.get('codec_name')} audio"
+    else:
+        plan.reason = f"{fmt.get('format_name')} container"
+    return plan, ("copy" if audio_ok else "audio")
+
+
+async def remux(filename, mode):
+    """Stream-copy into MP4 with the moov first; returns the new path or None"""
+    out = os.path.splitext(filename)[0] + ".tg.mp4"
+    audio_args = ["-c:a", "copy"] if mode == "copy" else ["-c:a", "aac", "-b:a", "128k"]
+    with metrics.stage_timer("remux"):
+        code, _, err = await _run(
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", filename,
+            "-map", "0:v:0", "-map", "0:a?", "-c:v", "copy", *audio_args,
+            "-movflags", "+faststart", out)
+    if code != 0 or not os.path.exists(out) or os.path.getsize(out) == 0:
+        logger.warning("Remux of %s failed: %s", filename, err.strip()[:300])
+        if os.path.exists(out):
+            os.remove(out)
+        return None
+    return out
+
+
+async def prepare(filename):
+    """
+    Probe, remux if needed and return the MediaPlan for `filename`
+
+    plan.method is None when the file must not be uploaded (plan.reason says
+    why). When a remux happens the original is removed and plan.path points
+    at the new MP4.
+    """
+    info = await probe_streams(filename)
+    plan, mode = plan_upload(filename, info)
+    if mode:
+        out = await remux(filename, mode)
+        if out:
+            logger.info("📦 Remuxed %s to MP4 (%s)", os.path.basename(filename), plan.reason)
+            os.remove(filename)
+            plan.path = out
+        else:
+            plan.method, plan.reason = DOCUMENT, f"remux failed ({plan.reason})"
+    return plan
@@ -0,0 +1,177 @@
+"""
+Media Splitter
+Files over the bot upload limit are cut into parts instead of failing in
+send_video and then again in send_document. The probe gives duration and
+size; ffmpeg's segment muxer stream-copies the file into keyframe-aligned
+parts sized to fit under UPLOAD_LIMIT_MB, and the parts upload concurrently
+with "Part k/n" captions.
+"""
+
+import os
+import json
+import glob
+import math
+import time
+import asyncio
+import logging
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bots may upload up to 2000 MB; leave room for container overhead
+UPLOAD_LIMIT_MB = int(os.environ.get("UPLOAD_LIMIT_MB", "1950"))
+# Part uploads in flight at once
+UPLOAD_PARALLEL = int(os.environ.get("UPLOAD_PARALLEL", "2"))
+# Parts are cut on keyframes after the target time, so aim below the limit
+SPLIT_MARGIN = 0.9
+SPLIT_ATTEMPTS = 3
+
+MB = 1024 * 1024
+
+_upload_slots = None
+
+
+def upload_limit_bytes():
+    return UPLOAD_LIMIT_MB * MB
+
+
+async def _run(*args):
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def probe(filename):
+    """
+    Container duration, size and bitrate from ffprobe
+
+    Returns:
+        dict: {"duration": float, "size": int, "bit_rate": int}, zeros when unknown
+    """
+    info = {"duration": 0.0, "size": 0, "bit_rate": 0}
+    try:
+        with metrics.stage_timer("probe"):
+            code, out, err = await _run("ffprobe", "-v", "error", "-show_entries",
+                                        "format=duration,size,bit_rate", "-of", "json", filename)
+        if code == 0:
+            fmt = json.loads(out).get("format", {})
+            info["duration"] = float(fmt.get("duration") or 0)
+            info["size"] = int(fmt.get("size") or 0)
+            info["bit_rate"] = int(fmt.get("bit_rate") or 0)
+        else:
+            logger.warning("ffprobe failed for %s: %s", filename, err.strip()[:200])
+    except (OSError, ValueError) as e:
+        logger.warning("ffprobe failed for %s: %s", filename, e)
+    if not info["size"] and os.path.exists(filename):
+        info["size"] = os.path.getsize(filename)
+    return info
+
+
+def needs_split(size, limit=None):
+    return size > (limit or upload_limit_bytes())
+
+
+def _part_pattern(filename):
+    stem, ext = os.path.splitext(filename)
+    # The segment muxer treats '%' as a format directive
+    return f"{stem.replace('%', '%%')}.part%03d{ext or '.mp4'}"
+
+
+def _remove_parts(filename):
+    for path in glob.glob(glob.escape(os.path.splitext(filename)[0]) + ".part[0-9][0-9][0-9]*"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def split_media(filename, info=None, limit=None):
+    """
+    Stream-copy `filename` into keyframe-aligned parts under the limit
+
+    Returns:
+        list: part paths in order, or [] if the file could not be split
+    """
+    limit = limit or upload_limit_bytes()
+    info = info or await probe(filename)
+    size, length = info["size"], info["duration"]
+    if not length:
+        logger.warning("Cannot split %s: unknown duration", filename)
+        return []
+    parts_wanted = math.ceil(size / (limit * SPLIT_MARGIN))
+    pattern = _part_pattern(filename)
+    # Moov atom up front so Telegram can stream each part before it is fully
+    # fetched; other muxers reject the option, so only MP4-family parts get it
+    faststart = []
+    if os.path.splitext(pattern)[1].lower() in (".mp4", ".m4v", ".mov"):
+        faststart = ["-segment_format_options", "movflags=+faststart"]
+
+    for attempt in range(SPLIT_ATTEMPTS):
+        segment_time = length / parts_wanted
+        _remove_parts(filename)
+        with metrics.stage_timer("split"):
+            code, _, err = await _run(
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", filename,
+                "-map", "0", "-c", "copy", "-f", "segment",
+                "-segment_time", f"{segment_time:.3f}", "-reset_timestamps", "1",
+                *faststart, pattern)
+        parts = sorted(glob.glob(glob.escape(os.path.splitext(filename)[0]) + ".part[0-9][0-9][0-9]*"))
+        if code != 0 or not parts:
+            logger.error("ffmpeg segment failed for %s: %s", filename, err.strip()[:300])
+            _remove_parts(filename)
+            return []
+        largest = max(os.path.getsize(part) for part in parts)
+        if largest <= limit:
+            logger.info("✂️ Split %s (%.0f MB) into %d parts, largest %.0f MB",
+                        os.path.basename(filename), size / MB, len(parts), largest / MB)
+            return parts
+        # Long GOPs or bitrate spikes pushed a part over; cut finer
+        parts_wanted = math.ceil(parts_wanted * largest / (limit * SPLIT_MARGIN))
+        logger.info("Part of %.0f MB over the limit, retrying with %d parts", largest / MB, parts_wanted)
+    _remove_parts(filename)
+    return []
+
+
+def part_caption(caption, index, total):
+    return f"{caption}\n\n📦 **Part {index}/{total}**"
+
+
+async def upload_parts(bot, chat_id, parts, caption, thumb=None, as_document=False, **video_kwargs):
+    """
+    Upload parts concurrently (UPLOAD_PARALLEL at a time) as streamable videos,
+    or as documents when the normalizer found the codecs unstreamable
+
+    Returns:
+        list: sent messages in part order (None for parts that failed)
+    """
+    global _upload_slots
+    if _upload_slots is None:
+        _upload_slots = asyncio.Semaphore(UPLOAD_PARALLEL)
+    total = len(parts)
+
+    async def send(index, part):
+        async with _upload_slots:
+            info = await probe(part)
+            started = time.time()
+            try:
+                with metrics.track_job("upload"), metrics.stage_timer("upload"):
+                    if as_document:
+                        message = await bot.send_document(chat_id, part, caption=part_caption(caption, index, total), thumb=thumb)
+                    else:
+                        message = await bot.send_video(chat_id, part, caption=part_caption(caption, index, total),
+                                                       supports_streaming=True, thumb=thumb,
+                                                       duration=int(info["duration"]), **video_kwargs)
+                metrics.record_upload(info["size"], time.time() - started)
+                return message
+            except Exception as e:
+                logger.error("Upload of part %d/%d failed: %s", index, total, e)
+                return None
+            finally:
+                try:
+                    os.remove(part)
+                except OSError:
+                    pass
+
+    return await asyncio.gather(*(send(index, part) for index, part in enumerate(parts, 1)))
@@ -0,0 +1,266 @@
+"""
+Memory Governor
+Backpressure for the download pipeline driven by real memory numbers: the
+limit is MEMORY_LIMIT_MB if set, else the container's cgroup v2/v1 limit,
+else physical RAM, and usage is the RSS of the bot plus every child process
+(yt-dlp workers, ffmpeg, mp4decrypt) or the cgroup working set, whichever is
+higher. As headroom shrinks the governor first cuts fragment concurrency,
+then defers encodes, then holds new downloads until memory is released, so
+a 512 MB instance slows down instead of being OOM-killed.
+"""
+
+import os
+import gc
+import glob
+import time
+import asyncio
+import logging
+import tempfile
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Pressure thresholds as a fraction of the memory limit
+ELEVATED_RATIO = float(os.environ.get("MEMORY_ELEVATED_RATIO", "0.70"))
+HIGH_RATIO = float(os.environ.get("MEMORY_HIGH_RATIO", "0.80"))
+CRITICAL_RATIO = float(os.environ.get("MEMORY_CRITICAL_RATIO", "0.90"))
+# Longest a download or encode is held back before it runs anyway
+MAX_WAIT_SECONDS = int(os.environ.get("MEMORY_MAX_WAIT", "300"))
+POLL_SECONDS = 2
+SAMPLE_TTL = 1.0
+
+OK, ELEVATED, HIGH, CRITICAL = "ok", "elevated", "high", "critical"
+LEVELS = (OK, ELEVATED, HIGH, CRITICAL)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# cgroup v1 reports "unlimited" as a page-aligned number near 2**63
+UNLIMITED = 1 << 60
+
+MB = 1024 * 1024
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _read_stat(path, key):
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _cgroup_dirs():
+    """Candidate cgroup directories for this process, most specific first"""
+    dirs = []
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                _, controllers, path = line.strip().split(":", 2)
+                if controllers == "":
+                    dirs.append(("v2", os.path.join(CGROUP_ROOT, path.lstrip("/"))))
+                elif "memory" in controllers.split(","):
+                    dirs.append(("v1", os.path.join(CGROUP_ROOT, "memory", path.lstrip("/"))))
+    except (OSError, ValueError):
+        pass
+    # Inside a container namespace the process's own cgroup is mounted at the root
+    dirs.append(("v2", CGROUP_ROOT))
+    dirs.append(("v2", os.path.join(CGROUP_ROOT, "unified")))
+    dirs.append(("v1", os.path.join(CGROUP_ROOT, "memory")))
+    return dirs
+
+
+def detect_cgroup():
+    """
+    Find the memory cgroup that limits this process
+
+    Returns:
+        tuple: (version, directory, limit_bytes) or (None, None, None)
+    """
+    for version, directory in _cgroup_dirs():
+        name = "memory.max" if version == "v2" else "memory.limit_in_bytes"
+        limit = _read_int(os.path.join(directory, name))
+        if limit and limit < UNLIMITED:
+            return version, directory, limit
+    return None, None, None
+
+
+class MemoryGovernor:
+    """Samples memory use and throttles the pipeline as headroom shrinks"""
+
+    def __init__(self):
+        self.cgroup_version, self.cgroup_dir, cgroup_limit = detect_cgroup()
+        override = os.environ.get("MEMORY_LIMIT_MB")
+        if override:
+            self.limit_bytes, self.limit_source = int(float(override) * MB), "env"
+        elif cgroup_limit:
+            self.limit_bytes, self.limit_source = cgroup_limit, f"cgroup {self.cgroup_version}"
+        elif psutil:
+            self.limit_bytes, self.limit_source = psutil.virtual_memory().total, "physical"
+        else:
+            self.limit_bytes, self.limit_source = 512 * MB, "default"
+        self._sample = None
+        self._sampled_at = 0.0
+        self.stats = {"download_waits": 0, "encode_waits": 0, "wait_seconds": 0.0, "forced": 0}
+
+    @property
+    def limit_mb(self):
+        return self.limit_bytes / MB
+
+    @property
+    def constrained(self):
+        """True on small instances (1 GB or less) where defaults must be conservative"""
+        return self.limit_bytes <= 1024 * MB
+
+    def _working_set(self):
+        """cgroup usage minus reclaimable page cache"""
+        if not self.cgroup_dir:
+            return None
+        if self.cgroup_version == "v2":
+            usage = _read_int(os.path.join(self.cgroup_dir, "memory.current"))
+            inactive = _read_stat(os.path.join(self.cgroup_dir, "memory.stat"), "inactive_file")
+        else:
+            usage = _read_int(os.path.join(self.cgroup_dir, "memory.usage_in_bytes"))
+            inactive = _read_stat(os.path.join(self.cgroup_dir, "memory.stat"), "total_inactive_file")
+        if usage is None:
+            return None
+        return max(0, usage - (inactive or 0))
+
+    def _process_tree_rss(self):
+        if not psutil:
+            return 0, 0
+        try:
+            proc = psutil.Process()
+            own = proc.memory_info().rss
+            children = 0
+            for child in proc.children(recursive=True):
+                try:
+                    children += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return own, children
+        except psutil.Error:
+            return 0, 0
+
+    def snapshot(self, fresh=False):
+        """Current usage, cached for SAMPLE_TTL seconds"""
+        now = time.monotonic()
+        if self._sample and not fresh and now - self._sampled_at < SAMPLE_TTL:
+            return self._sample
+        own, children = self._process_tree_rss()
+        working_set = self._working_set()
+        used = max(own + children, working_set or 0)
+        ratio = used / self.limit_bytes if self.limit_bytes else 0.0
+        if ratio >= CRITICAL_RATIO:
+            level = CRITICAL
+        elif ratio >= HIGH_RATIO:
+            level = HIGH
+        elif ratio >= ELEVATED_RATIO:
+            level = ELEVATED
+        else:
+            level = OK
+        self._sample = {
+            "level": level,
+            "used_mb": round(used / MB, 1),
+            "limit_mb": round(self.limit_mb, 1),
+            "headroom_mb": round((self.limit_bytes - used) / MB, 1),
+            "ratio": round(ratio, 3),
+            "bot_rss_mb": round(own / MB, 1),
+            "children_rss_mb": round(children / MB, 1),
+            "cgroup_working_set_mb": round(working_set / MB, 1) if working_set is not None else None,
+            "limit_source": self.limit_source,
+        }
+        self._sampled_at = now
+        return self._sample
+
+    def level(self):
+        return self.snapshot()["level"]
+
+    def headroom_mb(self):
+        return self.snapshot()["headroom_mb"]
+
+    def fragment_cap(self, fragments):
+        """Scale a fragment concurrency down to what the current headroom allows"""
+        level = self.level()
+        if level == ELEVATED:
+            return max(1, fragments // 2)
+        if level in (HIGH, CRITICAL):
+            return 1
+        return fragments
+
+    def relieve(self):
+        """Release what the bot itself can: garbage and stale yt-dlp scratch files"""
+        gc.collect()
+        for temp_dir in {"/tmp", tempfile.gettempdir()}:
+            for path in glob.glob(os.path.join(temp_dir, "yt-dlp*")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    async def _wait_below(self, level, kind):
+        """Hold the caller while pressure is at or above `level`"""
+        blocking = LEVELS[LEVELS.index(level):]
+        if self.level() not in blocking:
+            return 0.0
+        self.stats[f"{kind}_waits"] += 1
+        snapshot = self.snapshot()
+        logger.warning("🧠 Memory %s (%.0f/%.0f MB), holding %s until memory frees up",
+                       snapshot["level"], snapshot["used_mb"], snapshot["limit_mb"], kind)
+        started = time.monotonic()
+        # gc.collect() and the scratch sweep can take a while on a large heap
+        await asyncio.get_running_loop().run_in_executor(None, self.relieve)
+        while self.snapshot(fresh=True)["level"] in blocking:
+            if time.monotonic() - started >= MAX_WAIT_SECONDS:
+                self.stats["forced"] += 1
+                logger.warning("Memory still %s after %ss, running %s anyway", self.level(), MAX_WAIT_SECONDS, kind)
+                break
+            await asyncio.sleep(POLL_SECONDS)
+        waited = time.monotonic() - started
+        self.stats["wait_seconds"] += waited
+        return waited
+
+    async def wait_for_download(self):
+        """New downloads start only below critical pressure"""
+        return await self._wait_below(CRITICAL, "download")
+
+    async def wait_for_encode(self):
+        """Re-encodes (watermarking, transcodes) are deferred at high pressure"""
+        return await self._wait_below(HIGH, "encode")
+
+
+# Global governor instance
+memory_governor = MemoryGovernor()
+
+memory_limit = metrics.registry.register(metrics.Gauge("bot_memory_limit_bytes", "Memory limit the governor works against"))
+memory_pressure = metrics.registry.register(metrics.Gauge("bot_memory_pressure", "Governor pressure level (0 ok .. 3 critical)"))
+
+
+def _collect_memory():
+    snapshot = memory_governor.snapshot()
+    memory_limit.set(memory_governor.limit_bytes)
+    memory_pressure.set(LEVELS.index(snapshot["level"]))
+
+
+metrics.registry.collectors.append(_collect_memory)
@@ -0,0 +1,278 @@
+"""
+Bot Metrics & Liveness
+Minimal Prometheus-compatible registry (text exposition format 0.0.4) plus a
+heartbeat task on the bot's event loop. The web server renders the registry
+at /metrics and uses the heartbeat for /health, so a wedged loop shows up as
+an unhealthy service instead of a static "ok".
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", "5"))
+# /health turns unhealthy once the loop has not beaten for this long
+HEALTH_STALE_SECONDS = float(os.environ.get("HEALTH_STALE_SECONDS", "60"))
+# Grace period before the first heartbeat is expected
+HEALTH_STARTUP_GRACE = float(os.environ.get("HEALTH_STARTUP_GRACE", "180"))
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_lock = threading.Lock()
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = [(k, dict(v, buckets=list(v["buckets"]))) for k, v in self._values.items()]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state["buckets"]):
+                labels = _label_str(self.labelnames + ("le",), key + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _label_str(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            plain = _label_str(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {state['sum']}")
+            lines.append(f"{self.name}_count{plain} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition of every registered metric"""
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.debug("Metrics collector failed: %s", e)
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Work in progress
+active_jobs = registry.register(Gauge("bot_active_jobs", "Downloads/uploads currently running", ["kind"]))
+queue_depth = registry.register(Gauge("bot_queue_depth", "Items waiting in a queue", ["queue"]))
+
+# Throughput
+download_bytes = registry.register(Counter("bot_download_bytes_total", "Bytes downloaded"))
+upload_bytes = registry.register(Counter("bot_upload_bytes_total", "Bytes uploaded to Telegram"))
+download_speed = registry.register(Gauge("bot_download_speed_bytes", "Average speed of the last finished download"))
+upload_speed = registry.register(Gauge("bot_upload_speed_bytes", "Average speed of the last finished upload"))
+items_total = registry.register(Counter("bot_items_total", "Processed items by result", ["result"]))
+
+# Latency per pipeline stage: extract, download, probe, encode, upload
+stage_seconds = registry.register(Histogram("bot_stage_seconds", "Time spent per pipeline stage", ["stage"]))
+
+# Telegram rate limiting
+floodwait_seconds = registry.register(Counter("bot_floodwait_seconds_total", "Seconds spent waiting on FloodWait"))
+
+# Liveness / resources
+loop_lag = registry.register(Gauge("bot_event_loop_lag_seconds", "Latest event loop scheduling lag"))
+loop_lag_hist = registry.register(Histogram("bot_event_loop_lag", "Event loop scheduling lag",
+                                            buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)))
+heartbeat_ts = registry.register(Gauge("bot_heartbeat_timestamp_seconds", "Unix time of the last loop heartbeat"))
+rss_bytes = registry.register(Gauge("process_resident_memory_bytes", "Resident memory of the bot and its children", ["process"]))
+disk_bytes = registry.register(Gauge("bot_disk_bytes", "Disk usage of the working directory volume", ["kind"]))
+ytdlp_pool_jobs = registry.register(Gauge("bot_ytdlp_pool", "yt-dlp worker pool counters", ["stat"]))
+
+_process_started = time.time()
+_last_heartbeat = None
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a pipeline stage: `with stage_timer("probe"): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+@contextmanager
+def track_job(kind):
+    """Count a running job in bot_active_jobs for the duration of the block"""
+    active_jobs.inc(kind=kind)
+    try:
+        yield
+    finally:
+        active_jobs.dec(kind=kind)
+
+
+def record_floodwait(seconds):
+    floodwait_seconds.inc(seconds or 0)
+
+
+def record_download(nbytes, seconds):
+    if nbytes:
+        download_bytes.inc(nbytes)
+        if seconds > 0:
+            download_speed.set(round(nbytes / seconds))
+
+
+def record_upload(nbytes, seconds):
+    if nbytes:
+        upload_bytes.inc(nbytes)
+        if seconds > 0:
+            upload_speed.set(round(nbytes / seconds))
+
+
+def _collect_resources():
+    try:
+        import psutil
+        proc = psutil.Process()
+        rss_bytes.set(proc.memory_info().rss, process="bot")
+        children = 0
+        for child in proc.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.Error:
+                continue
+        rss_bytes.set(children, process="children")
+    except Exception:
+        pass
+    usage = shutil.disk_usage(".")
+    disk_bytes.set(usage.used, kind="used")
+    disk_bytes.set(usage.free, kind="free")
+    try:
+        from .ytdlp_pool import ytdlp_pool
+        for stat, value in ytdlp_pool.stats.items():
+            ytdlp_pool_jobs.set(value, stat=stat)
+    except Exception:
+        pass
+
+
+registry.collectors.append(_collect_resources)
+
+
+def liveness():
+    """
+    Liveness of the bot loop for /health
+
+    Returns:
+        tuple: (healthy bool, details dict)
+    """
+    now = time.time()
+    if _last_heartbeat is None:
+        healthy = now - _process_started < HEALTH_STARTUP_GRACE
+        return healthy, {"status": "starting" if healthy else "no heartbeat", "uptime": round(now - _process_started)}
+    age = now - _last_heartbeat
+    healthy = age < HEALTH_STALE_SECONDS
+    return healthy, {
+        "status": "ok" if healthy else "stale",
+        "heartbeat_age": round(age, 1),
+        "loop_lag": round(loop_lag.get(), 3),
+        "active_jobs": sum(active_jobs._values.values()),
+        "uptime": round(now - _process_started),
+    }
+
+
+async def heartbeat_loop(interval=HEARTBEAT_INTERVAL):
+    """Beat from inside the bot loop and measure how late each wakeup is"""
+    global _last_heartbeat
+    loop = asyncio.get_running_loop()
+    _last_heartbeat = time.time()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        loop_lag.set(round(lag, 4))
+        loop_lag_hist.observe(lag)
+        _last_heartbeat = time.time()
+        heartbeat_ts.set(round(_last_heartbeat, 3))
@@ -0,0 +1,260 @@
+"""
+Playlist Exporter
+Exports YouTube playlists and channels to 'title: url' .txt files for /y2t.
+yt-dlp extraction runs in a worker thread with lazy playlist paging, and
+entries stream to the output file page by page as they arrive, so a channel
+with tens of thousands of videos neither blocks the bot loop nor sits in
+memory. Several links in one request are exported concurrently.
+"""
+
+import os
+import re
+import html
+import time
+import asyncio
+import logging
+import concurrent.futures
+
+from vars import cookies_file_path
+from .lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import("yt_dlp")
+
+EXPORT_CONCURRENCY = int(os.environ.get("Y2T_CONCURRENCY", "3"))
+PAGE_SIZE = int(os.environ.get("Y2T_PAGE_SIZE", "100"))
+# Pages buffered between the extractor thread and the file writer
+QUEUE_PAGES = 8
+
+URL_PATTERN = re.compile(r"https?://\S+")
+# Redirects (url results) followed before giving up on a link
+MAX_URL_HOPS = 5
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def find_links(text):
+    """All http(s) links in a message, in order, without duplicates"""
+    return list(dict.fromkeys(URL_PATTERN.findall(text or "")))
+
+
+def safe_filename(title, default="youtube_playlist"):
+    name = re.sub(r'[\\/:*?"<>|\n\r\t]+', "_", title or "").strip(" ._")
+    return name[:100] or default
+
+
+def entry_line(entry):
+    """'title: url' for a flat playlist entry"""
+    title = (entry.get("title") or "No title").replace("\n", " ").strip()
+    url = entry.get("url") or entry.get("webpage_url") or ""
+    if not url.startswith("http") and entry.get("id"):
+        url = f"https://www.youtube.com/watch?v={entry['id']}"
+    return f"{title}: {url}"
+
+
+def _iter_entries(entries):
+    """Iterate generators, lists and yt-dlp PagedLists page by page"""
+    if hasattr(entries, "getslice"):
+        start = 0
+        while True:
+            page = entries.getslice(start, start + PAGE_SIZE)
+            if not page:
+                return
+            yield from page
+            start += len(page)
+    else:
+        yield from entries or ()
+
+
+def _extract(ydl, url):
+    """
+    Unprocessed extraction of a link, following url results
+
+    With process=False yt-dlp hands back redirects (youtu.be links, handles,
+    watch?v=..&list=..) as url/url_transparent results instead of resolving them.
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    for _ in range(MAX_URL_HOPS):
+        if not info or info.get("_type") not in ("url", "url_transparent"):
+            return info
+        info = ydl.extract_info(info["url"], download=False, process=False)
+    raise ValueError("Too many redirects while resolving this link")
+
+
+def _walk(ydl, info, cancelled, depth=0):
+    """Yield video entries, descending into channel tabs and nested playlists"""
+    if "entries" not in info:
+        yield info
+        return
+    for entry in _iter_entries(info["entries"]):
+        if cancelled():
+            return
+        if not entry:
+            continue
+        if entry.get("_type") == "url" and entry.get("ie_key") == "YoutubeTab" and depth < 2:
+            # A channel's flat entries are its tabs (Videos, Shorts, Live)
+            nested = _extract(ydl, entry["url"])
+            if nested:
+                yield from _walk(ydl, nested, cancelled, depth + 1)
+        elif entry.get("_type") == "playlist":
+            yield from _walk(ydl, entry, cancelled, depth + 1)
+        else:
+            yield entry
+
+
+class PlaylistExport:
+    """One link being exported; progress_text() feeds the ProgressReporter"""
+
+    def __init__(self, url, output_dir="downloads"):
+        self.url = url
+        self.output_dir = output_dir
+        self.title = None
+        self.path = None
+        self.count = 0
+        self.error = None
+        self.done = False
+        self.started = time.time()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def progress_text(self):
+        state = "✅" if self.done and not self.error else "❌" if self.error else "⏳"
+        text = f"{state} {html.escape(self.title or self.url[:60])} • {self.count} videos"
+        if self.error:
+            text += f"\n   {html.escape(self.error[:120])}"
+        return text
+
+    def _ydl_opts(self):
+        opts = {
+            "quiet": True,
+            "no_warnings": True,
+            "skip_download": True,
+            "extract_flat": "in_playlist",
+            "lazy_playlist": True,
+        }
+        if cookies_file_path and os.path.exists(cookies_file_path):
+            opts["cookiefile"] = cookies_file_path
+        return opts
+
+    def _produce(self, put):
+        """Worker thread: extract lazily and hand over pages of lines"""
+        try:
+            with yt_dlp.YoutubeDL(self._ydl_opts()) as ydl:
+                info = _extract(ydl, self.url)
+                if not info:
+                    raise ValueError("Nothing found at this link")
+                put(("title", info.get("title") or info.get("id")))
+                if "entries" not in info:
+                    info = dict(info, url=info.get("webpage_url") or self.url)
+                page = []
+                for entry in _walk(ydl, info, lambda: self._cancelled):
+                    page.append(entry_line(entry))
+                    if len(page) >= PAGE_SIZE:
+                        put(("page", page))
+                        page = []
+                if page:
+                    put(("page", page))
+            put(("end", None))
+        except _Cancelled:
+            return
+        except Exception as e:
+            try:
+                put(("end", str(e)))
+            except _Cancelled:
+                return
+
+    async def run(self):
+        """Export to output_dir/<title>.txt; returns the file path or None on error"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_PAGES)
+
+        def put(item):
+            # Blocks the worker while the writer is behind, bounding memory
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    return future.result(timeout=1)
+                except concurrent.futures.TimeoutError:
+                    if self._cancelled:
+                        future.cancel()
+                        raise _Cancelled()
+
+        worker = loop.run_in_executor(None, self._produce, put)
+        f = None
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "title":
+                    self.title = value or "youtube_playlist"
+                    os.makedirs(self.output_dir, exist_ok=True)
+                    base = os.path.join(self.output_dir, safe_filename(self.title))
+                    self.path, n = f"{base}.txt", 1
+                    while os.path.exists(self.path):
+                        n += 1
+                        self.path = f"{base} ({n}).txt"
+                    f = open(self.path, "w", encoding="utf-8")
+                elif kind == "page":
+                    f.write("\n".join(value) + "\n")
+                    self.count += len(value)
+                else:
+                    self.error = value
+                    break
+        except BaseException:
+            # Cancelled or the file write failed: release the worker blocked in put()
+            self.cancel()
+            raise
+        finally:
+            if f:
+                f.close()
+            self.done = True
+        await worker
+        if self.error or not self.count:
+            self.error = self.error or "No videos found"
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            return None
+        return self.path
+
+
+class ExportBatch:
+    """Aggregate progress of the exports in one /y2t request"""
+
+    def __init__(self, exports):
+        self.exports = exports
+
+    def progress_text(self):
+        total = sum(export.count for export in self.exports)
+        lines = [export.progress_text() for export in self.exports]
+        return "\n".join(lines) + f"\n\n📄 {total} videos exported"
+
+
+async def export_all(exports, on_done, reporter=None, concurrency=EXPORT_CONCURRENCY, tick=2):
+    """
+    Run exports concurrently (bounded), calling `await on_done(export, path)`
+    as each finishes, while the reporter shows live progress.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    batch = ExportBatch(exports)
+
+    async def run_one(export):
+        async with semaphore:
+            path = await export.run()
+        await on_done(export, path)
+
+    async def report():
+        while True:
+            await reporter.update(batch)
+            await asyncio.sleep(tick)
+
+    ticker = asyncio.ensure_future(report()) if reporter else None
+    try:
+        await asyncio.gather(*(run_one(export) for export in exports))
+    finally:
+        if ticker:
+            ticker.cancel()
+    return batch
@@ -1,10 +1,12 @@
 import os
 import tempfile
-import subprocess
 import time
 import asyncio
 from pyrogram import Client
 from pyrogram.types import Message
+from .ytdlp_pool import run_ytdlp
+from .concurrency_controller import concurrency_controller
+from .housekeeping import SCRATCH_PREFIX
 
 async def process_video_railway_fixed(video_url, message):
     """Railway-compatible video processor with proper error handling"""
@@ -15,22 +17,21 @@ async def process_video_railway_fixed(video_url, message):
     )
     
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(prefix=SCRATCH_PREFIX) as temp_dir:
             temp_file = os.path.join(temp_dir, f"video_{int(time.time())}.mp4")
             
             # Railway-optimized download
-            cmd = [
+            cmd = concurrency_controller.apply_to_args([
                 'yt-dlp',
                 '-f', 'best[height<=720]',
                 '-o', temp_file,
-                '--concurrent-fragments', '8',
                 '--fragment-retries', '10',
                 '--retries', '5',
                 '--merge-output-format', 'mp4',
                 video_url
-            ]
+            ], video_url)
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = await asyncio.wait_for(run_ytdlp(cmd), timeout=300)
             
             # CRITICAL: Check if file actually exists before sending
             if os.path.exists(temp_file) and os.path.getsize(temp_file) > 0:
@@ -56,7 +57,7 @@ async def process_video_railway_fixed(video_url, message):
                 
             else:
                 # CRITICAL: Send error as TEXT, not as video
-                error_details = result.stderr if result.stderr else "Unknown download error"
+                error_details = result["error"] or "Unknown download error"
                 await status_msg.edit_text(
                     f"❌ **Download Failed**\n\n"
                     f"**URL**: `{video_url}`\n"
@@ -66,7 +67,7 @@ async def process_video_railway_fixed(video_url, message):
                 )
                 print(f"❌ Download failed: {error_details}")
                 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         await status_msg.edit_text(
             f"❌ **Download Timeout**\n\n"
             f"**URL**: `{video_url}`\n"
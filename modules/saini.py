@@ -15,36 +15,42 @@ try:
 except ImportError:
     AIOFILES_AVAILABLE = False
     aiofiles = None
-import tgcrypto
 import subprocess
 import concurrent.futures
 from math import ceil
 from .utils import progress_bar
+from .ytdlp_pool import run_ytdlp
+from .concurrency_controller import concurrency_controller
+from .memory_governor import memory_governor
+from . import media_splitter
+from . import media_normalizer
+from . import metrics
+from .download_telemetry import DownloadTelemetry, ProgressReporter, watch_download, record_history, STALL_RETRIES
 from pyrogram.client import Client
 from pyrogram import filters
 from pyrogram.types import Message
 from io import BytesIO
 from pathlib import Path  
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from base64 import b64decode
+
+logger = logging.getLogger(__name__)
 
 def duration(filename):
     try:
         # Check if file exists first
         if not os.path.exists(filename):
-            print(f"⚠️ File not found for duration check: {filename}")
+            logger.warning(f"⚠️ File not found for duration check: {filename}")
             return 0.0
             
-        result = subprocess.run(["ffprobe", "-v", "error", "-show_entries",
-                                 "format=duration", "-of",
-                                 "default=noprint_wrappers=1:nokey=1", filename],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,  # Separate stderr from stdout
-            text=True)  # Get string output instead of bytes
+        with metrics.stage_timer("probe"):
+            result = subprocess.run(["ffprobe", "-v", "error", "-show_entries",
+                                     "format=duration", "-of",
+                                     "default=noprint_wrappers=1:nokey=1", filename],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,  # Separate stderr from stdout
+                text=True)  # Get string output instead of bytes
         
         if result.returncode != 0:
-            print(f"⚠️ FFprobe error for {filename}: {result.stderr}")
+            logger.warning(f"⚠️ FFprobe error for {filename}: {result.stderr}")
             return 0.0
             
         # Clean and validate the output
@@ -52,11 +58,11 @@ def duration(filename):
         if duration_str and duration_str.replace('.', '').isdigit():
             return float(duration_str)
         else:
-            print(f"⚠️ Invalid duration output for {filename}: {duration_str}")
+            logger.warning(f"⚠️ Invalid duration output for {filename}: {duration_str}")
             return 0.0
             
     except Exception as e:
-        print(f"⚠️ Duration calculation failed for {filename}: {str(e)}")
+        logger.warning(f"⚠️ Duration calculation failed for {filename}: {str(e)}")
         return 0.0
 
 def get_mps_and_keys(api_url):
@@ -67,21 +73,21 @@ def get_mps_and_keys(api_url):
         response_json = response.json()
         mpd = response_json.get('MPD')
         keys = response_json.get('KEYS')
-        print(f"✅ Successfully extracted MPD and keys from API")
+        logger.info(f"✅ Successfully extracted MPD and keys from API")
         return mpd, keys
     except Exception as e:
-        print(f"❌ Failed to get MPD and keys: {e}")
+        logger.error(f"❌ Failed to get MPD and keys: {e}")
         return None, None
    
 def exec(cmd):
         process = subprocess.run(cmd, stdout=subprocess.PIPE,stderr=subprocess.PIPE)
         output = process.stdout.decode()
-        print(output)
+        logger.info(output)
         return output
         #err = process.stdout.decode()
 def pull_run(work, cmds):
     with concurrent.futures.ThreadPoolExecutor(max_workers=work) as executor:
-        print("Waiting for tasks to complete")
+        logger.info("Waiting for tasks to complete")
         fut = executor.map(exec,cmds)
 async def aio(url,name):
     k = f'{name}.pdf'
@@ -173,7 +179,7 @@ async def run(cmd):
 
     stdout, stderr = await proc.communicate()
 
-    print(f'[{cmd!r} exited with {proc.returncode}]')
+    logger.info(f'[{cmd!r} exited with {proc.returncode}]')
     if proc.returncode == 1:
         return False
     if stdout:
@@ -213,6 +219,21 @@ def time_name():
 # Initialize global counter
 failed_counter = 0
 
+
+async def run_exec(cmd_args):
+    """Run a command without a shell and without blocking the event loop; returns its exit code"""
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd_args)
+    except OSError as e:
+        logger.error(f"❌ Could not run {cmd_args[0]}: {e}")
+        return 127
+    try:
+        return await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+
+
 async def decrypt_and_merge_video(mpd_url, keys_string, output_path, output_name, quality="720"):
     """Complete DRM decryption pipeline (like original repository)"""
     try:
@@ -220,60 +241,57 @@ async def decrypt_and_merge_video(mpd_url, keys_string, output_path, output_name
         output_path.mkdir(parents=True, exist_ok=True)
 
         # SECURITY FIX: Use secure command list instead of shell=True
-        cmd_args = [
+        cmd_args = concurrency_controller.apply_to_args([
             'yt-dlp', '-f', f'bv[height<={quality}]+ba/b', 
             '-o', f'{output_path}/file.%(ext)s',
-            '--concurrent-fragments', '16',
             '--fragment-retries', '10', 
             '--http-chunk-size', '10M',
             '--buffer-size', '16K',
             '--allow-unplayable-format',
             '--no-check-certificate',
-            '--concurrent-fragments', '8',
-            '--fragment-retries', '10',
             str(mpd_url)  # Safely convert to string
-        ]
-        print(f"🔄 Running secure DRM download")
-        result = subprocess.run(cmd_args, shell=False, capture_output=True, text=True)
+        ], str(mpd_url))
+        logger.info(f"🔄 Running secure DRM download")
+        result = await run_ytdlp(cmd_args)
         
-        if result.returncode != 0:
-            print(f"❌ DRM download failed: {result.stderr}")
+        if result["returncode"] != 0:
+            logger.error(f"❌ DRM download failed: {result['error']}")
             return None
         
         avDir = list(output_path.iterdir())
-        print(f"📁 Downloaded encrypted files: {avDir}")
-        print("🔓 Starting decryption process...")
+        logger.info(f"📁 Downloaded encrypted files: {avDir}")
+        logger.info("🔓 Starting decryption process...")
 
         video_decrypted = False
         audio_decrypted = False
 
         for data in avDir:
             if data.suffix == ".mp4" and not video_decrypted:
-                # SECURITY FIX: Use subprocess.run with shell=False to prevent command injection
+                # SECURITY FIX: Argument list, no shell, to prevent command injection
                 cmd_args = ['./mp4decrypt'] + keys_string.split() + ['--show-progress', str(data), str(output_path / "video.mp4")]
-                print(f"🔓 Decrypting video with secure command")
-                result = subprocess.run(cmd_args, shell=False)
-                if result.returncode == 0 and (output_path / "video.mp4").exists():
+                logger.info(f"🔓 Decrypting video with secure command")
+                returncode = await run_exec(cmd_args)
+                if returncode == 0 and (output_path / "video.mp4").exists():
                     video_decrypted = True
                     data.unlink()
             elif data.suffix == ".m4a" and not audio_decrypted:
-                # SECURITY FIX: Use subprocess.run with shell=False to prevent command injection
+                # SECURITY FIX: Argument list, no shell, to prevent command injection
                 cmd_args = ['./mp4decrypt'] + keys_string.split() + ['--show-progress', str(data), str(output_path / "audio.m4a")]
-                print(f"🔓 Decrypting audio with secure command")
-                result = subprocess.run(cmd_args, shell=False)
-                if result.returncode == 0 and (output_path / "audio.m4a").exists():
+                logger.info(f"🔓 Decrypting audio with secure command")
+                returncode = await run_exec(cmd_args)
+                if returncode == 0 and (output_path / "audio.m4a").exists():
                     audio_decrypted = True
                     data.unlink()
 
         if not video_decrypted or not audio_decrypted:
-            print("❌ Decryption failed: missing video or audio")
+            logger.error("❌ Decryption failed: missing video or audio")
             return None
 
         # Merge decrypted streams with secure command
         final_output = output_path / f"{output_name}.mp4"
         cmd_args = ['ffmpeg', '-i', str(output_path / "video.mp4"), '-i', str(output_path / "audio.m4a"), '-c', 'copy', str(final_output)]
-        print(f"🔗 Merging streams securely")
-        result = subprocess.run(cmd_args, shell=False)
+        logger.info(f"🔗 Merging streams securely")
+        returncode = await run_exec(cmd_args)
         
         # Cleanup temporary files
         if (output_path / "video.mp4").exists():
@@ -281,26 +299,59 @@ async def decrypt_and_merge_video(mpd_url, keys_string, output_path, output_name
         if (output_path / "audio.m4a").exists():
             (output_path / "audio.m4a").unlink()
             
-        if result.returncode == 0 and final_output.exists():
-            print(f"✅ DRM decryption successful: {final_output}")
+        if returncode == 0 and final_output.exists():
+            logger.info(f"✅ DRM decryption successful: {final_output}")
             return str(final_output)
         else:
-            print("❌ Failed to merge streams")
+            logger.error("❌ Failed to merge streams")
             return None
 
     except Exception as e:
-        print(f"❌ DRM decryption error: {str(e)}")
+        logger.error(f"❌ DRM decryption error: {str(e)}")
         return None
 
-async def download_video(url,cmd, name):
+def _stall_fallback_args(cmd_args):
+    """Swap the requested format for a plain best-available one after a stall"""
+    args = list(cmd_args)
+    for i, arg in enumerate(args[:-1]):
+        if arg in ('-f', '--format'):
+            args[i + 1] = 'b/bv*+ba'
+            break
+    return args
+
+
+async def _run_download_watched(cmd_args, name, url, prog=None):
+    """Run a yt-dlp job with telemetry, live progress and stall restarts"""
+    telemetry = DownloadTelemetry(name, url)
+    reporter = ProgressReporter(prog, prog.text.html if prog and prog.text else f"<b>{name}</b>") if prog else None
+    result = {"returncode": 1, "error": None}
+    cmd_args = concurrency_controller.apply_to_args(cmd_args, url)
+    args = cmd_args
+    for attempt in range(STALL_RETRIES + 1):
+        with metrics.track_job("download"), metrics.stage_timer("download"):
+            result, stalled = await watch_download(
+                run_ytdlp(args, on_event=telemetry.feed), telemetry, reporter)
+        if not stalled:
+            break
+        if attempt == STALL_RETRIES:
+            result = {"returncode": 1, "error": "download stalled"}
+            break
+        telemetry.restart()
+        # First restart resumes the same format, later ones fall back
+        if attempt >= 1:
+            args = _stall_fallback_args(cmd_args)
+        logger.info(f"🔁 Restarting stalled download ({attempt + 1}/{STALL_RETRIES}): {name}")
+        if reporter:
+            await reporter.update(telemetry, note=f"🔁 Stalled, restarting ({attempt + 1}/{STALL_RETRIES})")
+    telemetry.status = "ok" if result["returncode"] == 0 else ("stalled" if result.get("error") == "download stalled" else "failed")
+    record_history(telemetry)
+    metrics.record_download(telemetry.downloaded_bytes, time.time() - telemetry.started)
+    concurrency_controller.record_telemetry(telemetry, ok=result["returncode"] == 0)
+    return result
+
+
+async def download_video(url,cmd, name, prog=None):
     """Enhanced download with sophisticated DRM bypass and speed optimization"""
-    # Import speed optimizer to prevent degradation
-    try:
-        from .speed_optimizer import optimize_download_speed, get_optimized_command
-        optimize_download_speed()  # Run optimization before each download
-    except ImportError:
-        print("⚠️ Speed optimizer not available, using basic optimization")
-    
     # Add modern DRM bypass techniques (like original repository but updated for 2025)
     if 'yt-dlp' in cmd:
         # Add 2025 YouTube DRM bypass (removed chrome cookies for cloud deployment)
@@ -314,31 +365,36 @@ async def download_video(url,cmd, name):
         except ImportError:
             # Fallback optimization
             # Use built-in downloader optimizations instead
-            builtin_args = ' --concurrent-fragments 8 --fragment-retries 10 --retries 5 --socket-timeout 15 --http-chunk-size 4M'
+            builtin_args = ' --fragment-retries 10 --retries 5 --socket-timeout 15 --http-chunk-size 4M'
             cmd = f'{cmd}{builtin_args}'
             
         # Add DRM bypass flags
         if '--allow-unplayable-format' not in cmd:
             cmd = f'{cmd} --allow-unplayable-format'
             
-        print(f"✅ Enhanced command with DRM bypass and speed optimization")
+        logger.info(f"✅ Enhanced command with DRM bypass and speed optimization")
     
     download_cmd = f'{cmd} -R 25 --fragment-retries 25'
     global failed_counter
-    print(f"🔄 Running secure download command")
-    logging.info("Running secure download command")
+    logger.info(f"🔄 Running secure download command")
     # SECURITY FIX: Parse command safely and use shell=False
     try:
         import shlex
         cmd_args = shlex.split(download_cmd)
-        k = subprocess.run(cmd_args, shell=False)
-    except Exception as e:
-        print(f"⚠️ Fallback to shell mode due to parsing error: {e}")
-        k = subprocess.run(download_cmd, shell=True)
-    if "visionias" in cmd and k.returncode != 0 and failed_counter <= 10:
+        if cmd_args and cmd_args[0] == 'yt-dlp':
+            # Run in a warm worker instead of paying CLI startup per item
+            returncode = (await _run_download_watched(cmd_args, name, url, prog))["returncode"]
+        else:
+            proc = await asyncio.create_subprocess_exec(*cmd_args)
+            returncode = await proc.wait()
+    except ValueError as e:
+        logger.warning(f"⚠️ Fallback to shell mode due to parsing error: {e}")
+        proc = await asyncio.create_subprocess_shell(download_cmd)
+        returncode = await proc.wait()
+    if "visionias" in cmd and returncode != 0 and failed_counter <= 10:
         failed_counter += 1
         await asyncio.sleep(5)
-        await download_video(url, cmd, name)
+        await download_video(url, cmd, name, prog)
     failed_counter = 0
     
     # CRITICAL FIX: Only return file path if file actually exists
@@ -362,20 +418,16 @@ async def download_video(url,cmd, name):
             if os.path.exists(temp_file):
                 try:
                     os.remove(temp_file)
-                    print(f"🧹 Cleaned up temp file: {temp_file}")
+                    logger.info(f"🧹 Cleaned up temp file: {temp_file}")
                 except:
                     pass
 
-        print(f"❌ Download failed: No valid file found for {name}")
+        logger.error(f"❌ Download failed: No valid file found for {name}")
         return None
         
     except Exception as exc:
-        print(f"❌ Download error: {exc}")
+        logger.error(f"❌ Download error: {exc}")
         return None
-    finally:
-        # Memory cleanup to prevent speed degradation in Render
-        import gc
-        gc.collect()
 
 
 async def send_doc(bot: Client, m: Message, cc, ka, cc1, prog, count, name, channel_id):
@@ -407,13 +459,18 @@ async def download_and_decrypt_video(url, cmd, name, key):
     if video_path:  
         decrypted = decrypt_file(video_path, key)  
         if decrypted:  
-            print(f"File {video_path} decrypted successfully.")  
+            logger.info(f"File {video_path} decrypted successfully.")
             return video_path  
         else:  
-            print(f"Failed to decrypt {video_path}.")  
+            logger.warning(f"Failed to decrypt {video_path}.")
             return None  
 
 async def send_vid(bot: Client, m: Message, cc, filename, vidwatermark, thumb, name, prog, channel_id):
+    """
+    Upload a finished video; returns the sent message (a list for split parts) or None
+
+    m may be None (queue workers); status messages then go to channel_id
+    """
     # CRITICAL FIX: Validate file before processing
     if not filename or not os.path.exists(filename) or os.path.getsize(filename) == 0:
         await bot.send_message(channel_id, 
@@ -422,11 +479,14 @@ async def send_vid(bot: Client, m: Message, cc, filename, vidwatermark, thumb, n
             f'**Reason** =>> Invalid or empty video file\n'
             f'<blockquote><i><b>The downloaded file is corrupted or doesn\'t exist</b></i></blockquote>', 
             disable_web_page_preview=True)
-        return
-    subprocess.run(f'ffmpeg -i "{filename}" -ss 00:00:10 -vframes 1 "{filename}.jpg"', shell=True)
+        return None
+    with metrics.stage_timer("encode"):
+        await run_exec(['ffmpeg', '-i', str(filename), '-ss', '00:00:10', '-vframes', '1', f'{filename}.jpg'])
     await prog.delete (True)
     reply1 = await bot.send_message(channel_id, f"**📩 Uploading Video 📩:-**\n<blockquote>**{name}**</blockquote>")
-    reply = await m.reply_text(f"**Generate Thumbnail:**\n<blockquote>**{name}**</blockquote>")
+    # Workers (coordinator mode) have no user message to reply to
+    status_text = f"**Generate Thumbnail:**\n<blockquote>**{name}**</blockquote>"
+    reply = await (m.reply_text(status_text) if m else bot.send_message(channel_id, status_text))
     # Initialize variables with defaults
     thumbnail = f"{filename}.jpg"
     w_filename = filename
@@ -442,25 +502,71 @@ async def send_vid(bot: Client, m: Message, cc, filename, vidwatermark, thumb, n
         else:
             w_filename = f"w_{filename}"
             font_path = "vidwater.ttf"
+            # A full re-encode is the most memory-hungry step; defer it under pressure
+            await memory_governor.wait_for_encode()
             # SECURITY FIX: Use secure command args instead of shell=True
             cmd_args = [
                 'ffmpeg', '-i', str(filename),
                 '-vf', f'drawtext=fontfile={font_path}:text=\'{vidwatermark}\':fontcolor=white@0.3:fontsize=h/6:x=(w-text_w)/2:y=(h-text_h)/2',
                 '-codec:a', 'copy', str(w_filename)
             ]
-            subprocess.run(cmd_args, shell=False)
+            with metrics.stage_timer("encode"):
+                await run_exec(cmd_args)
             
     except Exception as e:
-        await m.reply_text(str(e))
+        if m:
+            await m.reply_text(str(e))
+        else:
+            logger.warning("Watermark failed for %s: %s", name, e)
+
+    # Validate and, if needed, remux before any bytes are sent; the plan fixes
+    # the upload method so a rejected send_video is never re-sent as a document
+    plan = await media_normalizer.prepare(w_filename)
+    if plan.method is None:
+        await bot.send_message(channel_id, f'⚠️**Upload Skipped**⚠️\n**Name** =>> `{name}`\n<blockquote><i><b>{plan.reason}</b></i></blockquote>', disable_web_page_preview=True)
+        os.remove(w_filename)
+        await reply.delete(True)
+        await reply1.delete(True)
+        if os.path.exists(f"{filename}.jpg"):
+            os.remove(f"{filename}.jpg")
+        return None
+    w_filename = plan.path
+    as_document = plan.method == media_normalizer.DOCUMENT
+
+    upload_size = os.path.getsize(w_filename) if os.path.exists(w_filename) else 0
+    if media_splitter.needs_split(upload_size):
+        # Over the bot upload limit: send_video and send_document would both fail
+        info = await media_splitter.probe(w_filename)
+        await reply.edit_text(f"**✂️ Splitting {upload_size / (1024 * 1024):.0f} MB file:**\n<blockquote>**{name}**</blockquote>")
+        parts = await media_splitter.split_media(w_filename, info)
+        if parts:
+            os.remove(w_filename)
+            await reply.edit_text(f"**📤 Uploading {len(parts)} parts:**\n<blockquote>**{name}**</blockquote>")
+            sent = await media_splitter.upload_parts(bot, channel_id, parts, cc, thumb=thumbnail, as_document=as_document,
+                                                     height=plan.height or 720, width=plan.width or 1280)
+            failed = sum(1 for message in sent if message is None)
+            if failed:
+                await bot.send_message(channel_id, f'⚠️**{failed}/{len(parts)} parts failed to upload**\n**Name** =>> `{name}`', disable_web_page_preview=True)
+        else:
+            sent = None
+            await bot.send_message(channel_id, f'⚠️**Upload Failed**⚠️\n**Name** =>> `{name}`\n<blockquote><i><b>File is {upload_size / (1024 * 1024):.0f} MB, over the upload limit, and could not be split</b></i></blockquote>', disable_web_page_preview=True)
+            os.remove(w_filename)
+        await reply.delete(True)
+        await reply1.delete(True)
+        if os.path.exists(f"{filename}.jpg"):
+            os.remove(f"{filename}.jpg")
+        return sent
 
-    dur = int(duration(w_filename))
     start_time = time.time()
 
-    try:
-        await bot.send_video(channel_id, w_filename, caption=cc, supports_streaming=True, height=720, width=1280, thumb=thumbnail, duration=dur, progress=progress_bar, progress_args=(reply, start_time))
-    except Exception:
-        await bot.send_document(channel_id, w_filename, caption=cc, progress=progress_bar, progress_args=(reply, start_time))
+    with metrics.track_job("upload"), metrics.stage_timer("upload"):
+        if as_document:
+            sent = await bot.send_document(channel_id, w_filename, caption=cc, thumb=thumbnail, progress=progress_bar, progress_args=(reply, start_time))
+        else:
+            sent = await bot.send_video(channel_id, w_filename, caption=cc, supports_streaming=True, height=plan.height or 720, width=plan.width or 1280, thumb=thumbnail, duration=int(plan.duration), progress=progress_bar, progress_args=(reply, start_time))
+    metrics.record_upload(upload_size, time.time() - start_time)
     os.remove(w_filename)
     await reply.delete(True)
     await reply1.delete(True)
     os.remove(f"{filename}.jpg")
+    return sent
@@ -11,60 +11,62 @@ import time
 import gc
 import subprocess
 import re
-import yt_dlp
 import shutil
+import logging
 from asyncio import Semaphore
 from pathlib import Path
 from pyrogram.client import Client
 from pyrogram.types import Message
 from typing import Dict, Any, Optional, List
+from .lazy_imports import lazy_import
+from .memory_governor import memory_governor
+from .housekeeping import SCRATCH_PREFIX
 
-# Activate uvloop for performance if available
-try:
-    import uvloop
-    uvloop.install()
-    print("✅ uvloop activated for enhanced performance")
-except ImportError:
-    print("⚠️ uvloop not available, using default event loop")
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import("yt_dlp")
 
 # Check for aiofiles availability
 try:
     import aiofiles
     AIOFILES_AVAILABLE = True
-    print("✅ aiofiles available for streaming downloads")
 except ImportError:
     AIOFILES_AVAILABLE = False
-    print("⚠️ aiofiles not available, using fallback methods")
+
+
+def activate_uvloop():
+    """
+    Switch asyncio to uvloop if it is installed. Importing this module has no
+    side effects; entrypoints opt in by calling this before the loop exists.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("⚠️ uvloop not available, using default event loop")
+        return False
+    uvloop.install()
+    logger.info("✅ uvloop activated for enhanced performance")
+    return True
 
 
 class UltraFastDownloader:
     """Ultra-fast download manager with advanced optimization techniques"""
     
     def __init__(self):
-        # Platform detection for Render optimization
-        is_render = (
-            os.getenv('RENDER') is not None or 
-            'onrender.com' in os.getenv('RENDER_EXTERNAL_URL', '') or
-            os.getenv('RENDER_SERVICE_ID') is not None
-        )
-        
-        # Adjust concurrency based on platform
-        if is_render:
-            # Render: Limited resources (512MB RAM), reduce concurrency
-            self.download_semaphore = Semaphore(4)  # Max 4 concurrent downloads for Render
-            self.chunk_size = 4096  # Smaller chunks for Render (4KB)
-            self.max_concurrent_fragments = 4  # Fewer fragments
-            self.memory_threshold = 400  # MB - Render memory limit safety
-            print("🔧 Optimized for Render platform: Limited concurrency (4 max, 4KB chunks)")
+        # Size concurrency from the real memory limit (cgroup), not the platform name
+        constrained = memory_governor.constrained
+        if constrained:
+            # Small instances (512MB-1GB): reduce concurrency
+            self.download_semaphore = Semaphore(4)
+            self.chunk_size = 4096
+            logger.info(f"🔧 Memory-constrained instance ({memory_governor.limit_mb:.0f}MB, {memory_governor.limit_source}): 4 concurrent downloads, 4KB chunks")
         else:
-            # Other platforms: Higher performance settings
-            self.download_semaphore = Semaphore(12)  # Max 12 concurrent downloads
-            self.chunk_size = 16384  # Larger chunks (16KB)
-            self.max_concurrent_fragments = 8  # More fragments
-            self.memory_threshold = 1024  # MB - Higher memory usage allowed
-            print("🚀 Optimized for high-performance platform: Full concurrency (12 max, 16KB chunks)")
+            self.download_semaphore = Semaphore(12)
+            self.chunk_size = 16384
+            logger.info(f"🚀 {memory_governor.limit_mb:.0f}MB available ({memory_governor.limit_source}): 12 concurrent downloads, 16KB chunks")
             
-        self.is_render = is_render
+        self.constrained = constrained
+        self.memory_threshold = memory_governor.limit_mb * 0.8
         self.session = None
         
     async def initialize_session(self):
@@ -74,10 +76,10 @@ class UltraFastDownloader:
             try:
                 import aiodns
                 resolver = aiohttp.AsyncResolver()
-                print("✅ aiodns activated for faster DNS resolution")
+                logger.info("✅ aiodns activated for faster DNS resolution")
             except ImportError:
                 resolver = None
-                print("⚠️ aiodns not available, using default resolver")
+                logger.warning("⚠️ aiodns not available, using default resolver")
                 
             self.session = aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=900),  # 15 minute timeout
@@ -108,18 +110,16 @@ class UltraFastDownloader:
             ydl_opts = build_ydl_opts(url, str(temp_file), user_id=user_id)
             
             # Apply platform-specific optimizations
-            if self.is_render:
+            if self.constrained:
                 ydl_opts.update({
-                    'http_chunk_size': self.chunk_size,  # 4KB chunks for Render
-                    'concurrent_fragments': self.max_concurrent_fragments,  # Limit fragments
-                    'socket_timeout': 20,  # Shorter timeout for Render
+                    'http_chunk_size': self.chunk_size,  # 4KB chunks on small instances
+                    'socket_timeout': 20,  # Shorter timeout on small instances
                     'retries': 3,  # Fewer retries to save resources
                     'buffersize': 8192,  # Smaller buffer
                 })
             else:
                 ydl_opts.update({
                     'http_chunk_size': self.chunk_size,  # 16KB chunks for high-performance
-                    'concurrent_fragments': self.max_concurrent_fragments,  # More fragments
                     'socket_timeout': 60,  # Longer timeout
                     'retries': 8,  # More retries
                     'buffersize': 32768,  # Larger buffer
@@ -138,7 +138,7 @@ class UltraFastDownloader:
                         'tool_used': downloader_used
                     }
         except Exception as e:
-            print(f"Optimized download failed: {e}")
+            logger.warning(f"Optimized download failed: {e}")
         
         return {'success': False, 'error': 'optimized download failed'}
 
@@ -174,12 +174,12 @@ class UltraFastDownloader:
                     }
                     
             except ImportError:
-                print("pytubefix not available, skipping...")
+                logger.info("pytubefix not available, skipping...")
             except Exception as e:
-                print(f"pytubefix download failed: {e}")
+                logger.warning(f"pytubefix download failed: {e}")
         
         except Exception as e:
-            print(f"Stream download failed: {e}")
+            logger.warning(f"Stream download failed: {e}")
         
         return {'success': False, 'error': 'pytubefix download failed'}
 
@@ -194,10 +194,9 @@ class UltraFastDownloader:
             ydl_opts = build_ydl_opts(url, str(temp_file), user_id=user_id)
             
             # Apply platform-specific optimizations
-            if hasattr(self, 'is_render') and self.is_render:
+            if self.constrained:
                 ydl_opts.update({
                     'http_chunk_size': getattr(self, 'chunk_size', 4096),
-                    'concurrent_fragments': getattr(self, 'max_concurrent_fragments', 4),
                     'socket_timeout': 20,
                     'retries': 3,
                 })
@@ -215,7 +214,7 @@ class UltraFastDownloader:
                         'tool_used': downloader_used
                     }
         except Exception as e:
-            print(f"Basic download failed: {e}")
+            logger.warning(f"Basic download failed: {e}")
         
         return {'success': False, 'error': 'basic download failed'}
 
@@ -241,11 +240,12 @@ class UltraFastDownloader:
     async def download_with_semaphore(self, url: str, progress_callback=None, user_id: int = None):
         """Download with semaphore control"""
         async with self.download_semaphore:
+            await memory_governor.wait_for_download()
             return await self.enhanced_download(url, progress_callback, user_id=user_id)
 
     async def enhanced_download(self, url: str, progress_callback=None, user_id: int = None) -> Dict[str, Any]:
         """Enhanced download with temporary directory management"""
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(prefix=SCRATCH_PREFIX) as temp_dir:
             temp_path = Path(temp_dir)
             return await self.ultra_download(url, temp_path, progress_callback, user_id=user_id)
 
@@ -263,10 +263,10 @@ class UltraFastDownloader:
                     return True
             else:
                 # Fallback to synchronous download if aiofiles not available
-                print("⚠️ Using fallback download method (aiofiles unavailable)")
+                logger.warning("⚠️ Using fallback download method (aiofiles unavailable)")
                 return False
         except Exception as e:
-            print(f"Stream download error: {e}")
+            logger.warning(f"Stream download error: {e}")
         
         return False
 
@@ -282,7 +282,7 @@ class UltraFastDownloader:
 
 
 class MemoryOptimizedYouTubeHandler:
-    """Memory-optimized YouTube handler for Render's 512MB RAM limit"""
+    """Memory-optimized YouTube handler for 512MB instances"""
     
     def __init__(self):
         self.downloader = UltraFastDownloader()
@@ -306,7 +306,7 @@ class MemoryOptimizedYouTubeHandler:
         """Ultra-fast, memory-efficient YouTube downloader with true parallel processing"""
         
         # Use temporary files that auto-cleanup
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(prefix=SCRATCH_PREFIX) as temp_dir:
             temp_path = Path(temp_dir)
             
             # Process downloads with TRUE PARALLEL processing when multiple URLs
@@ -351,6 +351,7 @@ class MemoryOptimizedYouTubeHandler:
         
         # Use semaphore-controlled download with user authentication
         async with self.downloader.download_semaphore:
+            await memory_governor.wait_for_download()
             result = await self.downloader.ultra_download(url, temp_path, progress_update, user_id=user_id)
         
         if result['success']:
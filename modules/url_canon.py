@@ -0,0 +1,140 @@
+"""
+URL Canonicalization
+Maps the many spellings of a link to one canonical URL and a stable dedupe
+key. Every YouTube form (watch, youtu.be, embed, nocookie embed, shorts,
+live, /v/, mobile and music hosts) becomes https://www.youtube.com/watch?v=ID.
+Other links are downloaded exactly as given (signed CDN URLs break if their
+query is touched); only their dedupe key ignores tracking parameters, so a
+batch can discard repeated links before anything is downloaded or uploaded.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+YOUTUBE_HOSTS = {
+    "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+    "youtube-nocookie.com", "www.youtube-nocookie.com",
+}
+SHORT_HOSTS = {"youtu.be", "www.youtu.be"}
+# First path segment followed by the video id
+ID_PATHS = {"embed", "shorts", "live", "v", "e"}
+
+# Query parameters ignored when comparing non-YouTube links
+TRACKING_PARAMS = {
+    "modestbranding", "usp", "feature", "si", "fbclid", "gclid", "igshid",
+    "ref_src", "pp", "rel", "autoplay", "enablejsapi", "origin", "ab_channel",
+}
+
+# Any YouTube video link in free text, with or without a scheme
+YOUTUBE_LINK = re.compile(
+    r"(?:https?://)?(?:(?:www|m|music)\.)?"
+    r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:[^\s\"'<>#]*?&)?v=|embed/|shorts/|live/|v/)|youtu\.be/)"
+    r"[A-Za-z0-9_-]{11}",
+    re.IGNORECASE,
+)
+
+
+def _split(url):
+    url = (url or "").strip()
+    if "://" not in url:
+        url = "https://" + url
+    return urlsplit(url)
+
+
+def youtube_id(url):
+    """The 11-character video id of any YouTube video link, else None"""
+    try:
+        # JSON-escaped slashes show up in embeds scraped from page scripts
+        parts = _split(unquote(url or "").replace("\\/", "/"))
+    except ValueError:
+        return None
+    host = (parts.hostname or "").lower()
+    segments = [s for s in parts.path.split("/") if s]
+    if host in SHORT_HOSTS:
+        candidate = segments[0] if segments else ""
+    elif host in YOUTUBE_HOSTS:
+        if segments[:1] == ["watch"]:
+            candidate = dict(parse_qsl(parts.query)).get("v", "")
+        elif len(segments) >= 2 and segments[0] in ID_PATHS:
+            candidate = segments[1]
+        else:
+            return None
+    else:
+        return None
+    return candidate if YOUTUBE_ID.match(candidate) else None
+
+
+def canonical_url(url):
+    """
+    Canonical form of a link for downloading
+
+    YouTube videos become watch URLs; any other link is returned as given
+    (surrounding whitespace aside), query byte for byte, since signed URLs
+    stop working once their parameters are reordered or re-encoded.
+    """
+    video_id = youtube_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return (url or "").strip()
+
+
+def _comparable_url(url):
+    """
+    A non-YouTube link without tracking parameters, for comparison only
+
+    Google Drive '/view?usp=sharing' links lose the viewer suffix; scheme
+    and host are lowercased.
+    """
+    try:
+        parts = _split(url)
+    except ValueError:
+        return (url or "").strip()
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(k, v) for k, v in query if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")]
+    path = parts.path
+    host = parts.netloc.lower()
+    if host == "drive.google.com" and path.endswith("/view") and len(kept) < len(query):
+        path = path[:-len("/view")]
+    new_query = urlencode(kept, doseq=True) if len(kept) < len(query) else parts.query
+    return urlunsplit((parts.scheme.lower(), host, path, new_query, parts.fragment))
+
+
+def canonical_key(url):
+    """Stable identity for dedupe: 'yt:<id>' for YouTube videos, else the URL minus tracking parameters"""
+    video_id = youtube_id(url)
+    if video_id:
+        return f"yt:{video_id}"
+    comparable = _comparable_url(url)
+    return comparable[:-1] if comparable.endswith("/") else comparable
+
+
+def find_youtube_urls(text):
+    """Canonical YouTube video URLs in text, first-seen order, without duplicates"""
+    urls = {}
+    for match in YOUTUBE_LINK.finditer(text or ""):
+        video_id = youtube_id(match.group(0))
+        if video_id and video_id not in urls:
+            urls[video_id] = f"https://www.youtube.com/watch?v={video_id}"
+    return list(urls.values())
+
+
+def dedupe_links(links):
+    """
+    Drop repeated (title, url) pairs by canonical key, keeping the first
+
+    Returns:
+        tuple: (unique_links, duplicates) where duplicates maps the position of
+        every dropped pair in `links` to the position of its kept twin in
+        unique_links
+    """
+    unique, seen, duplicates = [], {}, {}
+    for index, (title, url) in enumerate(links):
+        key = canonical_key(url)
+        if key in seen:
+            duplicates[index] = seen[key]
+        else:
+            seen[key] = len(unique)
+            unique.append((title, url))
+    return unique, duplicates
@@ -1,55 +1,20 @@
 import random
 import time
+import asyncio
 import math
 import os
 import glob
 import shutil
-import gc
-import psutil
+import logging
 from vars import CREDIT
+from .concurrency_controller import concurrency_controller
+from . import metrics
 from pyrogram.errors import FloodWait
 from datetime import datetime, timedelta
 
-# Render Free Tier Memory Management
-class RenderMemoryManager:
-    def __init__(self, max_memory_mb=400):  # 400MB limit for safety (Render has 512MB)
-        self.max_memory_mb = max_memory_mb
-        
-    def get_memory_usage(self):
-        """Get current memory usage in MB"""
-        try:
-            process = psutil.Process()
-            return process.memory_info().rss / (1024 * 1024)
-        except:
-            return 0
-    
-    def is_memory_safe(self):
-        """Check if memory usage is safe for aggressive downloads"""
-        current_memory = self.get_memory_usage()
-        return current_memory < self.max_memory_mb
-    
-    def force_cleanup(self):
-        """Aggressive memory cleanup for Render"""
-        try:
-            gc.collect()
-            # Clear temp files
-            import tempfile
-            temp_dirs = ["/tmp", tempfile.gettempdir()]
-            for temp_dir in temp_dirs:
-                if os.path.exists(temp_dir):
-                    for f in glob.glob(os.path.join(temp_dir, "yt-dlp*")):
-                        try:
-                            os.remove(f)
-                        except:
-                            pass
-            print(f"🧹 Memory cleanup: {self.get_memory_usage():.1f}MB")
-        except Exception as e:
-            print(f"⚠️ Cleanup error: {e}")
+logger = logging.getLogger(__name__)
 
-# Global memory manager
-render_memory = RenderMemoryManager()
-
-def get_render_aggressive_ydl_opts(output_path: str):
+def get_render_aggressive_ydl_opts(output_path: str, url: str = None):
     """Get aggressive yt-dlp options optimized for Render free tier"""
     
     # Base aggressive settings
@@ -65,7 +30,7 @@ def get_render_aggressive_ydl_opts(output_path: str):
         'http_chunk_size': 16777216,  # 16MB chunks for much faster downloads (doubled)
         'fragment_retries': 25,       # More retries for reliability
         'retries': 15,
-        'concurrent_fragments': 20,   # Increased concurrent fragments for faster speed
+        'concurrent_fragments': concurrency_controller.fragments_for(url),  # Adaptive per host
         # Memory optimization
         'buffersize': 65536,         # 64KB buffer
         'socket_timeout': 20,
@@ -77,7 +42,7 @@ def get_render_aggressive_ydl_opts(output_path: str):
     }
     
     # Use built-in downloader for reliability
-    print("🚀 Using optimized built-in downloader for stability")
+    logger.info("🚀 Using optimized built-in downloader for stability")
         
     return base_opts
 
@@ -159,7 +124,7 @@ def build_ydl_opts(url: str, output_path: str, is_live: bool = None, user_id: in
     
     if is_live:
         # HLS/Live stream configuration - DEFAULT: ffmpeg with hls-use-mpegts
-        print("🔴 Detected HLS/Live stream - Using ffmpeg downloader with MPEG-TS (DEFAULT)")
+        logger.info("🔴 Detected HLS/Live stream - Using ffmpeg downloader with MPEG-TS (DEFAULT)")
         base_opts.update({
             'format': 'best[height<=720]/best[height<=480]/best',
             # FORCE ffmpeg downloader for HLS streams (as requested)
@@ -170,20 +135,21 @@ def build_ydl_opts(url: str, output_path: str, is_live: bool = None, user_id: in
             'hls_prefer_native': False,     # Don't use native HLS downloader
             'hls_use_mpegts': True,         # Use MPEG-TS segments for live streams
             'prefer_ffmpeg': True,          # Prefer ffmpeg over native downloaders
-            'concurrent_fragments': 2,      # Further reduced to prevent disk quota issues
             'http_chunk_size': 2097152,     # 2MB chunks for live streams
             'buffersize': 32768,            # 32KB buffer for live
         })
     else:
         # Regular download configuration - DEFAULT: built-in downloader
-        print("📥 Regular download - Using built-in downloader (DEFAULT)")
+        logger.info("📥 Regular download - Using built-in downloader (DEFAULT)")
         base_opts.update({
             'format': 'best[height<=720][filesize<50M]/best[height<=480]/best',
-            'concurrent_fragments': 2,      # Further reduced to prevent disk quota issues
             'http_chunk_size': 4194304,     # 4MB chunks
             'buffersize': 32768,            # 32KB buffer
         })
     
+    # Fragment concurrency is tuned per host by the concurrency controller
+    concurrency_controller.apply_to_opts(base_opts, url)
+    
     # ========================================
     # AUTHENTICATION TOKEN INTEGRATION
     # ========================================
@@ -213,7 +179,7 @@ def build_ydl_opts(url: str, output_path: str, is_live: bool = None, user_id: in
                     user_token = platform_tokens.get(user_id)
                     
                     if user_token:
-                        print(f"🔐 Found {platform.upper()} authentication token for user {user_id}")
+                        logger.info(f"🔐 Found {platform.upper()} authentication token for user {user_id}")
                         
                         # Add authentication headers
                         if 'http_headers' not in base_opts:
@@ -242,16 +208,16 @@ def build_ydl_opts(url: str, output_path: str, is_live: bool = None, user_id: in
                                 'X-Platform': 'web',
                                 'X-API-Client': 'web'
                             })
-                            print("🎭 Applied Hotstar-specific authentication headers")
+                            logger.info("🎭 Applied Hotstar-specific authentication headers")
                         
                         break
                     else:
-                        print(f"⚠️ No {platform.upper()} token found for user {user_id}")
+                        logger.warning(f"⚠️ No {platform.upper()} token found for user {user_id}")
                         
         except ImportError:
-            print("⚠️ Token manager not available - proceeding without authentication")
+            logger.warning("⚠️ Token manager not available - proceeding without authentication")
         except Exception as e:
-            print(f"⚠️ Authentication setup failed: {str(e)}")
+            logger.warning(f"⚠️ Authentication setup failed: {str(e)}")
     
     return base_opts
 
@@ -345,10 +311,12 @@ async def progress_bar(current, total, reply, start):
 
             progress_bar = completed_symbol * completed_length + remaining_symbol * remaining_length
 
+            logger.info("Uploading %s of %s at %s", perc, tot, sp, extra={"sample": "upload_progress"})
             try:
                 await reply.edit(f'<blockquote>`╭──⌯═════𝐁𝐨𝐭 𝐒𝐭𝐚𝐭𝐢𝐜𝐬══════⌯──╮\n├⚡ {progress_bar}\n├⚙️ Progress ➤ | {perc} |\n├🚀 Speed ➤ | {sp} |\n├📟 Processed ➤ | {cur} |\n├🧲 Size ➤ | {tot} |\n├🕑 ETA ➤ | {eta} |\n╰─═══✨🦋{CREDIT}🦋✨═══─╯`</blockquote>')
             except FloodWait as e:
-                time.sleep(e.x)
+                metrics.record_floodwait(e.value)
+                await asyncio.sleep(e.value)
 
 def cleanup_temp_files(cleanup_type="initial"):
     """
@@ -365,7 +333,7 @@ def cleanup_temp_files(cleanup_type="initial"):
         from . import globals
         # Prevent cleanup during active processing unless it's final cleanup
         if cleanup_type == "initial" and globals.processing_request:
-            print("⏸️ Skipping cleanup - post-processing still in progress")
+            logger.info("⏸️ Skipping cleanup - post-processing still in progress")
             return 0
     except ImportError:
         # If globals not available, proceed with cleanup
@@ -0,0 +1,125 @@
+"""
+Web Server
+aiohttp app for the hosting platform's health checks, Prometheus scraping and
+a live status view. It runs on the bot's own event loop next to Pyrogram, so
+handlers read bot state directly instead of crossing a thread boundary, and
+a wedged loop also stops answering /health.
+"""
+
+import os
+import json
+import time
+import logging
+from functools import partial
+from aiohttp import web
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+WEB_HOST = os.environ.get("WEB_HOST", "0.0.0.0")
+
+LANDING_PAGE = """
+<!DOCTYPE html>
+<html lang="en">
+<body>
+    <div class="container" style="bg-dark text-red text-center py-3 mt-5">
+        <a href="https://github.com/Harrytt345" class="card">
+            <p>
+            <center>
+                <br
+              /><br
+              />▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄▄<br
+              />██░▄▄▄░█░▄▄▀█▄░▄██░▀██░█▄░▄██<br
+              />██▄▄▄▀▀█░▀▀░██░███░█░█░██░███<br
+              />██░▀▀▀░█░██░█▀░▀██░██▄░█▀░▀██<br
+              />▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀▀<br
+              /><br
+              /><br>
+                <b>Powered By zerocanbot</b>
+                </center>
+            </p>
+        </a>
+    </div>
+        <br></br>
+        <center>
+        <footer class="bg-dark text-white text-center py-3 mt-5">
+                <div class="footer__copyright">
+            <p class="footer__copyright-info">
+                © 2025 zerocanbot. All rights reserved.
+            </p>
+        </div>
+    </footer>
+    </center>
+</body>
+</html>
+"""
+
+
+async def index(request):
+    return web.Response(text=LANDING_PAGE, content_type="text/html")
+
+
+async def health(request):
+    healthy, details = metrics.liveness()
+    details["message"] = "Bot is running" if healthy else "Bot event loop is not responding"
+    return web.json_response(details, status=200 if healthy else 503)
+
+
+async def metrics_endpoint(request):
+    return web.Response(body=metrics.registry.render().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def status(request):
+    """Live bot internals, read in-loop without locks"""
+    from . import globals
+    from .ytdlp_pool import ytdlp_pool
+    from .loop_watchdog import loop_watchdog
+    from .concurrency_controller import concurrency_controller
+    from . import lazy_imports
+    from .memory_governor import memory_governor
+    from .housekeeping import housekeeper
+
+    healthy, details = metrics.liveness()
+    bot = request.app.get("bot")
+    return web.json_response({
+        "health": details,
+        "bot_connected": bool(bot and bot.is_connected),
+        "processing": bool(getattr(globals, "processing_request", False)),
+        "cancel_requested": bool(getattr(globals, "cancel_requested", False)),
+        "active_jobs": {key[0]: value for key, value in metrics.active_jobs._values.items()},
+        "queue_depth": {key[0]: value for key, value in metrics.queue_depth._values.items()},
+        "ytdlp_pool": dict(ytdlp_pool.stats),
+        "fragments_per_host": {host: state.get("fragments")
+                               for host, state in concurrency_controller.hosts.items()},
+        "memory": dict(memory_governor.snapshot(), **memory_governor.stats),
+        "housekeeping": list(housekeeper.history)[-5:],
+        "loop": {"max_lag": round(loop_watchdog.max_lag, 3), "top_blockers": loop_watchdog.report(limit=3)},
+        "startup": lazy_imports.milestones,
+        "time": time.time(),
+    }, dumps=partial(json.dumps, default=str))
+
+
+def create_app(bot=None):
+    app = web.Application()
+    app["bot"] = bot
+    app.router.add_get("/", index)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_get("/status", status)
+    return app
+
+
+async def start_web_server(port, bot=None, host=WEB_HOST):
+    """
+    Serve the app on the running loop (call from inside it)
+
+    Returns:
+        web.AppRunner: call `await runner.cleanup()` to stop
+    """
+    runner = web.AppRunner(create_app(bot), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🌐 Web server listening on {host}:{port}")
+    return runner
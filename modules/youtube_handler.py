@@ -1,10 +1,10 @@
 import os
 import re
+import html
 import requests
 import subprocess
 import asyncio
-import yt_dlp
-from pytube import YouTube
+import logging
 from pyromod import listen
 from pyrogram import Client
 from pyrogram.types import Message
@@ -12,28 +12,24 @@ from pyrogram.errors import FloodWait
 from vars import CREDIT, cookies_file_path, AUTH_USERS
 from . import globals
 from .utils import cleanup_temp_files, final_cleanup
+from .ytdlp_pool import run_ytdlp
+from .lazy_imports import lazy_import
+from .download_telemetry import ProgressReporter
+from .logs import job_scope, set_item
+from .playlist_exporter import PlaylistExport, export_all, find_links
+from .url_canon import find_youtube_urls
+from . import audio_pipeline
+from .audio_pipeline import AudioPipeline
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import("yt_dlp")
 
 #==============================================================================================================================
 
 def extract_youtube_urls(text):
-    """Extract YouTube URLs from text using regex"""
-    youtube_patterns = [
-        r'https?://(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-        r'https?://(?:www\.)?youtube\.com/embed/[\w-]+',
-        r'https?://(?:www\.)?youtube-nocookie\.com/embed/[\w-]+',
-        r'https?://youtu\.be/[\w-]+',
-        r'youtube\.com/watch\?v=[\w-]+',
-        r'youtube\.com/embed/[\w-]+',
-        r'youtube-nocookie\.com/embed/[\w-]+',
-        r'youtu\.be/[\w-]+'
-    ]
-    
-    urls = []
-    for pattern in youtube_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        urls.extend(matches)
-    
-    return urls
+    """Extract YouTube video URLs from text as canonical watch URLs, without duplicates"""
+    return find_youtube_urls(text)
 
 def sanitize_filename(filename):
     """Sanitize filename to prevent command injection and file system issues"""
@@ -91,6 +87,7 @@ async def getcookies_handler(client: Client, m: Message):
         await m.reply_text(f"⚠️ An error occurred: {str(e)}")     
 
 #==========================================================================================================================================================================================
+@job_scope("ytm")
 async def ytm_handler(bot: Client, m: Message):
     # Clean up all temporary files before starting new download
     cleaned_count = cleanup_temp_files()
@@ -110,18 +107,7 @@ async def ytm_handler(bot: Client, m: Message):
                 content = f.read()
             
             # Extract YouTube URLs from the content using regex
-            youtube_urls = extract_youtube_urls(content)
-            links = []
-            
-            for url in youtube_urls:
-                # Ensure URL has protocol
-                if not url.startswith('http'):
-                    url = 'https://' + url
-                
-                # Split into protocol and rest for compatibility with existing code
-                if "://" in url:
-                    parts = url.split("://", 1)
-                    links.append(parts)
+            links = extract_youtube_urls(content)
             
             os.remove(x)
             
@@ -158,18 +144,7 @@ async def ytm_handler(bot: Client, m: Message):
         content = input.text.strip()
         
         # Extract YouTube URLs from the content using regex
-        youtube_urls = extract_youtube_urls(content)
-        links = []
-        
-        for url in youtube_urls:
-            # Ensure URL has protocol
-            if not url.startswith('http'):
-                url = 'https://' + url
-            
-            # Split into protocol and rest for compatibility with existing code
-            if "://" in url:
-                parts = url.split("://", 1)
-                links.append(parts)
+        links = extract_youtube_urls(content)
         
         if not links:
             await m.reply_text("**No valid YouTube URLs found in the text.**")
@@ -183,88 +158,50 @@ async def ytm_handler(bot: Client, m: Message):
         await m.reply_text("**Invalid input. Send either a .txt file or YouTube links set**")
         return
  
+    pipeline = AudioPipeline(cookies_file_path, sanitize_filename, suffix=CREDIT)
+    status = await m.reply_text(f"<i><b>Audio Downloading</b></i>\n<blockquote><b>{len(links) - arg + 1} tracks, {audio_pipeline.CONCURRENCY} at a time</b></blockquote>")
     try:
-        for i in range(arg-1, len(links)):  # Iterate over each link
+        # Tracks download concurrently but arrive here in playlist order
+        async for track in pipeline.tracks(links[arg-1:], start=count):
             if globals.cancel_requested:
+                pipeline.cancel()
                 await m.reply_text("🚦**STOPPED**🚦")
                 globals.processing_request = False
                 globals.cancel_requested = False
                 return
-            # Handle embedded YouTube links properly
-            link_part = links[i][1]
-            
-            # Handle various embedded YouTube formats
-            if "youtube.com/embed/" in link_part or "youtube-nocookie.com/embed/" in link_part:
-                # Extract video ID from embed URL
-                if "/embed/" in link_part:
-                    video_id = link_part.split("/embed/")[1].split("?")[0].split("&")[0]
-                    Vxy = f"youtu.be/{video_id}"
-                else:
-                    Vxy = link_part
-            elif "watch?v=" in link_part:
-                # Regular YouTube watch URL
-                Vxy = link_part
-            elif "youtu.be/" in link_part:
-                # Already shortened URL
-                Vxy = link_part
-            else:
-                # Handle other cases or fallback
-                Vxy = link_part.replace("www.youtube-nocookie.com/embed", "youtu.be")
-            
-            url = "https://" + Vxy
-            
-            # Improved error handling for oEmbed
+            set_item(track.index)
+            name1 = f'{track.title} {CREDIT}'
+            if track.error or not track.path:
+                logger.warning("Audio download failed for %s: %s", track.url, track.error)
+                await m.reply_text(f'⚠️**Download Failed**⚠️\n**Name** =>> `{str(track.index).zfill(3)} {name1}`\n**Url** =>> {track.url}\n**Error** =>> {str(track.error)[:100]}...', disable_web_page_preview=True)
+                if track.path and os.path.exists(track.path):
+                    os.remove(track.path)
+                continue
+            ext = os.path.splitext(track.path)[1]
+            caption = f'**🎵 Title : **[{str(track.index).zfill(3)}] - {name1}{ext}\n\n🔗**Video link** : {track.url}\n\n🌟** Extracted By **: {CREDIT}'
             try:
-                oembed_url = f"https://www.youtube.com/oembed?url={url}&format=json"
-                response = requests.get(oembed_url, timeout=10)
-                if response.status_code == 200:
-                    audio_title = response.json().get('title', 'YouTube Video')
+                if track.is_audio:
+                    await bot.send_audio(chat_id=m.chat.id, audio=track.path, caption=caption, title=track.title, performer=CREDIT)
                 else:
-                    audio_title = 'YouTube Video'
+                    await bot.send_document(chat_id=m.chat.id, document=track.path, caption=caption)
+            except Exception as e:
+                logger.warning("Audio upload failed for %s: %s", track.url, e)
+                await m.reply_text(f'⚠️**Upload Failed**⚠️\n**Name** =>> `{str(track.index).zfill(3)} {name1}`\n**Url** =>> {track.url}', disable_web_page_preview=True)
+            finally:
+                if os.path.exists(track.path):
+                    os.remove(track.path)
+            try:
+                await status.edit_text(f"<i><b>Audio Downloading</b></i>\n<blockquote><b>{track.index - arg + 1}/{len(links) - arg + 1} sent</b></blockquote>")
             except Exception:
-                audio_title = 'YouTube Video'
-            
-            audio_title = audio_title.replace("_", " ")
-            # Sanitize filename to prevent command injection
-            safe_title = sanitize_filename(audio_title)
-            name = f'{safe_title[:60]}_{CREDIT}'        
-            name1 = f'{audio_title} {CREDIT}'
+                pass
 
-            if "youtube.com" in url or "youtu.be" in url:
-                prog = await m.reply_text(f"<i><b>Audio Downloading</b></i>\n<blockquote><b>{str(count).zfill(3)}) {name1}</b></blockquote>")
-                
-                # Use subprocess.run instead of os.system for security
-                cmd = ['yt-dlp', '-x', '--audio-format', 'mp3', '--cookies', cookies_file_path, url, '-o', f'{name}.mp3']
-                print(f"Running command: {' '.join(cmd)}")
-                
-                try:
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                    success = result.returncode == 0
-                except subprocess.TimeoutExpired:
-                    success = False
-                    print("yt-dlp command timed out")
-                except Exception as e:
-                    success = False
-                    print(f"Error running yt-dlp: {e}")
-                if success and os.path.exists(f'{name}.mp3'):
-                    await prog.delete(True)
-                    print(f"File {name}.mp3 exists, attempting to send...")
-                    try:
-                        await bot.send_document(chat_id=m.chat.id, document=f'{name}.mp3', caption=f'**🎵 Title : **[{str(count).zfill(3)}] - {name1}.mp3\n\n🔗**Video link** : {url}\n\n🌟** Extracted By **: {CREDIT}')
-                        os.remove(f'{name}.mp3')
-                        count+=1
-                    except Exception as e:
-                        await m.reply_text(f'⚠️**Upload Failed**⚠️\n**Name** =>> `{str(count).zfill(3)} {name1}`\n**Url** =>> {url}', disable_web_page_preview=True)
-                        count+=1
-                else:
-                    await prog.delete(True)
-                    error_msg = result.stderr if 'result' in locals() and result.stderr else "Unknown error"
-                    await m.reply_text(f'⚠️**Download Failed**⚠️\n**Name** =>> `{str(count).zfill(3)} {name1}`\n**Url** =>> {url}\n**Error** =>> {error_msg[:100]}...', disable_web_page_preview=True)
-                    count+=1
-                               
     except Exception as e:
         await m.reply_text(f"<b>Failed Reason:</b>\n<blockquote><b>{str(e)}</b></blockquote>")
     finally:
+        try:
+            await status.delete()
+        except Exception:
+            pass
         await m.reply_text("<blockquote><b>All YouTube Music Download Successfully</b></blockquote>")
         
         # Mark processing as complete before final cleanup
@@ -285,64 +222,42 @@ async def y2t_handler(bot: Client, message: Message):
     user_id = str(message.from_user.id)
     
     editable = await message.reply_text(
-        f"<blockquote><b>Send YouTube Website/Playlist link for convert in .txt file</b></blockquote>"
+        f"<blockquote><b>Send YouTube Website/Playlist/Channel link(s) for convert in .txt file\nSeveral links (one per line) are exported together</b></blockquote>"
     )
 
     input_message: Message = await bot.listen(message.chat.id)
-    youtube_link = input_message.text.strip()
+    links = find_links(input_message.text)
     await input_message.delete(True)
     await editable.delete(True)
+    if not links:
+        await message.reply_text("<blockquote><b>❌ No YouTube link found</b></blockquote>")
+        return
 
-    # Fetch the YouTube information using yt-dlp with cookies
-    ydl_opts = {
-        'quiet': True,
-        'extract_flat': True,
-        'skip_download': True,
-        'force_generic_extractor': True,
-        'forcejson': True,
-        'cookies': 'youtube_cookies.txt'  # Specify the cookies file
-    }
+    # Export every link concurrently; extraction runs off the event loop
+    status = await message.reply_text(f"<b>⏳ Exporting {len(links)} link(s)...</b>")
+    reporter = ProgressReporter(status, f"<b>🔪 YouTube → .txt • {len(links)} link(s)</b>")
+    exports = [PlaylistExport(link) for link in links]
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        try:
-            result = ydl.extract_info(youtube_link, download=False)
-            if 'entries' in result:
-                title = result.get('title', 'youtube_playlist')
-            else:
-                title = result.get('title', 'youtube_video')
-        except yt_dlp.utils.DownloadError as e:
+    async def send_export(export, txt_file):
+        if not txt_file:
             await message.reply_text(
-                f"<blockquote>{str(e)}</blockquote>"
+                f"<blockquote>{export.url}\n{html.escape(export.error or 'Export failed')}</blockquote>"
             )
             return
+        # Send the generated text file to the user with a pretty caption
+        await message.reply_document(
+            document=txt_file,
+            caption=f'<a href="{export.url}">__**Click Here to Open Link**__</a>\n<blockquote>{html.escape(os.path.basename(txt_file))} • {export.count} videos</blockquote>\n'
+        )
+        # Remove the temporary text file after sending
+        os.remove(txt_file)
 
-    # Extract the YouTube links
-    videos = []
-    if 'entries' in result:
-        for entry in result['entries']:
-            video_title = entry.get('title', 'No title')
-            url = entry['url']
-            videos.append(f"{video_title}: {url}")
-    else:
-        video_title = result.get('title', 'No title')
-        url = result['url']
-        videos.append(f"{video_title}: {url}")
-
-    # Create and save the .txt file with the custom name
-    txt_file = os.path.join("downloads", f'{title}.txt')
-    os.makedirs(os.path.dirname(txt_file), exist_ok=True)  # Ensure the directory exists
-    with open(txt_file, 'w') as f:
-        f.write('\n'.join(videos))
-
-    # Send the generated text file to the user with a pretty caption
-    await message.reply_document(
-        document=txt_file,
-        caption=f'<a href="{youtube_link}">__**Click Here to Open Link**__</a>\n<blockquote>{title}.txt</blockquote>\n'
-    )
+    batch = await export_all(exports, send_export, reporter)
+    try:
+        await status.edit_text(f"<b>✅ Export finished</b>\n<blockquote>{batch.progress_text()}</blockquote>")
+    except Exception:
+        pass
 
-    # Remove the temporary text file after sending
-    os.remove(txt_file)
-    
     # Final cleanup after completing conversion and sending results
     final_cleaned = final_cleanup()
     if final_cleaned > 0:
@@ -0,0 +1,330 @@
+"""
+Warm yt-dlp Worker Pool
+Keeps yt_dlp imported in long-lived worker processes and runs CLI-style jobs
+over a JSON-lines pipe, so each download skips interpreter startup, the
+yt_dlp import and extractor registry construction.
+
+Workers are recycled after a number of jobs or once their RSS crosses a
+threshold, which bounds any leak inside yt-dlp or its extractors.
+"""
+
+import os
+import sys
+import json
+import shlex
+import asyncio
+import logging
+import threading
+
+from .memory_governor import memory_governor
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get("YTDLP_POOL_SIZE", "2"))
+MAX_JOBS_PER_WORKER = int(os.environ.get("YTDLP_POOL_MAX_JOBS", "25"))
+MAX_WORKER_RSS_MB = int(os.environ.get("YTDLP_POOL_MAX_RSS_MB", "300"))
+
+# Progress hook fields forwarded to the bot; everything else in the hook dict
+# (info_dict, tmpfilename, ...) is large or not JSON-serialisable.
+PROGRESS_KEYS = (
+    "status", "filename", "downloaded_bytes", "total_bytes", "total_bytes_estimate",
+    "speed", "eta", "elapsed", "fragment_index", "fragment_count",
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ==========================================================================
+# Worker side (runs as `python -m modules.ytdlp_pool`)
+# ==========================================================================
+
+def _worker_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+class _ForwardingLogger:
+    """yt-dlp logger that forwards warnings/errors and retry notices to the parent"""
+
+    def __init__(self, emit, job_id):
+        self.emit = emit
+        self.job_id = job_id
+
+    def debug(self, msg):
+        # yt-dlp routes normal screen output through debug(); keep it on stderr
+        print(msg, file=sys.stderr)
+        # Retry notices ("Got error: ... Retrying (1/10)...") also arrive here;
+        # the parent counts them for telemetry and concurrency control
+        if "Retrying" in msg or "Got error" in msg:
+            self.emit({"event": "log", "id": self.job_id, "level": "debug", "msg": str(msg)})
+
+    def info(self, msg):
+        print(msg, file=sys.stderr)
+
+    def warning(self, msg):
+        print(msg, file=sys.stderr)
+        self.emit({"event": "log", "id": self.job_id, "level": "warning", "msg": str(msg)})
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+        self.emit({"event": "log", "id": self.job_id, "level": "error", "msg": str(msg)})
+
+
+def _worker_main():
+    # stdout is the IPC channel; point fd 1 at stderr so nothing yt-dlp
+    # writes directly can corrupt the JSON stream.
+    ipc = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    # Progress hooks fire on yt-dlp's concurrent-fragment threads; interleaved
+    # writes would garble lines and get the worker killed
+    ipc_lock = threading.Lock()
+
+    def emit(message):
+        line = json.dumps(message) + "\n"
+        with ipc_lock:
+            ipc.write(line)
+
+    try:
+        import yt_dlp
+    except Exception as e:
+        emit({"event": "fatal", "error": f"yt_dlp import failed: {e}"})
+        return
+
+    emit({"event": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        job_id = job["id"]
+
+        def hook(d, job_id=job_id):
+            emit({"event": "progress", "id": job_id, "data": {k: d.get(k) for k in PROGRESS_KEYS}})
+
+        def pp_hook(d, job_id=job_id):
+            # Merges and fixups write no download progress; report them separately
+            emit({"event": "postprocess", "id": job_id,
+                  "data": {"status": d.get("status"), "postprocessor": d.get("postprocessor")}})
+
+        returncode, error = 0, None
+        try:
+            parsed = yt_dlp.parse_options(job["argv"])
+            ydl_opts = dict(parsed.ydl_opts)
+            ydl_opts["progress_hooks"] = list(ydl_opts.get("progress_hooks") or []) + [hook]
+            ydl_opts["postprocessor_hooks"] = list(ydl_opts.get("postprocessor_hooks") or []) + [pp_hook]
+            ydl_opts["logger"] = _ForwardingLogger(emit, job_id)
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                if parsed.options.load_info_filename is not None:
+                    # --load-info-json: download from the saved extraction, as the CLI does
+                    returncode = ydl.download_with_info_file(os.path.expanduser(parsed.options.load_info_filename))
+                else:
+                    returncode = ydl.download(parsed.urls)
+        except SystemExit as e:
+            # parse_options exits on bad arguments, like the CLI would
+            returncode = e.code if isinstance(e.code, int) else 2
+            error = f"invalid arguments: {e}"
+        except Exception as e:
+            returncode, error = 1, str(e)
+
+        emit({"event": "done", "id": job_id, "returncode": returncode,
+              "error": error, "rss_mb": _worker_rss_mb()})
+
+
+# ==========================================================================
+# Parent side
+# ==========================================================================
+
+class _Worker:
+    def __init__(self, proc):
+        self.proc = proc
+        self.jobs_done = 0
+        self.rss_mb = 0.0
+
+    @property
+    def alive(self):
+        return self.proc.returncode is None
+
+    async def read_event(self):
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise EOFError("yt-dlp worker exited")
+        return json.loads(line)
+
+    def kill(self):
+        if self.alive:
+            try:
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+
+    async def stop(self):
+        if self.alive:
+            try:
+                self.proc.stdin.close()
+                await asyncio.wait_for(self.proc.wait(), timeout=5)
+            except Exception:
+                self.kill()
+
+
+class YtdlpWorkerPool:
+    """Pool of warm yt-dlp worker processes driven from the bot's event loop"""
+
+    def __init__(self, size=POOL_SIZE, max_jobs=MAX_JOBS_PER_WORKER, max_rss_mb=MAX_WORKER_RSS_MB):
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self._idle = []
+        self._slots = None
+        self._job_seq = 0
+        self.disabled_reason = None
+        self.stats = {"jobs": 0, "spawned": 0, "recycled": 0, "killed": 0, "cli_fallbacks": 0}
+
+    async def _spawn(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "modules.ytdlp_pool",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            limit=1024 * 1024,
+        )
+        worker = _Worker(proc)
+        hello = await asyncio.wait_for(worker.read_event(), timeout=60)
+        if hello.get("event") != "ready":
+            worker.kill()
+            raise RuntimeError(hello.get("error", "yt-dlp worker failed to start"))
+        self.stats["spawned"] += 1
+        logger.info("yt-dlp worker %s ready", hello.get("pid"))
+        return worker
+
+    async def _acquire(self):
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+        return await self._spawn()
+
+    async def _release(self, worker):
+        if worker.jobs_done >= self.max_jobs or worker.rss_mb >= self.max_rss_mb:
+            self.stats["recycled"] += 1
+            logger.info("Recycling yt-dlp worker after %d jobs (%.0f MB RSS)", worker.jobs_done, worker.rss_mb)
+            await worker.stop()
+        elif worker.alive:
+            self._idle.append(worker)
+
+    @staticmethod
+    def _notify(on_event, event):
+        if on_event:
+            try:
+                on_event(event)
+            except Exception as e:
+                logger.debug("yt-dlp event callback failed: %s", e)
+
+    async def run(self, argv, on_event=None):
+        """
+        Run a yt-dlp job in a warm worker
+
+        Args:
+            argv: yt-dlp arguments, with or without a leading 'yt-dlp'
+            on_event: Optional callable receiving start/progress/postprocess/log event dicts;
+                {"event": "start"} comes once the memory and pool-slot waits
+                are over, so callers can start stall clocks and timeouts there
+
+        Returns:
+            dict: {'returncode': int, 'error': str or None}
+        """
+        if isinstance(argv, str):
+            argv = shlex.split(argv)
+        argv = list(argv)
+        if argv and os.path.basename(argv[0]) in ("yt-dlp", "yt_dlp"):
+            argv = argv[1:]
+
+        # New transfers wait while the container is close to its memory limit
+        await memory_governor.wait_for_download()
+
+        if self.disabled_reason:
+            return await self._run_cli(argv, on_event)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            try:
+                worker = await self._acquire()
+            except Exception as e:
+                self.disabled_reason = str(e)
+                logger.warning("yt-dlp worker pool disabled, using CLI: %s", e)
+                return await self._run_cli(argv, on_event)
+
+            self._notify(on_event, {"event": "start"})
+            self._job_seq += 1
+            job_id = self._job_seq
+            self.stats["jobs"] += 1
+            try:
+                worker.proc.stdin.write((json.dumps({"id": job_id, "argv": argv}) + "\n").encode())
+                await worker.proc.stdin.drain()
+                last_error = None
+                while True:
+                    event = await worker.read_event()
+                    if event.get("id") != job_id:
+                        continue
+                    if event["event"] == "done":
+                        worker.jobs_done += 1
+                        worker.rss_mb = event.get("rss_mb") or 0.0
+                        await self._release(worker)
+                        error = event.get("error")
+                        if event["returncode"] != 0 and not error:
+                            error = last_error
+                        return {"returncode": event["returncode"], "error": error}
+                    if event["event"] == "log" and event.get("level") == "error":
+                        last_error = event.get("msg")
+                    self._notify(on_event, event)
+            except asyncio.CancelledError:
+                # The only way to interrupt yt-dlp mid-transfer is to kill the worker
+                self.stats["killed"] += 1
+                worker.kill()
+                raise
+            except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+                worker.kill()
+                return {"returncode": 1, "error": f"yt-dlp worker died: {e}"}
+            except Exception as e:
+                # Garbled IPC (oversized or non-JSON line): the worker's state is unknown
+                self.stats["killed"] += 1
+                worker.kill()
+                logger.error("yt-dlp worker killed after IPC error: %s", e)
+                return {"returncode": 1, "error": f"yt-dlp worker IPC error: {e}"}
+
+    async def _run_cli(self, argv, on_event=None):
+        self.stats["cli_fallbacks"] += 1
+        proc = await asyncio.create_subprocess_exec("yt-dlp", *argv)
+        self._notify(on_event, {"event": "start"})
+        try:
+            returncode = await proc.wait()
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+        return {"returncode": returncode, "error": None if returncode == 0 else f"yt-dlp exited with {returncode}"}
+
+    async def shutdown(self):
+        workers, self._idle = self._idle, []
+        for worker in workers:
+            await worker.stop()
+
+
+# Global pool instance
+ytdlp_pool = YtdlpWorkerPool()
+
+
+async def run_ytdlp(argv, on_event=None):
+    """Run a yt-dlp command (string or argv list) in the warm worker pool"""
+    return await ytdlp_pool.run(argv, on_event=on_event)
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -69,6 +69,10 @@ photologo = 'https://tinypic.host/images/2025/02/07/DeWatermark.ai_1738952933236
 photoyt = 'https://tinypic.host/images/2025/03/18/YouTube-Logo.wine.png' #https://envs.sh/GVi.jpg
 photocp = 'https://tinypic.host/images/2025/03/28/IMG_20250328_133126.jpg'
 photozip = 'https://envs.sh/cD_.jpg'
+
+# Persistent bot state (throughput history, tuning data). Kept out of the
+# working directory because cleanup_temp_files sweeps *.json/*.txt there.
+STATE_DIR = os.environ.get("STATE_DIR", "state")
 # .....,.....,.......,...,.......,....., .....,.....,.......,...,.
 
 
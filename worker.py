@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Download worker for BOT_MODE=coordinator
+Leases the items the coordinator bot queued, downloads, processes and
+uploads them, and reports each result back through the queue. Start as many
+as the hardware allows, on the bot's host or on others:
+
+    python3 worker.py                                    # SQLite queue in STATE_DIR
+    JOB_QUEUE_URL=redis://queue-host:6379/0 python3 worker.py
+
+Each worker runs in its own directory (WORKER_DIR) so workers sharing a host
+never sweep or overwrite each other's files. A WORKER_DIR that already holds
+files the worker did not create is refused rather than cleared. SIGTERM lets the items in hand
+finish; a second signal hands them back to the queue at once.
+"""
+
+import os
+import shutil
+import signal
+import socket
+import asyncio
+import logging
+
+WORKER_ID = os.environ.get("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+WORKER_DIR = os.path.abspath(os.environ.get("WORKER_DIR") or os.path.join("workers", WORKER_ID))
+CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "1"))
+POLL_INTERVAL = float(os.environ.get("WORKER_POLL_INTERVAL", "3"))
+# Files the download helpers open by relative path
+SHARED_FILES = ("youtube_cookies.txt", "vidwater.ttf")
+# Written into every directory this worker created; only those are ever cleared
+MARKER = ".worker-dir"
+
+# One log file per worker; rotating a file shared by processes loses records
+os.environ.setdefault("LOG_DIR", os.path.join(WORKER_DIR, "logs"))
+
+from modules.logs import setup_logging, log_context
+setup_logging()
+
+from pyrogram import Client
+from vars import API_ID, API_HASH, BOT_TOKEN
+from modules.job_queue import job_queue, LEASE_SECONDS
+from modules.job_runner import run_item
+
+logger = logging.getLogger("worker")
+
+
+def prepare_workdir():
+    """Switch into this worker's directory, clearing what a previous run left behind"""
+    root = os.getcwd()
+    os.makedirs(WORKER_DIR, exist_ok=True)
+    marker = os.path.join(WORKER_DIR, MARKER)
+    if not os.path.exists(marker):
+        # WORKER_DIR comes from the environment; never sweep a directory
+        # (a checkout, /app, ...) that a worker did not create
+        if any(entry.name != "logs" for entry in os.scandir(WORKER_DIR)):
+            raise SystemExit(f"WORKER_DIR {WORKER_DIR} is not empty and was not created by a worker; "
+                             f"point WORKER_DIR at a new directory")
+        open(marker, "w").close()
+    keep = set(SHARED_FILES) | {"logs", MARKER}
+    for entry in os.scandir(WORKER_DIR):
+        # Items this worker held before it died have been requeued by now
+        if entry.name in keep:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.remove(entry.path)
+    for name in SHARED_FILES:
+        source, link = os.path.join(root, name), os.path.join(WORKER_DIR, name)
+        # Linked, not copied, so /cookies updates reach workers on this host
+        if os.path.exists(source) and not os.path.lexists(link):
+            os.symlink(os.path.abspath(source), link)
+    os.chdir(WORKER_DIR)
+
+
+async def keep_lease(item):
+    """Renew the lease while the item is being worked on; returns once it is lost"""
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            if not await job_queue.heartbeat(item, WORKER_ID):
+                logger.warning("Lease on %s lost; dropping it to its new holder", item)
+                return
+        except Exception as e:
+            logger.error("Heartbeat for %s failed: %s", item, e)
+
+
+async def work(bot, stopping):
+    """One item at a time until asked to stop"""
+    while not stopping.is_set():
+        try:
+            item = await job_queue.lease(WORKER_ID)
+        except Exception as e:
+            logger.error("Lease failed: %s", e)
+            item = None
+        if item is None:
+            try:
+                await asyncio.wait_for(stopping.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        heartbeat = asyncio.create_task(keep_lease(item))
+        running = None
+        try:
+            with log_context(job=item.meta.get("log_job") or item.job_id, item=item.seq):
+                logger.info("🛠 Took %s: %s", item, item.payload.get("label"))
+                running = asyncio.create_task(run_item(bot, item, WORKER_ID))
+                await asyncio.wait({running, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+                if not running.done():
+                    # The queue has handed the item to another worker; running
+                    # on would upload it twice
+                    running.cancel()
+                    await asyncio.wait({running})
+                    continue
+                result = running.result()
+                if result.get("error"):
+                    await job_queue.fail(item, WORKER_ID, result["error"], result)
+                else:
+                    await job_queue.complete(item, WORKER_ID, result)
+        except asyncio.CancelledError:
+            if running and not running.done():
+                running.cancel()
+                await asyncio.wait({running})
+            await job_queue.release(item, WORKER_ID)
+            logger.info("↩️ Released %s back to the queue", item)
+            raise
+        finally:
+            heartbeat.cancel()
+
+
+async def main():
+    prepare_workdir()
+    bot = Client(
+        f"worker-{WORKER_ID}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        bot_token=BOT_TOKEN,
+        in_memory=True,
+        no_updates=True,               # the coordinator answers commands
+        max_concurrent_transmissions=4,
+    )
+    await bot.start()
+    logger.info("🚀 Worker %s started with %d slot(s) in %s", WORKER_ID, CONCURRENCY, WORKER_DIR)
+
+    stopping = asyncio.Event()
+    slots = [asyncio.create_task(work(bot, stopping)) for _ in range(CONCURRENCY)]
+
+    def request_stop():
+        if stopping.is_set():
+            for slot in slots:
+                slot.cancel()
+        else:
+            logger.info("🛑 Finishing items in hand; signal again to release them now")
+            stopping.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_stop)
+
+    await asyncio.gather(*slots, return_exceptions=True)
+    await bot.stop()
+    logger.info("👋 Worker %s stopped", WORKER_ID)
+
+
+if __name__ == "__main__":
+    from modules.ultra_fast_downloader import activate_uvloop
+    activate_uvloop()
+    asyncio.run(main())